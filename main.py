@@ -5,11 +5,13 @@ Markdo - PyQt6
 from sys import executable, argv, exit
 import sys  # 保留用于 getattr(sys, 'frozen')
 import os
+from time import monotonic, sleep
+
+PROCESS_START_TIME = monotonic()  # 进程启动时间，用于统计启动耗时
 
 # 禁用Qt调试输出（在导入Qt之前设置）
 os.environ['QT_LOGGING_RULES'] = '*.debug=false;qt.qpa.window=false'
 
-from markdown import markdown
 from pathlib import Path
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
@@ -17,19 +19,46 @@ from PyQt6.QtWidgets import (
     QMessageBox, QSplitter, QLabel, QStatusBar, QMenuBar, QMenu,
     QDialog, QGridLayout, QGroupBox, QToolButton, QCheckBox, QComboBox,
     QLineEdit, QSpinBox, QRadioButton, QButtonGroup, QScrollArea, QSizePolicy, QTimeEdit,
-    QGraphicsOpacityEffect, QFrame
+    QGraphicsOpacityEffect, QFrame, QProgressBar
 )
-from PyQt6.QtOpenGLWidgets import QOpenGLWidget
-from PyQt6.QtWebEngineWidgets import QWebEngineView
-from PyQt6.QtWebEngineCore import QWebEngineSettings
-from PyQt6.QtCore import Qt, QTimer, pyqtSignal, QPoint, QSettings, QUrl, QObject, QRect, QTime, QPropertyAnimation, QEasingCurve, QSequentialAnimationGroup, QEvent, QVariantAnimation, QAbstractAnimation, QThread
-from PyQt6.QtGui import QFont, QColor, QAction, QKeySequence, QTextCursor, QShortcut, QSyntaxHighlighter, QTextCharFormat, QPalette, QIcon, QMouseEvent, QPainter, QPen, QCursor, QTextDocument, QSurfaceFormat, QRegion, QScreen
-from re import compile, match, sub, IGNORECASE
+from PyQt6.QtCore import Qt, QTimer, pyqtSignal, QPoint, QSettings, QUrl, QObject, QRect, QTime, QPropertyAnimation, QEasingCurve, QSequentialAnimationGroup, QEvent, QVariantAnimation, QAbstractAnimation, QThread, QThreadPool, QRunnable, QLockFile, QFileSystemWatcher
+from PyQt6.QtNetwork import QLocalServer, QLocalSocket
+from PyQt6.QtGui import QFont, QColor, QAction, QKeySequence, QTextCursor, QShortcut, QTextCharFormat, QPalette, QIcon, QMouseEvent, QPainter, QPen, QCursor, QTextDocument, QTextLayout, QTextBlockUserData, QSurfaceFormat, QRegion, QScreen
+from re import compile, match, sub, IGNORECASE, MULTILINE
 from os.path import dirname, abspath, join, exists
 from os import getcwd
 from datetime import datetime
 import traceback
 import logging
+import io
+import json
+import mmap
+import codecs
+import queue
+import uuid
+import hashlib
+import shutil
+import difflib
+import threading
+import statistics
+import zlib
+from collections import deque
+from array import array
+from itertools import repeat
+
+# QtWebEngine 启动时不导入（加载 Chromium 需要数百毫秒），首次创建预览时由 load_webengine() 导入
+QWebEngineView = None
+QWebEngineSettings = None
+QWebEnginePage = None
+
+
+def load_webengine():
+    """按需导入 QtWebEngine（需要在创建 QApplication 前设置 AA_ShareOpenGLContexts）"""
+    global QWebEngineView, QWebEngineSettings, QWebEnginePage
+    if QWebEngineView is None:
+        from PyQt6.QtWebEngineWidgets import QWebEngineView as web_engine_view
+        from PyQt6.QtWebEngineCore import QWebEngineSettings as web_engine_settings, QWebEnginePage as web_engine_page
+        QWebEngineView, QWebEngineSettings, QWebEnginePage = web_engine_view, web_engine_settings, web_engine_page
 
 
 # ==================== 日志系统 ====================
@@ -140,6 +169,88 @@ THEME_SWITCH_FADE_DURATION = 400  # 主题切换淡入淡出时长（ms）
 # 定时器相关常量
 THEME_CHECK_INTERVAL = 60000  # 主题检查间隔（ms），1分钟
 PREVIEW_UPDATE_DELAY = 500  # 预览更新延迟（ms），防抖时间
+HIBERNATE_CHECK_INTERVAL = 30000  # 标签页休眠检查间隔（ms）
+
+# 标签页休眠相关常量
+DEFAULT_HIBERNATE_AFTER_MINUTES = 15  # 默认不活跃多少分钟后休眠（0 表示不按时间休眠）
+DEFAULT_HIBERNATE_BUDGET_MB = 512  # 默认未休眠标签页的内存预算（MB，0 表示不限制）
+HIBERNATE_PREVIEW_ESTIMATE = 8 * 1024 * 1024  # 单个预览页（QWebEngineView）的估算内存（字节）
+HIBERNATE_LAYOUT_FACTOR = 3  # 文档布局与格式信息相对于文本本身的估算倍数
+FILE_IO_MAX_WORKERS = 4  # 文件读取线程池的最大并发数
+MARKDOWN_FILE_EXTENSIONS = ('.md', '.markdown')  # 命令行参数接受的文件扩展名
+LARGE_FILE_THRESHOLD = 4 * 1024 * 1024  # 超过此大小（字节）的文件使用渐进加载
+LARGE_FILE_CHUNK_BYTES = 32 * 1024  # 渐进加载每次解码并追加的字节数
+LARGE_FILE_SLICE_MS = 12  # 渐进加载每个事件循环轮次最多占用的时间（ms）
+FILE_WATCH_DEBOUNCE = 300  # 外部文件修改事件的防抖延迟（ms）
+FILE_WATCH_MAX_DELAY = 2000  # 持续有修改事件时最长多久处理一批（ms）
+FRAME_TASK_BUDGET_MS = 4  # 帧调度器每帧运行非紧急任务（统计、状态栏等）最多占用的时间（ms）
+HIGHLIGHT_SLICE_MS = 4  # 不可见部分的语法高亮每个事件循环轮次最多占用的时间（ms），其余在空闲时继续
+CODE_STYLE_DARK = "monokai"  # 深色主题下编辑器内代码块使用的 Pygments 配色
+CODE_STYLE_LIGHT = "default"  # 浅色主题下编辑器内代码块使用的 Pygments 配色
+CODE_TOKEN_CACHE_SIZE = 50000  # 编辑器代码块词法分析结果缓存的最大行数，超出时清空
+CODE_LEX_MAX_LINES = 1000  # 一次词法分析的最大行数，更长的代码块只分析所需行前后的一段
+HIGHLIGHT_MAX_LINE_LENGTH = 2000  # 超过该长度的行只高亮行首块级语法，不再扫描行内语法和代码记号
+STATS_SELECTION_DELAY = 100  # 选区变化后延迟统计选中内容（ms），拖动选择时不逐次统计
+INPUT_LATENCY_SAMPLES = 1000  # 每个文档规模分组保留的最近按键延迟样本数
+INPUT_LATENCY_SLOW_MS = 50  # 按键到绘制超过该时间时记录日志（连同期间 GUI 线程上运行的工作）
+INPUT_LATENCY_LOG_INTERVAL = 5  # 慢按键日志的最小间隔（秒），期间其余的慢按键只计数
+GUI_ACTIVITY_LOG_SIZE = 256  # GUI 线程工作记录保留的最近条目数
+RENDER_WATCHDOG_MS = 3000  # 预览渲染超过该时间仍未完成时先显示纯文本，渲染完成后再替换
+RENDER_RETRY_CHANGE_RATIO = 0.1  # 渲染超时后，文档长度变化超过该比例才重新尝试渲染，否则继续显示纯文本
+RENDER_SHUTDOWN_WAIT_MS = 2000  # 退出时等待进行中的预览渲染完成的最长时间（ms）
+RENDER_CACHE_DIR_NAME = "render_cache"  # 预览渲染缓存目录（位于配置目录下）
+RENDER_CACHE_VERSION = 1  # 渲染流程变化时递增，使旧缓存失效
+RENDER_CACHE_MAX_BYTES = 64 * 1024 * 1024  # 渲染缓存的磁盘空间上限，超出时淘汰最久未使用的条目
+RENDER_CACHE_MIN_CHARS = 4096  # 小于该长度的文档渲染很快，不写入缓存
+WARMUP_LEXERS = ('python', 'javascript', 'typescript', 'bash', 'json', 'yaml', 'html', 'css', 'c', 'cpp', 'java', 'go', 'rust', 'sql')  # 预热的常用代码高亮语言
+WARMUP_SAMPLE = """# Markdo
+
+| a | b |
+|---|---|
+| ~~1~~ | ^^2^^ ==3== |
+
+```python
+print("Markdo")
+```
+
+$E = mc^2$
+"""  # 预热用的示例文档，覆盖常用的 Markdown 扩展和公式
+SINGLE_INSTANCE_CONNECT_TIMEOUT = 200  # 连接已运行实例的超时（ms）
+SINGLE_INSTANCE_ACK_TIMEOUT = 1500  # 等待已运行实例确认接收的超时（ms），超时视为该实例无响应
+BENCHMARK_DEFAULT_RUNS = 5  # 基准测试默认重复次数
+BENCHMARK_TIMEOUT = 30000  # 单次基准测试运行的超时（ms）
+BENCHMARK_DOCUMENT_LINES = 10000  # 高亮等基准测试使用的合成文档行数
+BENCHMARK_SPAWN_ENV = "MARKDO_BENCHMARK_SPAWN"  # 父进程启动子进程时的时间戳（用于计算解释器启动耗时）
+TYPING_BENCHMARK_SIZES = (1000, 10000, 100000)  # 打字基准测试的文档行数
+TYPING_KEY_INTERVAL_MS = 30  # 打字基准测试的按键间隔（约每秒 33 键）
+TYPING_SETTLE_TIMEOUT = 60000  # 打开文档后等待后台高亮完成的最长时间（ms）
+TYPING_STALL_MS = 50  # 事件循环单次处理超过该时间视为卡顿
+TYPING_SLICE_SLACK_MS = 2  # 后台高亮分片允许超出 HIGHLIGHT_SLICE_MS 的余量（预算检查之后的最后一块）
+# 允许超出预算的分片比例（至少一个）：分片按墙钟计时，GUI 线程被系统调度让出 CPU 时偶尔会超时，
+# 系统性的超时（如每个分片都重新布局）仍会失败
+TYPING_SLICE_OUTLIER_RATIO = 0.01
+STATISTICS_FUZZ_SEEDS_PER_RUN = 40  # 字数统计基准测试每次 --runs 的随机样本数
+STATISTICS_FUZZ_EDITS = 50  # 字数统计基准测试每个样本的随机编辑次数
+STATISTICS_FUZZ_SEED = 20470  # 字数统计基准测试随机样本的种子（固定以便复现）
+# 字数统计基准测试的初始文档：表格、Setext 标题、分隔线等行首规则容易跨行匹配的内容
+STATISTICS_FUZZ_DOCUMENT = (
+    "Title\n-----\n\n| a | b |\n|---|:-:|\n| 1 | 2 |\n\na\n:\n---\n"
+    "# Heading\n> quote\n- [x] item\n1. first\n```python\ncode\n```\n"
+    "中文 text **bold** [link](url) <b>tag</b>\n"
+)
+GUARDRAIL_LINE_CHARS = 200 * 1024  # 病态输入基准测试中超长行的长度
+GUARDRAIL_HIGHLIGHT_BUDGET_MS = 50  # 病态输入基准测试中单行语法高亮的耗时上限
+GUARDRAIL_FUZZ_SEED = 20240  # 病态输入基准测试随机样本的种子（固定以便复现）
+# 允许由看门狗回退到纯文本的病态样本：Python-Markdown 的行内处理对这些输入是超线性的
+# （每个 [、`、\(、$$ 都会触发一次对整段剩余文本的扫描或拼接），无法在渲染预算内完成
+GUARDRAIL_ACCEPTED_FALLBACKS = frozenset({
+    'brackets', 'link_openers', 'image_openers', 'backticks', 'math_openers', 'dollars'})
+JOURNAL_DIR_NAME = "journal"  # 编辑日志目录名（位于设置文件所在目录下）
+JOURNAL_SYNC_DELAY = 1000  # 停止输入多久后将编辑日志刷入磁盘（ms）
+JOURNAL_MAX_SYNC_INTERVAL = 5  # 持续输入时两次刷盘的最大间隔（秒）
+JOURNAL_COMPACT_RECORDS = 2000  # 累积多少条增量记录后压缩为快照
+SCROLL_RESTORE_RETRIES = 10  # 恢复滚动位置时等待文档布局完成的最大重试次数
+SCROLL_RESTORE_INTERVAL = 50  # 恢复滚动位置的重试间隔（ms）
 
 # 工具栏相关常量
 TOOLBAR_BUTTON_SIZE = 42  # 工具栏按钮大小（像素）
@@ -912,7 +1023,7 @@ class SettingsDialog(QDialog):
     def init_ui(self):
         """初始化UI"""
         self.setWindowTitle("⚙️ 设置")
-        self.setFixedSize(550, 650)
+        self.setFixedSize(550, 830)
         
         # 从父窗口获取当前主题
         if self.parent_editor and hasattr(self.parent_editor, 'current_theme'):
@@ -1187,12 +1298,23 @@ class SettingsDialog(QDialog):
         self.show_welcome_checkbox.setChecked(True)  # 默认选中
         general_layout.addWidget(self.show_welcome_checkbox)
         
+        # 启动时恢复上次打开的标签页（默认开启）
+        self.restore_session_checkbox = QCheckBox("启动时恢复上次打开的文件")
+        self.restore_session_checkbox.setToolTip("开启后，启动时恢复上次退出时打开的文件、光标和滚动位置；\n未激活的标签页在首次切换到时才加载")
+        self.restore_session_checkbox.setChecked(True)  # 默认选中
+        general_layout.addWidget(self.restore_session_checkbox)
+        
         # 同步滚动开关（默认开启）
         self.sync_scroll_checkbox = QCheckBox("启用同步滚动")
         self.sync_scroll_checkbox.setToolTip("开启后，编辑器和预览窗的滚动位置将同步")
         self.sync_scroll_checkbox.setChecked(True)  # 默认选中
         general_layout.addWidget(self.sync_scroll_checkbox)
         
+        # 字数统计是否计入 Markdown 标记（默认计入）
+        self.stats_exclude_markup_checkbox = QCheckBox("字数统计不计入 Markdown 标记")
+        self.stats_exclude_markup_checkbox.setToolTip("开启后，统计字数和字符时忽略 #、**、链接地址、HTML 标签等标记")
+        general_layout.addWidget(self.stats_exclude_markup_checkbox)
+        
         # 快捷键设置
         hotkey_layout = QHBoxLayout()
         hotkey_label = QLabel("工具栏快捷键：")
@@ -1209,6 +1331,56 @@ class SettingsDialog(QDialog):
         general_group.setLayout(general_layout)
         layout.addWidget(general_group)
         
+        # 性能设置组
+        performance_group = QGroupBox("性能")
+        performance_layout = QVBoxLayout()
+        
+        # 标签页休眠时间
+        hibernate_after_layout = QHBoxLayout()
+        hibernate_after_label = QLabel("不活跃标签页休眠：")
+        self.hibernate_after_spinbox = QSpinBox()
+        self.hibernate_after_spinbox.setRange(0, 1440)
+        self.hibernate_after_spinbox.setValue(DEFAULT_HIBERNATE_AFTER_MINUTES)
+        self.hibernate_after_spinbox.setSuffix(" 分钟")
+        self.hibernate_after_spinbox.setSpecialValueText("从不")
+        self.hibernate_after_spinbox.setMinimumWidth(100)
+        self.hibernate_after_spinbox.setToolTip("标签页在后台超过该时间后释放编辑器和预览，切换回来时自动恢复")
+        hibernate_after_layout.addWidget(hibernate_after_label)
+        hibernate_after_layout.addWidget(self.hibernate_after_spinbox)
+        hibernate_after_layout.addStretch()
+        performance_layout.addLayout(hibernate_after_layout)
+        
+        # 标签页内存预算
+        hibernate_budget_layout = QHBoxLayout()
+        hibernate_budget_label = QLabel("标签页内存预算：")
+        self.hibernate_budget_spinbox = QSpinBox()
+        self.hibernate_budget_spinbox.setRange(0, 16384)
+        self.hibernate_budget_spinbox.setSingleStep(64)
+        self.hibernate_budget_spinbox.setValue(DEFAULT_HIBERNATE_BUDGET_MB)
+        self.hibernate_budget_spinbox.setSuffix(" MB")
+        self.hibernate_budget_spinbox.setSpecialValueText("不限制")
+        self.hibernate_budget_spinbox.setMinimumWidth(100)
+        self.hibernate_budget_spinbox.setToolTip("超出预算时，优先休眠最久未使用的标签页")
+        hibernate_budget_layout.addWidget(hibernate_budget_label)
+        hibernate_budget_layout.addWidget(self.hibernate_budget_spinbox)
+        hibernate_budget_layout.addStretch()
+        performance_layout.addLayout(hibernate_budget_layout)
+        
+        # 预览渲染缓存
+        render_cache_layout = QHBoxLayout()
+        self.render_cache_label = QLabel()
+        self.render_cache_label.setToolTip("重新打开未修改的文档时直接显示缓存的预览，后台渲染完成后再校验更新")
+        clear_render_cache_btn = QPushButton("清除缓存")
+        clear_render_cache_btn.clicked.connect(self.clear_render_cache)
+        render_cache_layout.addWidget(self.render_cache_label)
+        render_cache_layout.addWidget(clear_render_cache_btn)
+        render_cache_layout.addStretch()
+        performance_layout.addLayout(render_cache_layout)
+        self.update_render_cache_label()
+        
+        performance_group.setLayout(performance_layout)
+        layout.addWidget(performance_group)
+        
         # 弹性空间
         layout.addStretch()
         
@@ -1286,13 +1458,27 @@ class SettingsDialog(QDialog):
         show_welcome = self.settings.value("show_welcome", True, type=bool)
         self.show_welcome_checkbox.setChecked(show_welcome)
         
+        # 加载恢复会话设置
+        restore_session = self.settings.value("session/restore", True, type=bool)
+        self.restore_session_checkbox.setChecked(restore_session)
+        
         # 加载同步滚动设置
         sync_scroll = self.settings.value("sync_scroll", True, type=bool)
         self.sync_scroll_checkbox.setChecked(sync_scroll)
         
+        # 加载字数统计设置
+        stats_exclude_markup = self.settings.value("stats/exclude_markup", False, type=bool)
+        self.stats_exclude_markup_checkbox.setChecked(stats_exclude_markup)
+        
         # 加载编辑器字号设置
         font_size = self.settings.value("editor/font_size", 15, type=int)
         self.font_size_spinbox.setValue(font_size)
+        
+        # 加载标签页休眠设置
+        hibernate_after = self.settings.value("performance/hibernate_after_minutes", DEFAULT_HIBERNATE_AFTER_MINUTES, type=int)
+        self.hibernate_after_spinbox.setValue(hibernate_after)
+        hibernate_budget = self.settings.value("performance/hibernate_budget_mb", DEFAULT_HIBERNATE_BUDGET_MB, type=int)
+        self.hibernate_budget_spinbox.setValue(hibernate_budget)
     
     def on_theme_mode_changed(self, index):
         """主题模式改变事件"""
@@ -1321,6 +1507,23 @@ class SettingsDialog(QDialog):
         self.dark_theme_combo.setEnabled(True)
         self.light_theme_combo.setEnabled(True)
     
+    def _render_cache(self):
+        """获取渲染缓存（优先使用主窗口的实例，保持其索引一致）"""
+        cache = getattr(self.parent_editor, 'render_cache', None)
+        if cache is None:
+            cache = RenderCache(join(dirname(self.settings.fileName()), RENDER_CACHE_DIR_NAME))
+        return cache
+    
+    def update_render_cache_label(self):
+        """显示渲染缓存占用的空间"""
+        size_mb = self._render_cache().total_size() / (1024 * 1024)
+        self.render_cache_label.setText(f"预览渲染缓存：{size_mb:.1f} MB")
+    
+    def clear_render_cache(self):
+        """清除预览渲染缓存（立即生效）"""
+        self._render_cache().clear()
+        self.update_render_cache_label()
+    
     def on_hotkey_input_click(self, event):
         """点击快捷键输入框时开始捕获键盘"""
         self.hotkey_input.clear()
@@ -1473,6 +1676,13 @@ class SettingsDialog(QDialog):
                 log_exception(type(e), e, e.__traceback__, "保存显示欢迎对话框设置")
                 raise
             
+            # 保存恢复会话设置（下次启动时生效）
+            try:
+                self.settings.setValue("session/restore", self.restore_session_checkbox.isChecked())
+            except Exception as e:
+                log_exception(type(e), e, e.__traceback__, "保存恢复会话设置")
+                raise
+            
             # 保存同步滚动设置
             try:
                 sync_scroll = self.sync_scroll_checkbox.isChecked()
@@ -1483,6 +1693,14 @@ class SettingsDialog(QDialog):
                 log_exception(type(e), e, e.__traceback__, "保存同步滚动设置")
                 raise
             
+            # 保存字数统计设置
+            try:
+                stats_exclude_markup = self.stats_exclude_markup_checkbox.isChecked()
+                self.settings.setValue("stats/exclude_markup", stats_exclude_markup)
+            except Exception as e:
+                log_exception(type(e), e, e.__traceback__, "保存字数统计设置")
+                raise
+            
             # 保存编辑器字号设置
             try:
                 font_size = self.font_size_spinbox.value()
@@ -1493,6 +1711,18 @@ class SettingsDialog(QDialog):
                 log_exception(type(e), e, e.__traceback__, "保存编辑器字号设置")
                 raise
             
+            # 保存标签页休眠设置
+            try:
+                hibernate_after = self.hibernate_after_spinbox.value()
+                hibernate_budget = self.hibernate_budget_spinbox.value()
+                if logger:
+                    logger.debug(f"保存休眠设置: after={hibernate_after}, budget={hibernate_budget}")
+                self.settings.setValue("performance/hibernate_after_minutes", hibernate_after)
+                self.settings.setValue("performance/hibernate_budget_mb", hibernate_budget)
+            except Exception as e:
+                log_exception(type(e), e, e.__traceback__, "保存休眠设置")
+                raise
+            
             # 注意：不调用 sync()，让 QSettings 自动同步
             # 在打包后的环境中，sync() 可能会阻塞或导致崩溃
             # QSettings 会在对象销毁时自动同步到磁盘，所以不需要手动调用 sync()
@@ -1514,6 +1744,8 @@ class SettingsDialog(QDialog):
                     self.parent_editor.reload_toolbar_shortcut(hotkey)
                     self.parent_editor.update_editor_font_size(font_size)
                     self.parent_editor.update_sync_scroll_setting(sync_scroll)
+                    self.parent_editor.update_statistics_settings(stats_exclude_markup)
+                    self.parent_editor.update_hibernation_settings(hibernate_after, hibernate_budget)
                     if logger:
                         logger.info("父窗口设置更新完成")
                 except Exception as e:
@@ -2057,6 +2289,7 @@ class WelcomeDialog(QDialog):
             ("Ctrl+O", "打开文件"),
             ("Ctrl+S", "保存文件"),
             ("Ctrl+Shift+S", "另存为"),
+            ("Ctrl+Alt+S", "全部保存"),
             ("Ctrl+Z", "撤销"),
             ("Ctrl+Y", "重做"),
             ("Ctrl+A", "全选"),
@@ -2180,136 +2413,1033 @@ class WelcomeDialog(QDialog):
         self.accept()
 
 
-class MarkdownHighlighter(QSyntaxHighlighter):
-    """Markdown语法高亮器 - 柔和配色，简化正则"""
+_code_lexers = {}  # 语言名 -> Pygments 词法分析器（未知语言为 None），各线程共用
+
+
+class CodeLexSignals(QObject):
+    """代码块词法分析任务的信号"""
+    lexed = pyqtSignal(object)  # {CodeLexRequest: 各行的 ((起点, 长度, 记号类型), ...)，分析失败时为 None}
+
+
+class CodeLexRequest:
+    """一次代码块词法分析请求：从 cursor 所在块开始的连续若干行"""
+    
+    def __init__(self, language, cursor):
+        self.language = language  # 语言编号
+        self.cursor = cursor  # 第一行的 QTextCursor
+        self.hashes = ()  # 提交时各行文本的哈希，结果返回时据此判断行内容是否已变化
+        self.key = None  # 缓存键（语言编号, 分析文本的哈希）
+        self.done = False
+
+
+class CodeLineData(QTextBlockUserData):
+    """代码块中一行的词法分析结果（整段分析后按行切分，跨行的字符串、注释等能正确识别）"""
+    
+    def __init__(self, language):
+        super().__init__()
+        self.language = language
+        self.text_hash = None  # tokens 对应的行文本哈希
+        self.tokens = None  # ((起点, 长度, 记号类型), ...)，尚未分析时为 None
+        self.request = None  # 包含本行、尚未返回的请求
+
+
+class CodeLexTask(QRunnable):
+    """在线程池中用 Pygments 对围栏代码块做词法分析，再按行切分记号（未安装 Pygments 或语言未知时结果为空）"""
+    
+    def __init__(self, requests, signals):
+        """
+        Args:
+            requests: [(CodeLexRequest, 语言名, [行文本, ...]), ...]
+            signals: 接收结果的 CodeLexSignals（属于高亮器，随其一同销毁）
+        """
+        super().__init__()
+        self.requests = requests
+        self.signals = signals
+    
+    def run(self):
+        try:
+            from pygments.lexers import get_lexer_by_name
+            from pygments.util import ClassNotFound
+        except ImportError:
+            get_lexer_by_name = None
+        results = {}
+        for request, language, lines in self.requests:
+            try:
+                if language not in _code_lexers and get_lexer_by_name is not None:
+                    try:
+                        _code_lexers[language] = get_lexer_by_name(language)
+                    except ClassNotFound:
+                        _code_lexers[language] = None
+                lexer = _code_lexers.get(language)
+                results[request] = self.split_tokens(lexer, lines) if lexer is not None else ((),) * len(lines)
+            except Exception as e:
+                log_exception(type(e), e, e.__traceback__, "代码块词法分析")
+                results[request] = None
+        try:
+            self.signals.lexed.emit(results)
+        except RuntimeError:
+            pass  # 高亮器（编辑器）已销毁
+    
+    @staticmethod
+    def split_tokens(lexer, lines):
+        """分析整段文本，把记号按行切开（跨行的记号在每行各占一段），返回每行的记号元组"""
+        text = '\n'.join(lines)
+        line_starts = []
+        position = 0
+        for line in lines:
+            line_starts.append(position)
+            position += len(line) + 1
+        per_line = [[] for _ in lines]
+        line = 0
+        for index, token_type, value in lexer.get_tokens_unprocessed(text):
+            if not value or value.isspace():
+                continue
+            end = index + len(value)
+            while index < end:
+                while line + 1 < len(lines) and line_starts[line + 1] <= index:
+                    line += 1
+                line_end = line_starts[line] + len(lines[line])
+                piece_end = min(end, line_end)
+                if piece_end > index and not text[index:piece_end].isspace():
+                    per_line[line].append((index - line_starts[line], piece_end - index, token_type))
+                index = piece_end + 1 if piece_end == line_end else piece_end
+        return tuple(tuple(tokens) for tokens in per_line)
+
+
+class MarkdownHighlighter(QObject):
+    """Markdown语法高亮器 - 柔和配色
+    
+    每个文本块只扫描一次：先用 BLOCK_PATTERN 识别行首的块级语法（标题、引用、列表等），
+    再用 INLINE_PATTERN 从左到右扫描行内语法。组合正则中各分支按优先级排列，
+    同一位置先匹配的分支生效，得到互不重叠的格式区间。
+    
+    围栏代码块、公式块和 HTML 块跨越多行，通过块状态（QTextBlock.userState）记录，
+    块内不再匹配行内语法。围栏开启或关闭导致后续块的状态变化时，
+    只继续重新扫描到状态不再变化的位置。
+    
+    超过 HIGHLIGHT_MAX_LINE_LENGTH 的行（如压缩后的 HTML、base64 图片）只保留块级格式，
+    避免行内正则在未闭合的标记上反复回溯。
+    
+    不使用 QSyntaxHighlighter：它对变化范围内的每个块都调用一次 Python 的 highlightBlock
+    （打开文件时是全部的块），而在 contentsChange 之外修改块的格式后，QTextEdit 重新布局的开销
+    与其后的块数成正比（10 万行约 60-100ms），无法按块分批。因此直接设置块的格式：
+    - 内容变化时在 contentsChange 中扫描变化的块并设置格式，布局失效合并到本次编辑的重新布局中；
+      不可见的块超出 HIGHLIGHT_SLICE_MS 后推迟，可见的块和光标所在块总是立即处理
+    - 推迟的部分在空闲时按顺序只计算块状态（不修改格式，不需要重新布局），每次最多 HIGHLIGHT_SLICE_MS
+    - 块状态中的 FORMATTED 标志表示块的格式与前一块的状态一致；滚动、尺寸变化时
+      为可见区域中没有该标志的块设置格式，只标记一次布局失效
+    进度用 QTextCursor 记录，编辑后位置自动调整；编辑器隐藏时暂停，重新显示时继续。
+    
+    带语言标记的围栏代码块按行交给线程池中的 Pygments 做词法分析，结果按（语言, 文本哈希）缓存，
+    返回后再应用到等待的块上。围栏的语言编号记录在块状态的高位，编辑代码块中的一行只重新分析这一行。
+    """
+    
+    # 块状态
+    STATE_NORMAL = 0
+    STATE_FENCE_BACKTICK = 1  # ``` 围栏代码块内
+    STATE_FENCE_TILDE = 2  # ~~~ 围栏代码块内
+    STATE_MATH = 3  # $$ 公式块内
+    STATE_HTML = 4  # HTML 块内（到空行结束）
+    STATE_HTML_COMMENT = 5  # HTML 注释内（到 --> 结束）
+    STATE_MASK = 0x7  # 块状态的低位为上面的状态，高位为围栏代码块的语言编号
+    LANGUAGE_SHIFT = 3
+    FORMATTED = 1 << 30  # 保存的块状态中的标志：块的格式按前一块当前的状态设置，仍然有效
+    _language_ids = {}  # 语言名 -> 编号（从 1 开始，进程内所有文档共用）
+    _language_names = ['']
+    
+    FENCE_PATTERN = compile(r'\s{0,3}(`{3,}|~{3,})(.*)')
+    HTML_BLOCK_PATTERN = compile(
+        r'\s{0,3}<(?:!--|/?(?:address|article|aside|blockquote|center|details|dialog|div|dl|fieldset|figcaption|figure|'
+        r'footer|form|h[1-6]|header|hr|iframe|main|nav|ol|p|pre|script|section|style|summary|table|tbody|td|tfoot|th|'
+        r'thead|tr|ul)(?=[\s/>]|$))',
+        IGNORECASE
+    )
+    # 块级语法（只在行首匹配一次）
+    BLOCK_PATTERN = compile(
+        r'(?P<hr>[-*]{3,}$)'
+        r'|(?P<toc>(?i:\[TOC\])$)'
+        r'|(?P<header>#{1,6}\s.*)'
+        r'|(?P<table>\|.*\|$)'
+        r'|(?P<quote>>+.*)'
+        r'|(?P<list>\s*(?:[-*+]|\d+\.)\s)'
+    )
+    # 行内语法（先用前瞻快速跳过不可能开始匹配的字符）
+    INLINE_PATTERN = compile(
+        r'(?=[`$\\*~=\[^])(?:'
+        r'(?P<code>`.+?`)'
+        r'|(?P<math>\$[^$]+\$|\\\([^)]+\\\))'
+        r'|(?P<bolditalic>\*\*\*.+?\*\*\*)'
+        r'|(?P<bold>\*\*.+?\*\*)'
+        r'|(?P<italic>\*.+?\*)'
+        r'|(?P<strikethrough>~~.+?~~)'
+        r'|(?P<subscript>~[^~]+~)'
+        r'|(?P<highlight>==.+?==)'
+        r'|(?P<footnote>\[\^\w+\])'
+        r'|(?P<link>\[[^\]]+\]\([^)]+\))'
+        r'|(?P<superscript>\^[^^]+\^)'
+        r')'
+    )
+    LITERAL_BLOCKS = frozenset(('hr', 'toc'))  # 整行按块格式显示，不再扫描行内语法
+    MARKER_BLOCKS = frozenset(('list',))  # 只高亮行首标记，其后的内容继续扫描行内语法
     
     def __init__(self, parent=None):
+        """
+        Args:
+            parent: QTextDocument；传入 QTextEdit 时高亮其文档并启用分片高亮
+        """
         super().__init__(parent)
-        self.highlighting_rules = []
+        self.formats = {}
+        
+        # 分片高亮状态
+        self._document = None
+        self._editor = None
+        self._pending_cursor = None  # 尚未按顺序计算块状态的第一个文本块（None 表示已全部完成）
+        self._pending_end = None  # 推迟的变化范围的结尾，按顺序处理到这里之前不视为状态收敛
+        self._visible_range = (0, -1)  # 可见区域的字符位置范围
+        self._cursor_position = 0  # 编辑器光标位置
+        self._invalidate_ms = 0.0  # 上次在 contentsChange 之外标记布局失效的耗时
+        self._resume_timer = QTimer(self)  # 空闲时继续计算剩余部分的块状态
+        self._resume_timer.setSingleShot(True)
+        self._resume_timer.timeout.connect(self.resume_highlighting)
+        self._visible_timer = QTimer(self)  # 推迟后补上可见区域中的块
+        self._visible_timer.setSingleShot(True)
+        self._visible_timer.timeout.connect(self.highlight_visible_blocks)
+        
+        # 代码块词法分析
+        self._code_style = CODE_STYLE_DARK
+        self._token_formats = {}  # Pygments 记号类型 -> QTextCharFormat（随配色重建）
+        self._code_tokens = {}  # (语言编号, 分析文本的哈希) -> 各行的 ((起点, 长度, 记号类型), ...)
+        self._code_token_lines = 0  # 缓存中的总行数
+        self._lex_queue = []  # 待提交的词法分析请求 [(CodeLexRequest, 语言名, [行文本, ...])]
+        self._lex_signals = CodeLexSignals(self)
+        self._lex_signals.lexed.connect(self._on_code_lexed)
+        self._lex_timer = QTimer(self)  # 同一轮事件循环中的请求合并为一个任务
+        self._lex_timer.setSingleShot(True)
+        self._lex_timer.timeout.connect(self._submit_lex_requests)
         
         # 标题 (# ## ### 等) - 深灰蓝色
         header_format = QTextCharFormat()
         header_format.setForeground(QColor("#4a6785"))
         header_format.setFontWeight(QFont.Weight.Bold)
-        self.highlighting_rules.append((compile(r'^#{1,6}\s.*'), header_format))
+        self.formats['header'] = header_format
         
         # 粗体 (**text**) - 深棕色
         bold_format = QTextCharFormat()
         bold_format.setForeground(QColor("#7a5230"))
         bold_format.setFontWeight(QFont.Weight.Bold)
-        self.highlighting_rules.append((compile(r'\*\*.+?\*\*'), bold_format))
+        self.formats['bold'] = bold_format
         
         # 斜体 (*text*) - 深紫色
         italic_format = QTextCharFormat()
         italic_format.setForeground(QColor("#6b5b7a"))
         italic_format.setFontItalic(True)
-        self.highlighting_rules.append((compile(r'\*.+?\*'), italic_format))
+        self.formats['italic'] = italic_format
         
         # 行内代码 (`code`) - 深绿色
         code_format = QTextCharFormat()
         code_format.setForeground(QColor("#4a7a5a"))
-        self.highlighting_rules.append((compile(r'`.+?`'), code_format))
+        self.formats['code'] = code_format
         
         # 代码块标记 (```) - 深灰绿色
         codeblock_format = QTextCharFormat()
         codeblock_format.setForeground(QColor("#5a7a6a"))
-        self.highlighting_rules.append((compile(r'^```.*'), codeblock_format))
+        self.formats['codeblock'] = codeblock_format
         
         # 链接 [text](url) - 深青色
         link_format = QTextCharFormat()
         link_format.setForeground(QColor("#3a6a7a"))
-        self.highlighting_rules.append((compile(r'\[.+?\]\(.+?\)'), link_format))
+        self.formats['link'] = link_format
         
-        # 列表标记 (- * +) - 深橙色
+        # 列表标记 (- * + 1.) - 深橙色
         list_format = QTextCharFormat()
         list_format.setForeground(QColor("#8a6a4a"))
         list_format.setFontWeight(QFont.Weight.Bold)
-        self.highlighting_rules.append((compile(r'^\s*[-*+]\s'), list_format))
-        self.highlighting_rules.append((compile(r'^\s*\d+\.\s'), list_format))
+        self.formats['list'] = list_format
         
         # 引用 (>) - 深灰色
         quote_format = QTextCharFormat()
         quote_format.setForeground(QColor("#6a6a6a"))
-        self.highlighting_rules.append((compile(r'^>+.*'), quote_format))
+        self.formats['quote'] = quote_format
         
         # 删除线 (~~text~~) - 灰色
         strikethrough_format = QTextCharFormat()
         strikethrough_format.setForeground(QColor("#7a7a7a"))
-        self.highlighting_rules.append((compile(r'~~.+?~~'), strikethrough_format))
+        self.formats['strikethrough'] = strikethrough_format
         
         # 高亮 (==text==) - 深黄色
         highlight_format = QTextCharFormat()
         highlight_format.setForeground(QColor("#7a6a3a"))
-        self.highlighting_rules.append((compile(r'==.+?=='), highlight_format))
+        self.formats['highlight'] = highlight_format
         
         # 分割线 (--- 或 ***) - 灰色
         hr_format = QTextCharFormat()
         hr_format.setForeground(QColor("#999999"))
-        self.highlighting_rules.append((compile(r'^[-*]{3,}$'), hr_format))
+        self.formats['hr'] = hr_format
         
-        # 数学公式 $...$ - 深蓝色
+        # 数学公式 $...$ 和 \(...\) - 深蓝色
         math_format = QTextCharFormat()
         math_format.setForeground(QColor("#5a6a8a"))
-        self.highlighting_rules.append((compile(r'\$[^$]+\$'), math_format))
-        self.highlighting_rules.append((compile(r'\\\([^)]+\\\)'), math_format))
+        self.formats['math'] = math_format
         
         # 公式块标记 $$ - 深蓝色
         mathblock_format = QTextCharFormat()
         mathblock_format.setForeground(QColor("#4a5a7a"))
         mathblock_format.setFontWeight(QFont.Weight.Bold)
-        self.highlighting_rules.append((compile(r'^\$\$'), mathblock_format))
+        self.formats['mathblock'] = mathblock_format
         
         # 脚注 [^1] - 深青色
         footnote_format = QTextCharFormat()
         footnote_format.setForeground(QColor("#4a7a7a"))
-        self.highlighting_rules.append((compile(r'\[\^\w+\]'), footnote_format))
+        self.formats['footnote'] = footnote_format
         
         # 目录标记 [TOC] - 深橙色
         toc_format = QTextCharFormat()
         toc_format.setForeground(QColor("#8a5a4a"))
         toc_format.setFontWeight(QFont.Weight.Bold)
-        self.highlighting_rules.append((compile(r'^\[TOC\]$', IGNORECASE), toc_format))
+        self.formats['toc'] = toc_format
         
         # 上标 ^text^ - 深紫色
         superscript_format = QTextCharFormat()
         superscript_format.setForeground(QColor("#7a5a8a"))
-        self.highlighting_rules.append((compile(r'\^[^^]+\^'), superscript_format))
+        self.formats['superscript'] = superscript_format
         
         # 下标 ~text~ - 深青色
         subscript_format = QTextCharFormat()
         subscript_format.setForeground(QColor("#5a7a8a"))
-        self.highlighting_rules.append((compile(r'~[^~]+~'), subscript_format))
+        self.formats['subscript'] = subscript_format
         
-        # 表格分隔符 | - 深灰色
+        # 表格行 | ... | - 深灰色
         table_format = QTextCharFormat()
         table_format.setForeground(QColor("#6a6a6a"))
-        self.highlighting_rules.append((compile(r'^\|.*\|$'), table_format))
-        self.highlighting_rules.append((compile(r'^\|[-:| ]+\|$'), table_format))
+        self.formats['table'] = table_format
         
         # 粗斜体 ***text*** - 深棕色加粗斜体
         bolditalic_format = QTextCharFormat()
         bolditalic_format.setForeground(QColor("#6a4a30"))
         bolditalic_format.setFontWeight(QFont.Weight.Bold)
         bolditalic_format.setFontItalic(True)
-        self.highlighting_rules.append((compile(r'\*\*\*.+?\*\*\*'), bolditalic_format))
+        self.formats['bolditalic'] = bolditalic_format
+        
+        # HTML 块 - 灰褐色
+        html_format = QTextCharFormat()
+        html_format.setForeground(QColor("#8a6a6a"))
+        self.formats['html'] = html_format
+        
+        if isinstance(parent, QTextEdit):
+            self.attach_editor(parent)
+        elif isinstance(parent, QTextDocument):
+            self.setDocument(parent)
+    
+    def document(self):
+        """正在高亮的文档（没有时为 None）"""
+        return self._document
+    
+    def setDocument(self, document):
+        """设置要高亮的文档（None 表示停止高亮）；已有内容时从头按顺序处理"""
+        if self._document is not None:
+            self._document.contentsChange.disconnect(self._on_contents_change)
+        self._document = document
+        self._pending_cursor = None
+        if document is None:
+            return
+        document.contentsChange.connect(self._on_contents_change)
+        if not document.isEmpty():
+            self._defer(document.begin(), False, document.characterCount())
+    
+    def attach_editor(self, editor):
+        """关联显示文档的编辑器，启用按可见区域优先、按时间分片的高亮"""
+        self._editor = editor
+        self.setDocument(editor.document())
+        editor.verticalScrollBar().valueChanged.connect(self.highlight_visible_blocks)
+        editor.cursorPositionChanged.connect(self._on_cursor_position_changed)
+        editor.installEventFilter(self)
+    
+    def eventFilter(self, obj, event):
+        """编辑器显示时继续后台高亮，尺寸变化时补上新露出的块"""
+        if obj is self._editor:
+            if event.type() == QEvent.Type.Show:
+                self._resume_timer.start(0)
+            elif event.type() == QEvent.Type.Resize:
+                self._visible_timer.start(0)
+        return False
+    
+    def is_highlight_pending(self):
+        """是否还有尚未按顺序计算块状态的文本块"""
+        return self._pending_cursor is not None
+    
+    def _on_cursor_position_changed(self):
+        """记录光标位置（光标所在的块总是立即高亮）"""
+        self._cursor_position = self._editor.textCursor().position()
+    
+    def _update_visible_range(self):
+        """记录编辑器可见区域对应的字符位置范围
+        
+        Returns:
+            (第一个可见块, 最后一个可见块)
+        """
+        viewport = self._editor.viewport()
+        first = self._editor.cursorForPosition(QPoint(0, 0)).block()
+        last = self._editor.cursorForPosition(QPoint(0, max(viewport.height() - 1, 0))).block()
+        self._visible_range = (first.position(), last.position() + last.length())
+        return first, last
+    
+    def _is_visible(self, block):
+        """块是否在可见区域内或是光标所在的块（没有关联编辑器时所有块都视为可见）"""
+        if self._editor is None:
+            return True
+        position = block.position()
+        first, last = self._visible_range
+        return first <= position < last or position <= self._cursor_position < position + block.length()
     
-    def highlightBlock(self, text):
-        """对每个文本块应用高亮规则"""
-        for pattern, fmt in self.highlighting_rules:
+    def _end_state(self, block):
+        """块结束时保存的状态（无效的块或尚未扫描过的块为 -1）"""
+        if not block.isValid():
+            return -1
+        state = block.userState()
+        return state & ~self.FORMATTED if state >= 0 else -1
+    
+    def _update_block(self, block, state, stale, apply_format):
+        """按开始状态重新扫描一个块，保存结束状态
+        
+        Args:
+            state: 前一块结束时的状态
+            stale: 块现有的格式是否已失效（内容或开始状态变化）
+            apply_format: 格式无效时是否设置格式；否则只计算块状态，清除格式有效标志，显示时再设置
+        
+        Returns:
+            (本块结束时的状态, 结束状态是否变化, 是否设置了格式)
+        """
+        saved = block.userState()
+        formatted = saved >= 0 and not stale and saved & self.FORMATTED
+        applied = False
+        if formatted or not apply_format:
+            new_state = self.block_state(block.text(), state)
+        else:
+            new_state, spans = self.tokenize_block(block.text(), state, block)
+            block.layout().setFormats(self._format_ranges(spans))
+            formatted = applied = True
+        block.setUserState(new_state | self.FORMATTED if formatted else new_state)
+        return new_state, saved < 0 or new_state != saved & ~self.FORMATTED, applied
+    
+    def _clear_formatted(self, block):
+        """清除块的格式有效标志（显示时重新设置格式）"""
+        if block.isValid() and block.userState() >= 0:
+            block.setUserState(block.userState() & ~self.FORMATTED)
+    
+    def _defer(self, block, stale, end_position=0):
+        """从 block 开始推迟到空闲时按顺序处理
+        
+        Args:
+            block: 第一个未处理的块
+            stale: block 的开始状态是否已变化
+            end_position: 至少要按顺序处理到的位置（推迟的变化范围的结尾）
+        """
+        if stale:
+            self._clear_formatted(block)
+        document = self._document
+        end_position = min(end_position, document.characterCount() - 1)
+        if end_position > block.position():
+            # 变化范围中只有最后一块可能是原有的块，其余是新插入的块（没有保存的状态）
+            self._clear_formatted(document.findBlock(end_position - 1))
+        if self._pending_cursor is None:
+            self._pending_cursor = QTextCursor(block)
+            self._pending_end = QTextCursor(document)
+        elif block.position() < self._pending_cursor.position():
+            self._pending_cursor.setPosition(block.position())
+        if end_position > self._pending_end.position():
+            self._pending_end.setPosition(end_position)
+        self._resume_timer.start(0)
+        self._visible_timer.start(0)
+    
+    def _invalidate(self, first_position, end_position):
+        """在 contentsChange 之外标记格式变化的块需要重新布局，记录耗时用于估计时间预算"""
+        started = monotonic()
+        self._document.markContentsDirty(first_position, end_position - first_position)
+        self._invalidate_ms = (monotonic() - started) * 1000
+    
+    def _on_contents_change(self, position, chars_removed, chars_added):
+        """内容变化：重新扫描变化的块并设置格式，直到块状态不再变化
+        
+        此时设置格式不需要单独重新布局。不可见的块超出 HIGHLIGHT_SLICE_MS 后推迟到空闲时处理。
+        """
+        document = self._document
+        block = document.findBlock(position)
+        if not block.isValid():
+            return
+        last = document.findBlock(position + chars_added + (1 if chars_removed > 0 else 0))
+        end_position = last.position() + last.length() if last.isValid() else document.characterCount()
+        deadline = monotonic() + HIGHLIGHT_SLICE_MS / 1000
+        state = self._end_state(block.previous())
+        changed = True
+        while block.isValid():
+            in_range = block.position() < end_position
+            if not (in_range or changed):
+                return
+            if monotonic() >= deadline and not self._is_visible(block):
+                self._defer(block, changed, end_position)
+                return
+            state, changed, _ = self._update_block(block, state, in_range or changed, True)
+            block = block.next()
+    
+    def resume_highlighting(self):
+        """从记录的进度继续按顺序计算块状态，每次最多 HIGHLIGHT_SLICE_MS（编辑器隐藏时暂停）
+        
+        只为可见区域中格式失效的块设置格式。设置格式后需要重新布局，上次重新布局的耗时计入时间预算：
+        剩余预算不够时可见的块留到下一轮开始处理，开始设置格式后处理完连续的可见块再结束本轮。
+        """
+        if self._pending_cursor is None or (self._editor is not None and not self._editor.isVisible()):
+            return
+        block = self._pending_cursor.block()
+        end_position = self._pending_end.position()
+        self._pending_cursor = None
+        started = monotonic()
+        deadline = started + HIGHLIGHT_SLICE_MS / 1000
+        first_position = None
+        slice_start = block.position()
+        state = self._end_state(block.previous())
+        changed = False  # 推迟时已清除开始状态变化的块的格式有效标志
+        while block.isValid():
+            visible = self._is_visible(block)
+            if (visible and first_position is None and block.position() > slice_start
+                    and monotonic() + self._invalidate_ms / 1000 >= deadline):
+                self._defer(block, changed)
+                break
+            state, changed, applied = self._update_block(block, state, changed, visible)
+            if applied:
+                if first_position is None:
+                    first_position = block.position()
+                formatted_end = block.position() + block.length()
+            block_end = block.position() + block.length()
+            block = block.next()
+            if not changed and block_end >= end_position:
+                break
+            if (block.isValid() and monotonic() >= deadline
+                    and not (first_position is not None and self._is_visible(block))):
+                self._defer(block, changed)
+                break
+        if first_position is not None:
+            self._invalidate(first_position, formatted_end)
+        if self._pending_cursor is None:
+            self._visible_timer.start(0)  # 布局尚未完成时可见区域可能不准确，最后再补上
+        GuiActivityLog.record("分片高亮", started)
+    
+    def highlight_visible_blocks(self):
+        """为可见区域及其上下各一屏中格式失效的块设置格式，只标记一次布局失效
+        
+        重新布局的开销主要与其后的块数有关，顺带处理相邻的块，逐行滚动时不必每次都重新布局。
+        按顺序尚未处理到的块按前一块已保存的状态临时处理，按顺序处理到时状态不同会再校正。
+        """
+        if self._editor is None or self._document is None:
+            return
+        first, last = self._update_visible_range()
+        if last.blockNumber() < first.blockNumber():
+            return  # 布局尚未完成
+        page = last.blockNumber() - first.blockNumber() + 1
+        document = self._document
+        block = document.findBlockByNumber(max(first.blockNumber() - page, 0))
+        last = document.findBlockByNumber(min(last.blockNumber() + page, document.blockCount() - 1))
+        started = monotonic()
+        first_position = None
+        state = self._end_state(block.previous())
+        changed = False
+        while block.isValid() and block.position() <= last.position():
+            state, changed, applied = self._update_block(block, state, changed, True)
+            if applied:
+                if first_position is None:
+                    first_position = block.position()
+                end_position = block.position() + block.length()
+            block = block.next()
+        if changed and block.isValid():
+            self._defer(block, True)
+        if first_position is not None:
+            self._invalidate(first_position, end_position)
+            GuiActivityLog.record("可见块高亮", started)
+    
+    def rehighlight(self):
+        """同步重新扫描整个文档并设置所有块的格式"""
+        document = self._document
+        if document is None:
+            return
+        self._pending_cursor = None
+        state = -1
+        block = document.begin()
+        while block.isValid():
+            state, spans = self.tokenize_block(block.text(), state, block)
+            block.layout().setFormats(self._format_ranges(spans))
+            block.setUserState(state | self.FORMATTED)
+            block = block.next()
+        self._invalidate(0, document.characterCount())
+    
+    @staticmethod
+    def _format_ranges(spans):
+        """把后者覆盖前者的格式区间转换为互不重叠的 QTextLayout.FormatRange 列表（与 setFormat 的效果一致）"""
+        ranges = []
+        for start, length, text_format in spans:
+            end = start + length
+            kept = []
+            for item in ranges:
+                item_end = item.start + item.length
+                if item_end <= start or item.start >= end:
+                    kept.append(item)
+                    continue
+                if item.start < start:
+                    kept.append(_format_range(item.start, start - item.start, item.format))
+                if item_end > end:
+                    kept.append(_format_range(end, item_end - end, item.format))
+            kept.append(_format_range(start, length, text_format))
+            ranges = kept
+        return ranges
+    
+    def tokenize_block(self, text, state, block=None):
+        """扫描一个文本块
+        
+        Args:
+            text: 文本块内容
+            state: 前一块结束时的块状态（-1 视为普通状态）
+            block: 对应的 QTextBlock（代码块词法分析结果返回后据此重新应用），可为 None
+        
+        Returns:
+            (本块结束时的块状态, [(起点, 长度, QTextCharFormat), ...])，后面的区间覆盖前面的
+        """
+        spans = []
+        formats = self.formats
+        if state > self.STATE_NORMAL:
+            return self.tokenize_multiline_block(text, state, spans, block), spans
+        
+        # 多行块的开始
+        fence = self.FENCE_PATTERN.match(text)
+        if fence and not (fence.group(1)[0] == '`' and '`' in fence.group(2)):
+            spans.append((0, len(text), formats['codeblock']))
+            fence_state = self.STATE_FENCE_BACKTICK if fence.group(1)[0] == '`' else self.STATE_FENCE_TILDE
+            return fence_state | (self.language_id(fence.group(2)) << self.LANGUAGE_SHIFT), spans
+        if text.startswith('$$'):
+            spans.append((0, 2, formats['mathblock']))
+            end = text.find('$$', 2)
+            if end < 0:
+                spans.append((2, len(text) - 2, formats['math']))
+                return self.STATE_MATH, spans
+            spans.append((2, end - 2, formats['math']))
+            spans.append((end, 2, formats['mathblock']))
+            return self.STATE_NORMAL, spans
+        if self.HTML_BLOCK_PATTERN.match(text):
+            spans.append((0, len(text), formats['html']))
+            if text.lstrip().startswith('<!--'):
+                return (self.STATE_NORMAL if '-->' in text else self.STATE_HTML_COMMENT), spans
+            return self.STATE_HTML, spans
+        
+        self.tokenize_inline(text, spans)
+        return self.STATE_NORMAL, spans
+    
+    def block_state(self, text, state):
+        """只计算块结束时的状态（与 tokenize_block 的状态转换相同，不扫描行内语法）"""
+        if state > self.STATE_NORMAL:
+            base_state = state & self.STATE_MASK
+            if base_state in (self.STATE_FENCE_BACKTICK, self.STATE_FENCE_TILDE):
+                fence = self.FENCE_PATTERN.match(text)
+                fence_char = '`' if base_state == self.STATE_FENCE_BACKTICK else '~'
+                if fence and fence.group(1)[0] == fence_char and not fence.group(2).strip():
+                    return self.STATE_NORMAL
+                return state
+            if state == self.STATE_MATH:
+                return self.STATE_NORMAL if '$$' in text else state
+            if state == self.STATE_HTML:
+                return state if text.strip() else self.STATE_NORMAL
+            if state == self.STATE_HTML_COMMENT:
+                return self.STATE_NORMAL if '-->' in text else state
+            return self.STATE_NORMAL
+        fence = self.FENCE_PATTERN.match(text)
+        if fence and not (fence.group(1)[0] == '`' and '`' in fence.group(2)):
+            fence_state = self.STATE_FENCE_BACKTICK if fence.group(1)[0] == '`' else self.STATE_FENCE_TILDE
+            return fence_state | (self.language_id(fence.group(2)) << self.LANGUAGE_SHIFT)
+        if text.startswith('$$'):
+            return self.STATE_NORMAL if text.find('$$', 2) >= 0 else self.STATE_MATH
+        if self.HTML_BLOCK_PATTERN.match(text):
+            if text.lstrip().startswith('<!--'):
+                return self.STATE_NORMAL if '-->' in text else self.STATE_HTML_COMMENT
+            return self.STATE_HTML
+        return self.STATE_NORMAL
+    
+    def tokenize_multiline_block(self, text, state, spans, block=None):
+        """扫描多行块内部的文本块，并判断块是否在此结束
+        
+        Returns:
+            本块结束时的块状态
+        """
+        formats = self.formats
+        base_state = state & self.STATE_MASK
+        if base_state in (self.STATE_FENCE_BACKTICK, self.STATE_FENCE_TILDE):
+            fence = self.FENCE_PATTERN.match(text)
+            fence_char = '`' if base_state == self.STATE_FENCE_BACKTICK else '~'
+            if fence and fence.group(1)[0] == fence_char and not fence.group(2).strip():
+                spans.append((0, len(text), formats['codeblock']))
+                return self.STATE_NORMAL
+            spans.append((0, len(text), formats['code']))
+            language = state >> self.LANGUAGE_SHIFT
+            if language and text.strip() and len(text) <= HIGHLIGHT_MAX_LINE_LENGTH:
+                self.add_code_tokens(text, language, spans, block)
+            return state
+        if state == self.STATE_MATH:
+            end = text.find('$$')
+            if end < 0:
+                spans.append((0, len(text), formats['math']))
+                return state
+            spans.append((0, end, formats['math']))
+            spans.append((end, 2, formats['mathblock']))
+            return self.STATE_NORMAL
+        if state == self.STATE_HTML:
+            spans.append((0, len(text), formats['html']))
+            return state if text.strip() else self.STATE_NORMAL
+        if state == self.STATE_HTML_COMMENT:
+            end = text.find('-->')
+            spans.append((0, len(text) if end < 0 else end + 3, formats['html']))
+            return state if end < 0 else self.STATE_NORMAL
+        self.tokenize_inline(text, spans)
+        return self.STATE_NORMAL
+    
+    @classmethod
+    def language_id(cls, info):
+        """围栏信息字符串（如 "python"、"{.js}"）对应的语言编号，没有语言时为 0"""
+        words = info.strip().lstrip('{').split()
+        name = words[0].lstrip('.').rstrip('}').lower() if words else ''
+        if not name:
+            return 0
+        if name not in cls._language_ids:
+            cls._language_ids[name] = len(cls._language_names)
+            cls._language_names.append(name)
+        return cls._language_ids[name]
+    
+    def add_code_tokens(self, text, language, spans, block=None):
+        """追加代码行的 Pygments 记号格式（保存在 block 的 CodeLineData 中）
+        
+        没有结果或本行内容已变化时，对所在代码块整段提交词法分析，结果返回后重新应用到内容变化的各行。
+        代码块中等待结果的行不重复提交；其他行的修改可能改变本行的记号，由那一行的请求一并更新。
+        """
+        if block is None:
+            return
+        text_hash = hash(text)
+        data = block.userData()
+        if not isinstance(data, CodeLineData) or data.language != language:
+            data = None
+        if data is None or data.text_hash != text_hash or data.tokens is None:
+            if data is not None and data.request is not None and not data.request.done:
+                return  # 结果返回时本行内容已变化的话会重新扫描并再次提交
+            self._request_code_lex(block, language)
+            return
+        for start, length, token_type in data.tokens:
+            spans.append((start, length, self.token_format(token_type)))
+    
+    def _request_code_lex(self, block, language):
+        """提交 block 所在代码块的词法分析：从开始围栏之后到结束围栏之前，
+        代码块超过 CODE_LEX_MAX_LINES 行时只分析 block 前后的一段"""
+        state = self._end_state(block.previous())
+        start = block
+        for _ in range(CODE_LEX_MAX_LINES // 2):
+            previous = start.previous()
+            if not previous.isValid() or self._end_state(previous.previous()) != state:
+                break  # previous 是开始围栏
+            start = previous
+        fence_char = '`' if state & self.STATE_MASK == self.STATE_FENCE_BACKTICK else '~'
+        request = CodeLexRequest(language, QTextCursor(start))
+        lines = []
+        hashes = []
+        line_block = start
+        while line_block.isValid() and len(lines) < CODE_LEX_MAX_LINES:
+            text = line_block.text()
+            fence = self.FENCE_PATTERN.match(text)
+            if fence and fence.group(1)[0] == fence_char and not fence.group(2).strip():
+                break
+            # 超长行不参与分析（与不扫描超长行的记号一致），保留行数以便按行对应
+            lines.append(text if len(text) <= HIGHLIGHT_MAX_LINE_LENGTH else '')
+            hashes.append(hash(text))
+            data = line_block.userData()
+            if not isinstance(data, CodeLineData) or data.language != language:
+                data = CodeLineData(language)
+                line_block.setUserData(data)
+            data.request = request
+            line_block = line_block.next()
+        request.hashes = tuple(hashes)
+        request.key = (language, hash('\n'.join(lines)))
+        self._lex_queue.append((request, self._language_names[language], lines))
+        self._lex_timer.start(0)
+    
+    def token_format(self, token_type):
+        """Pygments 记号类型对应的文字格式（按当前配色）"""
+        text_format = self._token_formats.get(token_type)
+        if text_format is None:
+            text_format = QTextCharFormat(self.formats['code'])
             try:
-                for match in pattern.finditer(text):
-                    start = match.start()
-                    length = match.end() - start
-                    self.setFormat(start, length, fmt)
+                from pygments.styles import get_style_by_name
+                style = get_style_by_name(self._code_style).style_for_token(token_type)
             except Exception:
-                pass  # 忽略正则匹配错误
+                style = {}
+            if style.get('color'):
+                text_format.setForeground(QColor('#' + style['color']))
+            if style.get('bold'):
+                text_format.setFontWeight(QFont.Weight.Bold)
+            if style.get('italic'):
+                text_format.setFontItalic(True)
+            self._token_formats[token_type] = text_format
+        return text_format
+    
+    def _submit_lex_requests(self):
+        """把本轮积累的词法分析请求作为一个任务提交到线程池（缓存中已有结果的直接应用）"""
+        requests, self._lex_queue = self._lex_queue, []
+        cached = {}
+        for request, language, lines in requests:
+            line_tokens = self._code_tokens.get(request.key)
+            if line_tokens is not None:
+                cached[request] = line_tokens
+        if cached:
+            self._on_code_lexed(cached)
+        requests = [item for item in requests if item[0] not in cached]
+        if requests:
+            QThreadPool.globalInstance().start(CodeLexTask(requests, self._lex_signals))
+    
+    def _on_code_lexed(self, results):
+        """词法分析结果返回：写入缓存，更新请求中内容未变的行，
+        重新扫描记号变化或内容已变化的行（最后只标记一次布局失效）"""
+        blocks = []
+        for request, line_tokens in results.items():
+            request.done = True
+            if line_tokens is None:
+                line_tokens = ((),) * len(request.hashes)  # 分析失败：按没有记号处理，不再反复提交
+            elif request.key not in self._code_tokens:
+                if self._code_token_lines + len(line_tokens) > CODE_TOKEN_CACHE_SIZE:
+                    self._code_tokens.clear()
+                    self._code_token_lines = 0
+                self._code_tokens[request.key] = line_tokens
+                self._code_token_lines += len(line_tokens)
+            block = request.cursor.block()
+            for text_hash, tokens in zip(request.hashes, line_tokens):
+                if not block.isValid():
+                    break
+                data = block.userData()
+                if isinstance(data, CodeLineData) and data.request is request:
+                    data.request = None
+                    if hash(block.text()) != text_hash:
+                        changed = True  # 分析期间内容已变化，重新扫描时再提交
+                    else:
+                        changed = data.text_hash != text_hash or data.tokens != tokens
+                        data.text_hash = text_hash
+                        data.tokens = tokens
+                    # 前一块的状态不是该语言的代码块时（围栏已变化或尚未按顺序高亮），交给正常的重新高亮
+                    previous_state = self._end_state(block.previous())
+                    if changed and previous_state > 0 and previous_state >> self.LANGUAGE_SHIFT == request.language:
+                        blocks.append(block)
+                block = block.next()
+        self._apply_blocks(blocks)
+    
+    def _apply_blocks(self, blocks):
+        """按前一块已保存的状态重新扫描这些块：可见的块直接设置格式，最后只标记一次布局失效；
+        不可见的块清除格式有效标志，显示时再设置"""
+        started = monotonic()
+        if self._editor is not None:
+            self._update_visible_range()
+        first_position = None
+        end_position = 0
+        for block in blocks:
+            if not self._is_visible(block):
+                self._clear_formatted(block)
+                self._visible_timer.start(0)  # 布局尚未完成时可见区域可能不准确，之后再补上
+                continue
+            _, spans = self.tokenize_block(block.text(), self._end_state(block.previous()), block)
+            block.layout().setFormats(self._format_ranges(spans))
+            position = block.position()
+            first_position = position if first_position is None else min(first_position, position)
+            end_position = max(end_position, position + block.length())
+        if first_position is not None:
+            self._invalidate(first_position, end_position)
+            GuiActivityLog.record("代码块记号", started)
+    
+    def set_dark_theme(self, is_dark):
+        """切换代码块的配色，并重新应用到已高亮的代码块"""
+        style = CODE_STYLE_DARK if is_dark else CODE_STYLE_LIGHT
+        if style == self._code_style:
+            return
+        self._code_style = style
+        self._token_formats.clear()
+        document = self.document()
+        if document is None:
+            return
+        blocks = []
+        block = document.begin()
+        while block.isValid():
+            previous = block.previous()
+            if self._end_state(previous) >> self.LANGUAGE_SHIFT > 0:
+                blocks.append(block)
+            block = block.next()
+        self._apply_blocks(blocks)
+    
+    def tokenize_inline(self, text, spans):
+        """扫描普通文本块：行首块级语法 + 行内语法"""
+        inline_start = 0
+        formats = self.formats
+        match = self.BLOCK_PATTERN.match(text)
+        if match:
+            kind = match.lastgroup
+            spans.append((0, match.end(), formats[kind]))
+            if kind in self.LITERAL_BLOCKS:
+                return
+            if kind in self.MARKER_BLOCKS:
+                inline_start = match.end()
+        if len(text) > HIGHLIGHT_MAX_LINE_LENGTH:
+            return  # 超长行不扫描行内语法
+        # 标题、引用、表格行以整行格式为底，行内语法覆盖在上面
+        for match in self.INLINE_PATTERN.finditer(text, inline_start):
+            spans.append((match.start(), match.end() - match.start(), formats[match.lastgroup]))
+
+
+def _format_range(start, length, text_format):
+    """创建 QTextLayout.FormatRange"""
+    format_range = QTextLayout.FormatRange()
+    format_range.start = start
+    format_range.length = length
+    format_range.format = text_format
+    return format_range
+
+def local_file_paths(mime_data):
+    """从拖放的 MIME 数据中提取本地文件路径（不含目录），没有时返回空列表"""
+    if mime_data is None or not mime_data.hasUrls():
+        return []
+    paths = []
+    for url in mime_data.urls():
+        if not url.isLocalFile():
+            return []
+        path = url.toLocalFile()
+        if os.path.isfile(path):
+            paths.append(path)
+    return paths
+
+
+class GuiActivityLog:
+    """GUI 线程工作记录 - 最近运行的较大工作（帧任务、分片高亮、预览加载等）及其起止时间
+    
+    慢按键日志用它说明按键到绘制期间 GUI 线程还做了什么。
+    """
+    _entries = deque(maxlen=GUI_ACTIVITY_LOG_SIZE)  # (开始时间, 结束时间, 名称)
+    
+    @classmethod
+    def record(cls, name, started):
+        """记录一项从 started 开始、到现在结束的工作"""
+        cls._entries.append((started, monotonic(), name))
+    
+    @classmethod
+    def between(cls, start, end):
+        """与时间段 [start, end] 重叠的工作
+        
+        Returns:
+            [(名称, 耗时 ms), ...]
+        """
+        return [(name, (finish - begin) * 1000) for begin, finish, name in cls._entries
+                if finish >= start and begin <= end]
+
+
+class InputLatencyStats:
+    """按键到绘制延迟统计 - 按文档规模分组保留最近的样本，计算 p50/p95/p99"""
+    
+    SIZE_CLASSES = ((1000, '<1k 行'), (10000, '<10k 行'), (100000, '<100k 行'), (None, '≥100k 行'))
+    
+    def __init__(self):
+        self.samples = {}  # 规模分组 -> 最近的延迟样本（ms）
+    
+    @classmethod
+    def size_class(cls, line_count):
+        for limit, label in cls.SIZE_CLASSES:
+            if limit is None or line_count < limit:
+                return label
+    
+    def add(self, latency_ms, line_count):
+        label = self.size_class(line_count)
+        if label not in self.samples:
+            self.samples[label] = deque(maxlen=INPUT_LATENCY_SAMPLES)
+        self.samples[label].append(latency_ms)
+    
+    def summary(self):
+        """各规模分组的样本数和分位数
+        
+        Returns:
+            {规模分组: {'count', 'p50', 'p95', 'p99', 'max'}}（按规模从小到大，只包含有样本的分组）
+        """
+        result = {}
+        for _, label in self.SIZE_CLASSES:
+            values = sorted(self.samples.get(label, ()))
+            if values:
+                def at(quantile):
+                    return round(values[min(len(values) - 1, int(quantile * len(values)))], 2)
+                result[label] = {'count': len(values), 'p50': at(0.5), 'p95': at(0.95), 'p99': at(0.99),
+                                 'max': round(values[-1], 2)}
+        return result
 
 
 class MarkdownTextEdit(QTextEdit):
-    """自定义Markdown编辑器 - 支持列表自动接续和Tab自动补全"""
+    """自定义Markdown编辑器 - 支持列表自动接续和Tab自动补全
+    
+    修改了文档或移动了光标的按键记录按下的时间，之后第一次绘制视口时得到按键到绘制的延迟，
+    按文档规模计入 latency_stats；超过 INPUT_LATENCY_SLOW_MS 时记录日志。
+    """
+    files_dropped = pyqtSignal(list)  # 拖放到编辑器的本地文件路径列表
+    keypress_painted = pyqtSignal(float)  # 按键后首次绘制，参数为最早一次未绘制按键的延迟（ms）
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.latency_stats = InputLatencyStats()
+        self._pending_keypresses = []  # 尚未绘制的按键时间
+        self._last_slow_log = 0.0
+        self._suppressed_slow_logs = 0
+    
+    def canInsertFromMimeData(self, source):
+        """拖放本地文件时交给主窗口打开，而不是插入文件路径"""
+        if local_file_paths(source):
+            return True
+        return super().canInsertFromMimeData(source)
+    
+    def insertFromMimeData(self, source):
+        """拖放或粘贴本地文件时发出 files_dropped 信号"""
+        paths = local_file_paths(source)
+        if paths:
+            self.files_dropped.emit(paths)
+            return
+        super().insertFromMimeData(source)
     
     def keyPressEvent(self, event):
-        """处理键盘事件"""
+        """处理键盘事件，记录修改了文档或移动了光标的按键"""
+        pressed = monotonic()
+        revision = self.document().revision()
+        position = self.textCursor().position()
+        self._handle_key_press(event)
+        if self.document().revision() != revision or self.textCursor().position() != position:
+            self._pending_keypresses.append(pressed)
+            GuiActivityLog.record("按键处理", pressed)
+    
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self._pending_keypresses:
+            self._record_keypress_latency()
+    
+    def _record_keypress_latency(self):
+        """视口绘制完成：为之前的按键计入延迟，过慢时记录期间 GUI 线程运行的工作"""
+        painted = monotonic()
+        first = self._pending_keypresses[0]
+        line_count = self.document().blockCount()
+        for pressed in self._pending_keypresses:
+            self.latency_stats.add((painted - pressed) * 1000, line_count)
+        self._pending_keypresses = []
+        latency = (painted - first) * 1000
+        self.keypress_painted.emit(latency)
+        if latency < INPUT_LATENCY_SLOW_MS:
+            return
+        if painted - self._last_slow_log < INPUT_LATENCY_LOG_INTERVAL:
+            self._suppressed_slow_logs += 1
+            return
+        activities = sorted(GuiActivityLog.between(first, painted), key=lambda item: -item[1])
+        busy = "，".join(f"{name} {ms:.1f}ms" for name, ms in activities[:8]) or "无记录的工作"
+        suppressed = f"，此前 {self._suppressed_slow_logs} 次慢按键未记录" if self._suppressed_slow_logs else ""
+        logger.warning(f"按键到绘制延迟 {latency:.1f}ms（{line_count} 行{suppressed}），期间 GUI 线程运行了：{busy}")
+        self._last_slow_log = painted
+        self._suppressed_slow_logs = 0
+    
+    def _handle_key_press(self, event):
+        """处理按键（Tab 补全、快捷键、列表接续，其余交给默认处理）"""
         # Tab键仅执行自动补全（不再召起悬浮窗）
         if event.key() == Qt.Key.Key_Tab:
             self.handle_tab_completion()
@@ -3734,111 +4864,1223 @@ class TimeProgressBar(QWidget):
             painter.fillRect(progress_rect, QColor(accent_color))
 
 
-class FileWorkerThread(QThread):
-    """文件操作工作线程 - 处理文件读写，避免阻塞GUI"""
-    file_read = pyqtSignal(str, str)  # 文件路径, 内容
-    file_written = pyqtSignal(str)  # 文件路径
+def content_hash(text):
+    """计算文本内容的哈希（保存时记录，用于判断内容是否回到已保存状态）"""
+    return hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+
+def is_large_file(file_path):
+    """文件是否需要渐进加载（无法获取大小时返回 False，由常规读取报告错误）"""
+    try:
+        return os.path.getsize(file_path) >= LARGE_FILE_THRESHOLD
+    except OSError:
+        return False
+
+
+class LargeFileLoader(QObject):
+    """大文件渐进加载器 - 内存映射文件并增量解码，分批追加到文档
+    
+    每个事件循环轮次最多占用 LARGE_FILE_SLICE_MS，界面保持响应，首屏内容在第一批追加后即可阅读和滚动。
+    换行符与文本模式读取一致（\r\n 和 \r 转换为 \n）。
+    与定时器一样登记到 TabRegistry（提供 stop/deleteLater），标签页关闭时自动停止。
+    """
+    progress_changed = pyqtSignal(int, int)  # 已加载字节数, 总字节数
+    finished = pyqtSignal()
     error_occurred = pyqtSignal(str)  # 错误信息
     
-    def __init__(self, operation, file_path, content=None):
+    def __init__(self, file_path, document, parent=None):
+        super().__init__(parent)
+        self.file_path = file_path
+        self.document = document
+        self._map = None
+        self._offset = 0
+        self._size = 0
+        self._decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder('utf-8')(), translate=True)
+        self._hash = hashlib.blake2b(digest_size=16)  # 与 content_hash() 结果一致，避免加载完成后再遍历全文
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self._load_slice)
+    
+    def start(self):
+        """映射文件并立即追加第一批内容，其余内容在后续事件循环轮次中追加"""
+        try:
+            with open(self.file_path, 'rb') as f:
+                self._size = os.fstat(f.fileno()).st_size
+                if self._size:
+                    self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception as e:
+            self.error_occurred.emit(str(e))
+            return
+        self._load_slice()
+        if self.is_loading():
+            self._timer.start(0)
+    
+    def is_loading(self):
+        """是否仍在加载"""
+        return self._map is not None
+    
+    def content_hash(self):
+        """已加载内容的哈希"""
+        return self._hash.digest()
+    
+    def stop(self):
+        """停止加载并释放内存映射"""
+        self._timer.stop()
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+    
+    def _load_slice(self):
+        """解码并追加若干块内容，直到用完本轮的时间片"""
+        if self._map is None:
+            self.stop()
+            self.finished.emit()
+            return
+        start = monotonic()
+        cursor = QTextCursor(self.document)
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        try:
+            while self._offset < self._size:
+                end = min(self._offset + LARGE_FILE_CHUNK_BYTES, self._size)
+                text = self._decoder.decode(self._map[self._offset:end], final=end >= self._size)
+                self._offset = end
+                if text:
+                    cursor.insertText(text)
+                    self._hash.update(text.encode('utf-8', 'surrogatepass'))
+                if (monotonic() - start) * 1000 >= LARGE_FILE_SLICE_MS:
+                    break
+        except Exception as e:
+            self.stop()
+            self.error_occurred.emit(str(e))
+            return
+        
+        GuiActivityLog.record("大文件加载", start)
+        self.progress_changed.emit(self._offset, self._size)
+        if self._offset >= self._size:
+            self.stop()
+            self.finished.emit()
+
+
+class FileTaskSignals(QObject):
+    """文件任务信号 - QRunnable 不是 QObject，需借助独立对象发出信号"""
+    file_read = pyqtSignal(str, str)  # 文件路径, 内容
+    file_written = pyqtSignal(str, bool)  # 文件路径, 是否因磁盘内容相同而跳过
+    file_checked = pyqtSignal(str, object, object)  # 文件路径, 新内容（与已保存内容相同时为 None）, 新内容哈希
+    diff_ready = pyqtSignal(str, object)  # 文件路径, 行差异操作列表
+    error_occurred = pyqtSignal(str, str)  # 文件路径, 错误信息
+
+
+class FileReadTask(QRunnable):
+    """在线程池中读取文件的任务"""
+    
+    def __init__(self, file_path):
         super().__init__()
-        self.operation = operation  # 'read' 或 'write'
         self.file_path = file_path
-        self.content = content
+        self.signals = FileTaskSignals()
     
     def run(self):
-        """在工作线程中执行文件操作"""
+        """在工作线程中读取文件"""
         try:
-            if self.operation == 'read':
-                with open(self.file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                self.file_read.emit(self.file_path, content)
-            elif self.operation == 'write':
-                with open(self.file_path, 'w', encoding='utf-8') as f:
-                    f.write(self.content)
-                self.file_written.emit(self.file_path)
+            with open(self.file_path, 'r', encoding='utf-8') as f:
+                content = f.read()
+            self.signals.file_read.emit(self.file_path, content)
         except Exception as e:
-            self.error_occurred.emit(str(e))
+            self.signals.error_occurred.emit(self.file_path, str(e))
 
 
-class MarkdownRenderThread(QThread):
-    """Markdown渲染工作线程 - 处理Markdown到HTML的转换，避免阻塞GUI"""
-    html_ready = pyqtSignal(str, int)  # HTML内容, tab_id
-    error_occurred = pyqtSignal(str)  # 错误信息
+class FileWriteTask(QRunnable):
+    """在线程池中原子写入文件的任务
     
-    def __init__(self, content, tab_id, markdown_to_html_func):
+    先写入同目录下的临时文件并 fsync，再用 os.replace 替换目标文件，写入中途失败不会留下半个文件。
+    磁盘上的内容与要写入的内容完全相同时跳过写入。
+    """
+    
+    def __init__(self, file_path, content):
         super().__init__()
+        self.file_path = file_path
         self.content = content
-        self.tab_id = tab_id
-        self.markdown_to_html_func = markdown_to_html_func  # 完整的转换函数（包含wrap_html_with_style）
+        self.signals = FileTaskSignals()
     
     def run(self):
-        """在工作线程中执行Markdown渲染"""
+        """在工作线程中写入文件"""
         try:
-            # 执行Markdown转换（markdown_to_html_func已经包含了完整的转换流程）
-            html = self.markdown_to_html_func(self.content)
-            self.html_ready.emit(html, self.tab_id)
+            # 与文本模式写入一致：换行符转换为系统换行符
+            data = self.content.replace('\n', os.linesep).encode('utf-8')
+            # 写入符号链接指向的真实文件，保留链接本身
+            target = os.path.realpath(self.file_path)
+            if self._matches_disk(target, data):
+                self.signals.file_written.emit(self.file_path, True)
+                return
+            
+            directory = dirname(target) or '.'
+            temp_path = join(directory, f".{os.path.basename(target)}.{uuid.uuid4().hex[:8]}.tmp")
+            try:
+                with open(temp_path, 'wb') as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                if exists(target):
+                    shutil.copymode(target, temp_path)
+                os.replace(temp_path, target)
+            except BaseException:
+                if exists(temp_path):
+                    os.remove(temp_path)
+                raise
+            self.signals.file_written.emit(self.file_path, False)
         except Exception as e:
-            import traceback
-            traceback.print_exc()
-            self.error_occurred.emit(str(e))
+            self.signals.error_occurred.emit(self.file_path, str(e))
+    
+    @staticmethod
+    def _matches_disk(path, data):
+        """磁盘上的文件内容是否与 data 相同（先比较大小，大小相同才读取比较哈希）"""
+        try:
+            if os.path.getsize(path) != len(data):
+                return False
+            with open(path, 'rb') as f:
+                return hashlib.blake2b(f.read(), digest_size=16).digest() == hashlib.blake2b(data, digest_size=16).digest()
+        except OSError:
+            return False
 
 
-# ==================== 基于 moveToThread 的工作线程模式 ====================
+class FileCheckTask(QRunnable):
+    """在线程池中读取文件并与已保存内容的哈希比较（检测外部修改）"""
+    
+    def __init__(self, file_path, saved_hash):
+        super().__init__()
+        self.file_path = file_path
+        self.saved_hash = saved_hash
+        self.signals = FileTaskSignals()
+    
+    def run(self):
+        try:
+            with open(self.file_path, 'r', encoding='utf-8') as f:
+                content = f.read()
+            new_hash = content_hash(content)
+            if new_hash == self.saved_hash:
+                content = None  # 内容未变化（如本程序自己保存触发的事件）
+            self.signals.file_checked.emit(self.file_path, content, new_hash)
+        except Exception as e:
+            self.signals.error_occurred.emit(self.file_path, str(e))
 
-class WorkerThread(QThread):
-    """通用工作线程 - 配合 Worker 对象使用 moveToThread 模式"""
-    started_signal = pyqtSignal()  # 启动信号，用于触发工作
+
+class LineDiffTask(QRunnable):
+    """在线程池中计算两段文本的行差异
     
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.worker = None
+    结果为 difflib 的 opcodes（去掉 equal），行号对应按 '\\n' 拆分后的行，
+    与 QTextDocument 的文本块一一对应。
+    """
     
-    def set_worker(self, worker):
-        """设置工作对象并移动到线程"""
-        self.worker = worker
-        worker.moveToThread(self)
-        # 连接启动信号到工作对象的执行方法
-        self.started_signal.connect(worker.execute)
-        # 工作完成后退出线程
-        worker.finished.connect(self.quit)
+    def __init__(self, file_path, old_text, new_text):
+        super().__init__()
+        self.file_path = file_path
+        self.old_text = old_text
+        self.new_text = new_text
+        self.signals = FileTaskSignals()
     
     def run(self):
-        """启动事件循环并触发工作"""
-        self.started_signal.emit()
-        self.exec()
+        try:
+            old_lines = self.old_text.split('\n')
+            new_lines = self.new_text.split('\n')
+            matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+            opcodes = [op for op in matcher.get_opcodes() if op[0] != 'equal']
+            self.signals.diff_ready.emit(self.file_path, opcodes)
+        except Exception as e:
+            self.signals.error_occurred.emit(self.file_path, str(e))
 
 
-class BaseWorker(QObject):
-    """基础工作对象 - 继承此类创建具体的工作类"""
-    finished = pyqtSignal()  # 任务完成信号
-    error_occurred = pyqtSignal(str)  # 错误信号
+def normalize_path(file_path):
+    """规范化文件路径，用于判断两个路径是否指向同一文件"""
+    return os.path.normcase(os.path.realpath(file_path))
+
+
+class FileChangeWatcher(QObject):
+    """外部文件修改监视器 - 基于 QFileSystemWatcher，事件经过防抖后批量报告
+    
+    切换分支等操作会在短时间内产生大量事件，同一批次中的路径只报告一次。
+    """
+    files_changed = pyqtSignal(list)  # 发生变化的文件路径列表
     
     def __init__(self, parent=None):
         super().__init__(parent)
-        self._thread = None
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.fileChanged.connect(self._on_file_changed)
+        self._paths = set()  # 需要监视的路径
+        self._pending = set()  # 等待处理的变化路径
+        self._pending_since = 0
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._flush)
+    
+    def set_paths(self, paths):
+        """设置需要监视的文件路径集合"""
+        wanted = {path for path in paths if path}
+        removed = [path for path in self._paths - wanted if path in self._watcher.files()]
+        if removed:
+            self._watcher.removePaths(removed)
+        self._paths = wanted
+        self._rewatch()
+    
+    def _rewatch(self):
+        """重新监视未被监视的路径（文件被删除或经重命名替换后 QFileSystemWatcher 会停止监视）"""
+        watched = set(self._watcher.files())
+        missing = [path for path in self._paths if path not in watched and exists(path)]
+        if missing:
+            self._watcher.addPaths(missing)
+    
+    def _on_file_changed(self, path):
+        if not self._pending:
+            self._pending_since = monotonic()
+        self._pending.add(path)
+        # 持续有事件时也不超过最长等待时间
+        waited = (monotonic() - self._pending_since) * 1000
+        self._timer.start(max(0, min(FILE_WATCH_DEBOUNCE, FILE_WATCH_MAX_DELAY - int(waited))))
+    
+    def _flush(self):
+        paths = sorted(self._pending)
+        self._pending.clear()
+        self._rewatch()
+        if paths:
+            self.files_changed.emit(paths)
+
+
+class FileIOService(QObject):
+    """文件 I/O 服务 - 使用有界线程池并发读写文件
+    
+    多个读写任务互不干扰，结果按完成顺序在 GUI 线程中回调。同一文件的写入按提交顺序依次执行，
+    最后提交的内容最后落盘，回调也按提交顺序执行。
+    open_files() 提交的文件组成一个批次，通过 progress_changed 报告进度。
+    """
+    file_opened = pyqtSignal(str, str)  # 文件路径, 内容（批次中的文件读取完成）
+    large_file_opened = pyqtSignal(str)  # 文件路径（批次中的大文件，由调用方渐进加载）
+    open_failed = pyqtSignal(str, str)  # 文件路径, 错误信息（批次中的文件读取失败）
+    progress_changed = pyqtSignal(int, int)  # 已完成数, 总数
+    
+    def __init__(self, parent=None, max_workers=FILE_IO_MAX_WORKERS):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_workers)
+        self._tasks = set()  # 保持任务引用，直到结果回调执行完毕
+        self._writing = {}  # 规范化路径 -> 进行中的写入任务
+        self._queued_writes = {}  # 规范化路径 -> 等待同一文件上一次写入结束的任务队列
+        self._batch_total = 0
+        self._batch_done = 0
     
-    def start_work(self, thread=None):
+    def read(self, file_path, on_read, on_error=None):
+        """提交读取任务
+        
+        Args:
+            file_path: 文件路径
+            on_read: 读取完成回调 (file_path, content)
+            on_error: 读取失败回调 (file_path, error_msg)
         """
-        启动工作线程并执行任务（立即迁出主线程）
+        task = FileReadTask(file_path)
+        self.submit(task, task.signals.file_read, on_read, on_error)
+    
+    def write(self, file_path, content, on_written, on_error=None):
+        """提交原子写入任务
         
         Args:
-            thread: 可选，如果提供则使用该线程，否则创建新线程
-        Returns:
-            QThread: 工作线程实例
+            file_path: 文件路径
+            content: 要写入的文本
+            on_written: 写入完成回调 (file_path, skipped)，skipped 表示磁盘内容相同而未写入
+            on_error: 写入失败回调 (file_path, error_msg)
         """
-        if thread is None:
-            self._thread = WorkerThread()
+        task = FileWriteTask(file_path, content)
+        key = normalize_path(file_path)
+        self.submit(task, task.signals.file_written, on_written, on_error, start=False)
+        # 结束（成功或失败）并执行完回调后，再开始同一文件的下一次写入
+        task.signals.file_written.connect(lambda *_: self._on_write_done(key, task))
+        task.signals.error_occurred.connect(lambda *_: self._on_write_done(key, task))
+        if key in self._writing:
+            self._queued_writes.setdefault(key, deque()).append(task)
         else:
-            self._thread = thread
+            self._start_write(key, task)
+    
+    def _start_write(self, key, task):
+        self._writing[key] = task
+        self.pool.start(task)
+    
+    def _on_write_done(self, key, task):
+        """同一文件的上一次写入结束，提交等待中的下一次写入"""
+        if self._writing.get(key) is not task:
+            return  # wait_for_done() 中已经提交了下一次写入
+        del self._writing[key]
+        queue = self._queued_writes.get(key)
+        if queue:
+            self._start_write(key, queue.popleft())
+            if not queue:
+                del self._queued_writes[key]
+    
+    def submit(self, task, done_signal, on_done, on_error=None, start=True):
+        """连接回调并提交任务，回调执行完之前保持任务引用
         
-        self._thread.set_worker(self)
-        self._thread.finished.connect(self._on_thread_finished)
-        self._thread.start()  # 立即启动线程，任务立即迁出主线程
-        return self._thread
-    
-    def stop_work(self):
-        """停止工作线程"""
+        Args:
+            task: 带 signals 属性（FileTaskSignals）的 QRunnable
+            done_signal: 任务成功时发出的信号
+            start: 是否立即提交到线程池（False 时由调用方稍后提交）
+        """
+        task.setAutoDelete(False)
+        done_signal.connect(on_done)
+        if on_error is not None:
+            task.signals.error_occurred.connect(on_error)
+        done_signal.connect(lambda *_: self._tasks.discard(task))
+        task.signals.error_occurred.connect(lambda *_: self._tasks.discard(task))
+        self._tasks.add(task)
+        if start:
+            self.pool.start(task)
+    
+    def open_files(self, paths):
+        """并发打开多个文件，加入当前批次并报告进度"""
+        if not paths:
+            return
+        if self._batch_done >= self._batch_total:
+            # 上一批次已完成，开始新批次
+            self._batch_total = 0
+            self._batch_done = 0
+        self._batch_total += len(paths)
+        self.progress_changed.emit(self._batch_done, self._batch_total)
+        for file_path in paths:
+            if is_large_file(file_path):
+                # 大文件不整体读入内存，交给调用方用 LargeFileLoader 渐进加载
+                self._batch_done += 1
+                self.large_file_opened.emit(file_path)
+                self.progress_changed.emit(self._batch_done, self._batch_total)
+            else:
+                self.read(file_path, self._on_batch_read, self._on_batch_error)
+    
+    def is_busy(self):
+        """是否还有未完成的读写任务"""
+        return bool(self._tasks)
+    
+    def wait_for_done(self, msecs=-1):
+        """等待所有任务结束（关闭窗口时调用），包括排在同一文件上一次写入之后的写入"""
+        deadline = None if msecs < 0 else monotonic() + msecs / 1000
+        while True:
+            remaining = -1 if deadline is None else max(0, int((deadline - monotonic()) * 1000))
+            if not self.pool.waitForDone(remaining):
+                return False
+            if not self._queued_writes:
+                return True
+            # 线程池已空闲，进行中的写入都已结束（回调尚未执行），直接提交各文件的下一次写入
+            for key, task in list(self._writing.items()):
+                self._on_write_done(key, task)
+    
+    def _on_batch_read(self, file_path, content):
+        self._batch_done += 1
+        self.file_opened.emit(file_path, content)
+        self.progress_changed.emit(self._batch_done, self._batch_total)
+    
+    def _on_batch_error(self, file_path, error_msg):
+        self._batch_done += 1
+        self.open_failed.emit(file_path, error_msg)
+        self.progress_changed.emit(self._batch_done, self._batch_total)
+
+
+# ==================== 帧调度 ====================
+
+class FrameScheduler(QObject):
+    """帧对齐的空闲任务调度器 - 把编辑引起的非紧急工作合并到每帧一次
+    
+    按键处理、语法高亮当前块和绘制仍然同步进行；增量发布、字数统计、状态栏刷新等
+    通过 schedule() 提交。同一个 key 在运行前重复提交只运行一次，任务在距上次运行
+    至少一帧（_ui_update_interval）之后、事件队列中已有的输入处理完时按提交顺序执行，
+    每帧最多占用 FRAME_TASK_BUDGET_MS，剩余的留到下一帧。连续快速输入时每帧只做一次这些工作。
+    """
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._tasks = {}  # key -> 回调（按提交顺序）
+        self._last_run = 0.0
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self._timer.timeout.connect(self._run)
+    
+    def schedule(self, key, callback):
+        """提交任务，key 相同的未运行任务只保留一个（使用最新的回调）"""
+        self._tasks[key] = callback
+        if not self._timer.isActive():
+            delay = (self._last_run + _ui_update_interval / 1000 - monotonic()) * 1000
+            self._timer.start(max(0, int(delay)))
+    
+    def cancel(self, key):
+        """取消尚未运行的任务"""
+        self._tasks.pop(key, None)
+    
+    def _run(self):
+        self._last_run = started = monotonic()
+        deadline = started + FRAME_TASK_BUDGET_MS / 1000
+        # 运行中提交的任务（如增量发布后的字数显示）在预算内同一帧完成
+        while self._tasks:
+            key = next(iter(self._tasks))
+            callback = self._tasks.pop(key)
+            task_started = monotonic()
+            try:
+                callback()
+            except Exception as e:
+                log_exception(type(e), e, e.__traceback__, "运行帧任务")
+            GuiActivityLog.record(f"帧任务 {key if isinstance(key, str) else type(key).__name__}", task_started)
+            if monotonic() >= deadline:
+                break
+        if self._tasks:
+            self._timer.start(_ui_update_interval)
+
+
+# ==================== 文档增量 ====================
+
+class DocumentDelta:
+    """一次合并后的文档修改：从 first_block 开始的 old_count 个块被替换为 new_lines
+    
+    first_block 之前和替换范围之后的块都没有变化。增量不带修改前的文本，
+    需要旧内容的订阅者自行按块保存所需的信息（如 DocumentStatistics 的逐行计数）。
+    """
+    __slots__ = ('first_block', 'old_count', 'new_lines')
+    
+    def __init__(self, first_block, old_count, new_lines):
+        self.first_block = first_block
+        self.old_count = old_count
+        self.new_lines = new_lines
+    
+    @property
+    def line_delta(self):
+        """修改后块数的变化"""
+        return len(self.new_lines) - self.old_count
+    
+    def __repr__(self):
+        return f"DocumentDelta(first_block={self.first_block}, old={self.old_count}, new={len(self.new_lines)})"
+
+
+class DocumentDeltaBus(QObject):
+    """文档增量总线 - 监听 QTextDocument.contentsChange，合并后向订阅者发布 DocumentDelta
+    
+    每个标签页一个。contentsChange 中只记录修改涉及的块范围（首块号和距文档末尾的块数，
+    后续修改只会扩大这个范围），由 FrameScheduler 在下一帧统一发布一次
+    （没有调度器时在当前事件循环轮次结束时发布）：
+    粘贴、替换等由多步组成的编辑只产生一个增量。总线只保存上次发布时的块数，不保存文本副本；
+    发布时只读取修改范围内的块，开销与修改的大小成正比，订阅者不需要再读取整个 toPlainText()。
+    
+    blockSignals(True) 期间增量继续累积，恢复后调用 flush() 一次发布。
+    """
+    delta_ready = pyqtSignal(object)  # DocumentDelta
+    
+    def __init__(self, document, parent=None, scheduler=None):
+        super().__init__(parent)
+        self.document = document
+        self.block_count = document.blockCount()  # 最近一次发布时的块数
+        self._first = None  # 待发布范围的首块号，None 表示没有待发布的修改
+        self._tail = 0  # 待发布范围之后未变化的块数
+        self._scheduler = scheduler
+        if scheduler is not None:
+            self.destroyed.connect(lambda: scheduler.cancel(self))
+        else:
+            self._publish_timer = QTimer(self)
+            self._publish_timer.setSingleShot(True)
+            self._publish_timer.timeout.connect(self.flush)
+        document.contentsChange.connect(self._on_contents_change)
+    
+    def _on_contents_change(self, position, removed, added):
+        """记录修改涉及的块范围（块号在修改前后一致的部分）"""
+        if removed == 0 and added == 0:
+            return
+        document = self.document
+        first = document.findBlock(position).blockNumber()
+        last = document.findBlock(min(position + added, document.characterCount() - 1)).blockNumber()
+        tail = document.blockCount() - 1 - last
+        if self._first is None:
+            self._first, self._tail = first, tail
+        else:
+            self._first, self._tail = min(self._first, first), min(self._tail, tail)
+        if self._scheduler is not None:
+            self._scheduler.schedule(self, self.flush)
+        else:
+            self._publish_timer.start(0)
+    
+    def flush(self):
+        """立即发布待发布的修改（文本没有实际变化时不发布）"""
+        if self._first is None or self.signalsBlocked():
+            return
+        if self._scheduler is not None:
+            self._scheduler.cancel(self)
+        else:
+            self._publish_timer.stop()
+        first, tail = self._first, self._tail
+        self._first = None
+        block_count = self.document.blockCount()
+        new_end = block_count - tail
+        old_end = self.block_count - tail
+        if new_end < first or old_end < first:
+            first, new_end, old_end = 0, block_count, self.block_count  # 范围异常时按整篇处理
+        new_lines = []
+        block = self.document.findBlockByNumber(first)
+        for _ in range(new_end - first):
+            new_lines.append(block.text())
+            block = block.next()
+        self.block_count = block_count
+        self.delta_ready.emit(DocumentDelta(first, old_end - first, new_lines))
+
+
+class DocumentStatistics:
+    """文档统计 - 字数、行数和字符数，随 DocumentDeltaBus 的增量更新
+    
+    字数中汉字和假名逐个计数，其他文字（拉丁、西里尔、韩文等）按词计数；
+    字符数不含换行。exclude_markup 为 True 时先去掉 Markdown 标记
+    （行首标记、强调符号、链接地址、HTML 标签、围栏行等）再统计，去除规则只看单行内容
+    （行首规则中的空白只匹配空格和制表符，不会越过换行），因此整篇的统计等于各行统计之和。
+    
+    按行保存字数和字符数（每行 8 字节，不保存文本），增量到达时减去被替换各行的计数、
+    加上新行的计数，每次修改的开销与修改的大小成正比。
+    """
+    
+    LINE_MARK = '\x01'  # 逐行计数时代替每个词的标记字符（不属于任何词）
+    CJK_PATTERN = compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\U00020000-\U0003134f]')
+    WORD_PATTERN = compile(r"[^\W_]+(?:['’.\-][^\W_]+)*")
+    MARKUP_PATTERNS = (
+        (compile(r'^[ \t]*(?:`{3,}|~{3,}).*$', MULTILINE), ''),  # 围栏行
+        (compile(r'^[ \t]*\|?[ \t:|-]*-[ \t:|-]*$', MULTILINE), ''),  # 分隔线、表格对齐行
+        (compile(r'^[ \t]{0,3}(?:>[ \t]?)*(?:#{1,6}[ \t]+|[-*+][ \t]+(?:\[[ xX]\][ \t]+)?|\d+[.)][ \t]+)?', MULTILINE), ''),  # 行首标记
+        (compile(r'!?\[([^\]\n]*)\]\([^)\n]*\)'), r'\1'),  # 链接和图片只保留文字
+        (compile(r'\[\^[^\]\n]+\]:?'), ''),  # 脚注标记
+        (compile(r'<[^>\n]+>'), ''),  # HTML 标签
+        (compile(r'\*+|_{2,}|~~|==|\^\^|`+'), ''),  # 强调、删除线、高亮、行内代码符号
+        (compile(r'\|'), ' '),  # 表格竖线
+    )
+    
+    def __init__(self, bus, exclude_markup=False):
+        self.bus = bus
+        self.exclude_markup = exclude_markup
+        self.words = 0
+        self.chars = 0
+        self._line_words = array('I')  # 各行字数
+        self._line_chars = array('I')  # 各行字符数
+        self.recount()
+        bus.delta_ready.connect(self._on_delta)
+    
+    @property
+    def lines(self):
+        return len(self._line_chars)
+    
+    @property
+    def nbytes(self):
+        """逐行计数占用的内存（字节）"""
+        return (len(self._line_words) + len(self._line_chars)) * self._line_chars.itemsize
+    
+    @classmethod
+    def count(cls, text, exclude_markup=False):
+        """统计一段文本
+        
+        Returns:
+            (字数, 字符数)
+        """
+        if exclude_markup:
+            for pattern, replacement in cls.MARKUP_PATTERNS:
+                text = pattern.sub(replacement, text)
+        chars = len(text) - text.count('\n')
+        text, cjk = cls.CJK_PATTERN.subn(' ', text)
+        return cjk + len(cls.WORD_PATTERN.findall(text)), chars
+    
+    @classmethod
+    def count_lines(cls, lines, exclude_markup=False):
+        """逐行统计，结果与对每行分别调用 count() 相同
+        
+        整段文本只做一遍替换：去掉标记后按行取长度得到字符数，再把每个字（词）替换为
+        LINE_MARK，按行数标记得到字数。文本中本来就有 LINE_MARK 时退回逐行调用 count()。
+        
+        Returns:
+            (各行字数, 各行字符数)，均为 array('I')
+        """
+        text = '\n'.join(lines)
+        if cls.LINE_MARK in text:
+            counts = [cls.count(line, exclude_markup) for line in lines]
+            return array('I', (words for words, _ in counts)), array('I', (chars for _, chars in counts))
+        if exclude_markup:
+            for pattern, replacement in cls.MARKUP_PATTERNS:
+                text = pattern.sub(replacement, text)
+        lines = text.split('\n')
+        chars = array('I', map(len, lines))
+        text = cls.WORD_PATTERN.sub(cls.LINE_MARK, cls.CJK_PATTERN.sub(cls.LINE_MARK, text))
+        words = array('I', map(str.count, text.split('\n'), repeat(cls.LINE_MARK)))
+        return words, chars
+    
+    def recount(self):
+        """重新统计整篇文档（创建时和切换是否计入标记时）"""
+        self.bus.flush()  # 先发布待发布的修改，以免重新统计后再次计入
+        lines = self.bus.document.toRawText().split('\u2029')
+        self._line_words, self._line_chars = self.count_lines(lines, self.exclude_markup)
+        self.words = sum(self._line_words)
+        self.chars = sum(self._line_chars)
+    
+    def set_exclude_markup(self, exclude_markup):
+        if exclude_markup != self.exclude_markup:
+            self.exclude_markup = exclude_markup
+            self.recount()
+    
+    def _on_delta(self, delta):
+        old = slice(delta.first_block, delta.first_block + delta.old_count)
+        new_words, new_chars = self.count_lines(delta.new_lines, self.exclude_markup)
+        self.words += sum(new_words) - sum(self._line_words[old])
+        self.chars += sum(new_chars) - sum(self._line_chars[old])
+        self._line_words[old] = new_words
+        self._line_chars[old] = new_chars
+
+
+# ==================== 编辑日志（崩溃恢复） ====================
+
+class JournalWriterThread(QThread):
+    """编辑日志写入线程 - 序列化、写入、压缩和 fsync 都在此线程完成，GUI 线程只负责入队
+    
+    日志文件为 JSON Lines：首行为头部记录，随后是快照记录和增量记录。已保存到文件的标签页
+    以磁盘上的文件为基准（头部记录文件路径和内容哈希），没有快照记录，直到第一次压缩。
+    压缩时重放日志得到当前文本，写成新的快照，GUI 线程不需要读取整篇文档。
+    以 surrogatepass 编码，编辑过程中出现的孤立代理字符（如只删除了半个 emoji）也能如实记录。
+    """
+    
+    def __init__(self, commands):
+        super().__init__()
+        self.commands = commands  # queue.Queue，元素为 (操作, 参数...)
+        self._files = {}
+    
+    def run(self):
+        while True:
+            command = self.commands.get()
+            op = command[0]
+            try:
+                if op == 'stop':
+                    self._sync()
+                    for f in self._files.values():
+                        f.close()
+                    self._files.clear()
+                    return
+                elif op == 'open':
+                    # text 为 None 时以头部记录的文件为基准，不写快照
+                    _, path, header, text = command
+                    self._close(path)
+                    f = open(path, 'w', encoding='utf-8', errors='surrogatepass')
+                    self._write_snapshot(f, header, text)
+                    self._files[path] = f
+                elif op == 'delta':
+                    _, path, position, removed, inserted = command
+                    f = self._files.get(path)
+                    if f is not None:
+                        f.write(json.dumps({'t': 'd', 'p': position, 'r': removed, 'x': inserted}, ensure_ascii=False) + '\n')
+                elif op == 'compact':
+                    # 把已写入的增量应用到上一个快照（或基准文件）上得到当前文本，
+                    # 先写完整快照到临时文件再替换，压缩过程中崩溃也不会丢失日志
+                    _, path = command
+                    f = self._files.get(path)
+                    if f is None:
+                        continue
+                    f.flush()
+                    header, text = replay_journal(path)
+                    if header is None:
+                        continue  # 基准文件已变化，保留原日志继续追加
+                    temp_path = path + '.tmp'
+                    with open(temp_path, 'w', encoding='utf-8', errors='surrogatepass') as f:
+                        self._write_snapshot(f, header, text)
+                        f.flush()
+                        os.fsync(f.fileno())
+                    self._close(path)
+                    os.replace(temp_path, path)
+                    self._files[path] = open(path, 'a', encoding='utf-8', errors='surrogatepass')
+                elif op == 'sync':
+                    self._sync()
+                elif op == 'discard':
+                    _, path = command
+                    self._close(path)
+                    if exists(path):
+                        os.remove(path)
+            except Exception as e:
+                log_exception(type(e), e, e.__traceback__, f"编辑日志写入 ({op})")
+    
+    def _write_snapshot(self, f, header, text):
+        f.write(json.dumps(header, ensure_ascii=False) + '\n')
+        if text is not None:
+            f.write(json.dumps({'t': 's', 'x': text}, ensure_ascii=False) + '\n')
+    
+    def _sync(self):
+        for f in self._files.values():
+            f.flush()
+            os.fsync(f.fileno())
+    
+    def _close(self, path):
+        f = self._files.pop(path, None)
+        if f is not None:
+            f.close()
+
+
+def apply_journal_deltas(text, deltas):
+    """把增量记录 [(位置, 删除长度, 插入文本)] 依次应用到文本上，返回新文本
+    
+    位置和长度是 QTextDocument 的字符位置（UTF-16，非 BMP 字符占两个位置），超出文本末尾时截断。
+    以 UTF-16 间隙缓冲区应用：每条增量只移动与上一条增量之间的内容，连续输入时开销与修改大小成正比。
+    """
+    head = bytearray(text.encode('utf-16-le', 'surrogatepass'))  # 间隙之前的内容
+    tail = bytearray()  # 间隙之后的内容，逐字节倒序存放（末尾即间隙后的第一个字符）
+    for position, removed, inserted in deltas:
+        size = (len(head) + len(tail)) // 2
+        position = min(position, size) * 2
+        if position < len(head):
+            tail += head[position:][::-1]
+            del head[position:]
+        elif position > len(head):
+            moved = position - len(head)
+            head += tail[-moved:][::-1]
+            del tail[-moved:]
+        removed = min(removed * 2, len(tail))
+        if removed:
+            del tail[-removed:]
+        head += inserted.encode('utf-16-le', 'surrogatepass')
+    head += tail[::-1]
+    return head.decode('utf-16-le', 'surrogatepass')
+
+
+def replay_journal(path):
+    """重放编辑日志，返回 (头部记录, 文本)；日志无效时返回 (None, None)
+    
+    没有快照记录的日志以头部记录的文件为基准，文件内容的哈希与头部记录不一致
+    （保存后又在外部修改过）时无法重放。崩溃时最后一行可能只写了一半，解析失败的行会被忽略。
+    """
+    header = None
+    text = None
+    deltas = []
+    with open(path, 'r', encoding='utf-8', errors='surrogatepass') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            kind = record.get('t')
+            if kind == 'h':
+                header = record
+            elif kind == 's':
+                text = record['x']
+                deltas = []
+            elif kind == 'd':
+                deltas.append((record['p'], record['r'], record['x']))
+    if header is None:
+        return None, None
+    if text is None:
+        if not header.get('path') or not header.get('hash'):
+            return None, None
+        with open(header['path'], 'r', encoding='utf-8') as f:
+            text = f.read()
+        if content_hash(text).hex() != header['hash']:
+            if logger:
+                logger.warning(f"编辑日志 {Path(path).name} 的基准文件 {header['path']} 已在外部修改，无法重放")
+            return None, None
+    return header, apply_journal_deltas(text, deltas)
+
+
+class EditJournal(QObject):
+    """预写式编辑日志 - 为有未保存修改的标签页记录编辑增量，异常退出后可恢复
+    
+    标签页第一次被修改时创建日志：内容与磁盘上的文件相同（已知已保存内容的哈希）的标签页
+    只写头部，以该文件为基准记录增量；未命名标签页写入完整快照，之后只记录 contentsChange 增量。
+    GUI 线程只读取插入的文本，不读取整篇文档；增量累积 JOURNAL_COMPACT_RECORDS 条后
+    由 JournalWriterThread 压缩为快照。保存或关闭标签页时丢弃日志。写入和 fsync 在写入线程中进行，
+    停止输入 JOURNAL_SYNC_DELAY 后批量刷盘。每个实例持有一个 QLockFile，
+    锁文件所属进程已退出而日志仍在，说明上次没有正常退出。
+    """
+    
+    def __init__(self, directory, parent=None):
+        super().__init__(parent)
+        self.directory = directory
+        try:
+            os.makedirs(directory, exist_ok=True)
+            self.enabled = True
+        except OSError as e:
+            # 无法创建日志目录时不记录日志，编辑器其余功能不受影响
+            log_exception(type(e), e, e.__traceback__, "创建编辑日志目录")
+            self.enabled = False
+        self.instance_id = uuid.uuid4().hex[:12]
+        self._lock = QLockFile(join(directory, f"{self.instance_id}.lock"))
+        self._lock.setStaleLockTime(0)  # 只在所属进程退出时视为失效
+        if self.enabled:
+            self._lock.tryLock(0)
+        self._stale_locks = []  # 已接管的失效实例锁，处理完遗留日志后释放
+        self._tabs = {}  # tab_id -> {'document', 'header', 'path', 'records', 'connection'}
+        self._last_sync = monotonic()
+        
+        self._commands = queue.Queue()
+        self._writer = JournalWriterThread(self._commands)
+        if self.enabled:
+            self._writer.start()
+        
+        self._sync_timer = QTimer(self)
+        self._sync_timer.setSingleShot(True)
+        self._sync_timer.timeout.connect(self.sync)
+    
+    @staticmethod
+    def _header(file_path, name, saved_hash):
+        """头部记录：saved_hash 为文件内容的哈希时以该文件为基准"""
+        base_hash = saved_hash.hex() if file_path and saved_hash is not None else None
+        return {'t': 'h', 'v': 2, 'path': file_path, 'name': name, 'hash': base_hash}
+    
+    def attach(self, tab_id, document, file_path=None, name="", saved_hash=None):
+        """开始监听标签页文档的修改（文档内容已设置完毕后调用）
+        
+        Args:
+            saved_hash: 文档当前内容的哈希，与磁盘上的 file_path 相同时传入，日志只记录相对该文件的增量
+        """
+        if not self.enabled:
+            return
+        self.detach(tab_id, discard=False)
+        state = {
+            'document': document,
+            'header': self._header(file_path, name, saved_hash),
+            'path': None,  # 日志文件路径，第一次修改时创建
+            'records': 0,
+        }
+        state['connection'] = document.contentsChange.connect(
+            lambda position, removed, added: self._on_contents_change(tab_id, position, removed, added))
+        self._tabs[tab_id] = state
+    
+    def detach(self, tab_id, discard=True):
+        """停止监听标签页，discard 为 True 时同时删除其日志"""
+        state = self._tabs.pop(tab_id, None)
+        if state is None:
+            return
+        try:
+            state['document'].contentsChange.disconnect(state['connection'])
+        except (TypeError, RuntimeError):
+            pass  # 文档已被删除
+        if discard and state['path']:
+            self._commands.put(('discard', state['path']))
+    
+    def mark_clean(self, tab_id, file_path, name="", saved_hash=None):
+        """标签页已保存：更新头部信息并删除日志，下次修改时重新创建
+        
+        Args:
+            saved_hash: 文档当前内容即已写入文件的内容时传入其哈希，之后以该文件为基准；
+                保存期间又有编辑时传入 None，下次修改时写入完整快照
+        """
+        state = self._tabs.get(tab_id)
+        if state is None:
+            return
+        state['header'] = self._header(file_path, name, saved_hash)
+        if state['path']:
+            self._commands.put(('discard', state['path']))
+        state['path'] = None
+        state['records'] = 0
+    
+    def start(self, tab_id):
+        """立即为标签页写入快照（如恢复出的文档本身就是未保存状态，与磁盘上的文件不同）"""
+        state = self._tabs.get(tab_id)
+        if state is not None:
+            state['header']['hash'] = None
+            self._open_journal(tab_id, state)
+    
+    def sync(self):
+        """将所有日志刷入磁盘"""
+        self._last_sync = monotonic()
+        self._commands.put(('sync',))
+    
+    def shutdown(self):
+        """正常退出：删除所有日志并释放实例锁"""
+        for tab_id in list(self._tabs):
+            self.detach(tab_id)
+        self._sync_timer.stop()
+        self._commands.put(('stop',))
+        self._writer.wait(3000)
+        self._lock.unlock()
+    
+    def _open_journal(self, tab_id, state):
+        """创建日志文件，返回是否以文件为基准（为 False 时写入的快照已包含文档的当前内容）"""
+        state['path'] = join(self.directory, f"{self.instance_id}-{tab_id}.jnl")
+        state['records'] = 0
+        text = None if state['header']['hash'] else state['document'].toPlainText()
+        self._commands.put(('open', state['path'], state['header'], text))
+        return text is None
+    
+    def _on_contents_change(self, tab_id, position, removed, added):
+        """记录一次编辑（GUI 线程只提取插入的文本并入队）"""
+        state = self._tabs.get(tab_id)
+        if state is None or (removed == 0 and added == 0):
+            return
+        # 第一次修改时创建日志；未命名标签页的快照已包含本次修改
+        if state['path'] or self._open_journal(tab_id, state):
+            document = state['document']
+            end = min(position + added, document.characterCount() - 1)
+            inserted = ""
+            if end > position:
+                cursor = QTextCursor(document)
+                cursor.setPosition(position)
+                cursor.setPosition(end, QTextCursor.MoveMode.KeepAnchor)
+                inserted = cursor.selectedText().replace('\u2029', '\n')
+            self._commands.put(('delta', state['path'], position, removed, inserted))
+            state['records'] += 1
+            if state['records'] >= JOURNAL_COMPACT_RECORDS:
+                self._commands.put(('compact', state['path']))
+                state['records'] = 0
+        
+        # 停止输入后批量刷盘；持续输入时也保证最大刷盘间隔
+        if monotonic() - self._last_sync >= JOURNAL_MAX_SYNC_INTERVAL:
+            self.sync()
+        self._sync_timer.start(JOURNAL_SYNC_DELAY)
+    
+    def find_recoverable(self):
+        """查找上次异常退出遗留的日志，返回 [(日志路径, 头部记录, 文本)]"""
+        if not self.enabled:
+            return []
+        recoverable = []
+        stale_instances = {}
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith('.jnl'):
+                continue
+            instance_id = name.split('-', 1)[0]
+            if instance_id == self.instance_id:
+                continue
+            if instance_id not in stale_instances:
+                # 能获得锁说明所属进程已经退出（或锁文件已不存在）
+                lock = QLockFile(join(self.directory, f"{instance_id}.lock"))
+                lock.setStaleLockTime(0)
+                stale_instances[instance_id] = lock if lock.tryLock(0) else None
+            if stale_instances[instance_id] is None:
+                continue  # 另一个正在运行的实例的日志
+            path = join(self.directory, name)
+            try:
+                header, text = replay_journal(path)
+            except Exception as e:
+                log_exception(type(e), e, e.__traceback__, f"读取编辑日志 {name}")
+                continue
+            if header is not None:
+                recoverable.append((path, header, text))
+        self._stale_locks = [lock for lock in stale_instances.values() if lock is not None]
+        return recoverable
+    
+    def discard_recoverable(self, entries):
+        """删除已处理的遗留日志和失效的锁文件"""
+        for path, _, _ in entries:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        for lock in self._stale_locks:
+            lock.unlock()
+        self._stale_locks = []
+
+
+class RenderCache:
+    """预览渲染磁盘缓存 - 按内容哈希和渲染器版本保存渲染后的 HTML 正文
+    
+    缓存的是套用主题样式之前的正文，切换主题不会使缓存失效。
+    渲染线程写入、主线程读取，索引由锁保护；文件修改时间即最近访问时间，用于 LRU 淘汰。
+    """
+    
+    def __init__(self, directory, max_bytes=RENDER_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index = None  # {key: (大小, 最近访问时间)}，首次使用时扫描目录建立
+    
+    @staticmethod
+    def key(content):
+        """计算缓存键（内容哈希 + 渲染器版本）"""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f"{RENDER_CACHE_VERSION}:{RenderCache.renderer_version()}:".encode('utf-8'))
+        digest.update(content.encode('utf-8', 'surrogatepass'))
+        return digest.hexdigest()
+    
+    @staticmethod
+    def renderer_version():
+        """渲染器版本：markdown 与 pymdownx 的版本（任一升级都会改变渲染结果）"""
+        from markdown import __version__ as markdown_version
+        try:
+            from pymdownx import __version__ as pymdownx_version
+        except ImportError:
+            pymdownx_version = None
+        return f"{markdown_version}:{pymdownx_version}"
+    
+    def _path(self, key):
+        return join(self.directory, key + '.html.z')
+    
+    def _load_index(self):
+        if self._index is not None:
+            return
+        self._index = {}
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.name.endswith('.html.z'):
+                        stat = entry.stat()
+                        self._index[entry.name[:-len('.html.z')]] = (stat.st_size, stat.st_mtime)
+        except OSError:
+            pass
+    
+    def get(self, key):
+        """读取缓存的 HTML 正文，不存在时返回 None"""
+        with self._lock:
+            self._load_index()
+            if key not in self._index:
+                return None
+            path = self._path(key)
+            try:
+                with open(path, 'rb') as f:
+                    body = zlib.decompress(f.read()).decode('utf-8', 'surrogatepass')
+                now = datetime.now().timestamp()
+                os.utime(path, (now, now))
+                self._index[key] = (self._index[key][0], now)
+                return body
+            except (OSError, zlib.error, UnicodeDecodeError):
+                self._index.pop(key, None)
+                return None
+    
+    def put(self, key, body):
+        """写入缓存（临时文件 + 重命名），超出空间上限时淘汰最久未使用的条目"""
+        data = zlib.compress(body.encode('utf-8', 'surrogatepass'), 1)
+        with self._lock:
+            self._load_index()
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                temp_path = join(self.directory, f".{key}.{uuid.uuid4().hex[:8]}.tmp")
+                with open(temp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(temp_path, self._path(key))
+            except OSError as e:
+                log_exception(type(e), e, e.__traceback__, "写入渲染缓存")
+                return
+            self._index[key] = (len(data), datetime.now().timestamp())
+            self._evict()
+    
+    def _evict(self):
+        total = sum(size for size, _ in self._index.values())
+        for key, (size, _) in sorted(self._index.items(), key=lambda item: item[1][1]):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            del self._index[key]
+            total -= size
+    
+    def total_size(self):
+        """缓存占用的磁盘空间（字节）"""
+        with self._lock:
+            self._load_index()
+            return sum(size for size, _ in self._index.values())
+    
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._load_index()
+            for key in list(self._index):
+                try:
+                    os.remove(self._path(key))
+                except OSError:
+                    pass
+            self._index = {}
+
+
+class MarkdownRenderThread(QThread):
+    """Markdown渲染工作线程 - 处理Markdown到HTML的转换，避免阻塞GUI"""
+    html_ready = pyqtSignal(str, int)  # HTML内容, tab_id
+    error_occurred = pyqtSignal(str)  # 错误信息
+    
+    def __init__(self, content, tab_id, markdown_to_html_func):
+        super().__init__()
+        self.content = content
+        self.tab_id = tab_id
+        self.markdown_to_html_func = markdown_to_html_func  # 完整的转换函数（包含wrap_html_with_style）
+    
+    def run(self):
+        """在工作线程中执行Markdown渲染"""
+        try:
+            # 执行Markdown转换（markdown_to_html_func已经包含了完整的转换流程）
+            html = self.markdown_to_html_func(self.content)
+            self.html_ready.emit(html, self.tab_id)
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            self.error_occurred.emit(str(e))
+
+
+class WarmupSignals(QObject):
+    """预热任务的信号"""
+    finished = pyqtSignal(str)  # 示例文档渲染得到的HTML正文
+
+
+class WarmupTask(QRunnable):
+    """在线程池中预热 Markdown 渲染：导入 markdown 扩展、pymdownx 模块，并预先解析常用的 Pygments 词法分析器"""
+    
+    def __init__(self, render_body_func):
+        super().__init__()
+        self.render_body_func = render_body_func
+        self.signals = WarmupSignals()
+    
+    def run(self):
+        html_body = ''
+        try:
+            html_body = self.render_body_func(WARMUP_SAMPLE)
+            try:
+                from pygments.lexers import get_lexer_by_name
+                from pygments.util import ClassNotFound
+            except ImportError:
+                get_lexer_by_name = None  # 未安装 Pygments 时 codehilite 不做语法高亮
+            for name in WARMUP_LEXERS if get_lexer_by_name else ():
+                try:
+                    get_lexer_by_name(name)
+                except ClassNotFound:
+                    pass
+        except Exception as e:
+            log_exception(type(e), e, e.__traceback__, "预热渲染")
+        # 失败时也发出信号：启动时的预览要等预热页面创建后才创建
+        self.signals.finished.emit(html_body)
+
+
+# ==================== 基于 moveToThread 的工作线程模式 ====================
+
+class WorkerThread(QThread):
+    """通用工作线程 - 配合 Worker 对象使用 moveToThread 模式"""
+    started_signal = pyqtSignal()  # 启动信号，用于触发工作
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.worker = None
+    
+    def set_worker(self, worker):
+        """设置工作对象并移动到线程"""
+        self.worker = worker
+        worker.moveToThread(self)
+        # 连接启动信号到工作对象的执行方法
+        self.started_signal.connect(worker.execute)
+        # 工作完成后退出线程
+        worker.finished.connect(self.quit)
+    
+    def run(self):
+        """启动事件循环并触发工作"""
+        self.started_signal.emit()
+        self.exec()
+
+
+class BaseWorker(QObject):
+    """基础工作对象 - 继承此类创建具体的工作类"""
+    finished = pyqtSignal()  # 任务完成信号
+    error_occurred = pyqtSignal(str)  # 错误信号
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._thread = None
+    
+    def start_work(self, thread=None):
+        """
+        启动工作线程并执行任务（立即迁出主线程）
+        
+        Args:
+            thread: 可选，如果提供则使用该线程，否则创建新线程
+        Returns:
+            QThread: 工作线程实例
+        """
+        if thread is None:
+            self._thread = WorkerThread()
+        else:
+            self._thread = thread
+        
+        self._thread.set_worker(self)
+        self._thread.finished.connect(self._on_thread_finished)
+        self._thread.start()  # 立即启动线程，任务立即迁出主线程
+        return self._thread
+    
+    def stop_work(self):
+        """停止工作线程"""
         if self._thread and self._thread.isRunning():
             self._thread.quit()
             self._thread.wait()
@@ -4282,12 +6524,180 @@ worker.start_work()  # 立即迁出主线程
 """
 
 
+# ==================== 标签页注册表 ====================
+
+class TabRegistry(QObject):
+    """标签页注册表 - 维护 页面控件→tab_id 与 tab_id→状态 的映射，查找为 O(1)
+
+    兼容原先 self.tabs 字典的用法（in / [] / items() / values() 等），
+    同时负责标签页移除时的控件释放和每个标签页定时器的清理。
+    """
+    tab_registered = pyqtSignal(int)  # tab_id
+    tab_unregistered = pyqtSignal(int)  # tab_id
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._tab_widget = None
+        self._states = {}  # tab_id -> 标签页状态字典
+        self._widget_to_id = {}  # 控件（页面、编辑器等）-> tab_id
+        self._timers = {}  # tab_id -> {名称: QTimer}
+        self._index_cache = None  # tab_id -> 标签索引（移动/插入/删除后失效，惰性重建）
+
+    def attach(self, tab_widget):
+        """绑定 QTabWidget，跟踪标签页的移动"""
+        self._tab_widget = tab_widget
+        tab_widget.tabBar().tabMoved.connect(self._invalidate_index)
+
+    def _invalidate_index(self, *args):
+        """标签顺序发生变化，清空索引缓存"""
+        self._index_cache = None
+
+    # ---------- 字典兼容接口 ----------
+    def __contains__(self, tab_id):
+        return tab_id in self._states
+
+    def __getitem__(self, tab_id):
+        return self._states[tab_id]
+
+    def __iter__(self):
+        return iter(self._states)
+
+    def __len__(self):
+        return len(self._states)
+
+    def get(self, tab_id, default=None):
+        return self._states.get(tab_id, default)
+
+    def keys(self):
+        return self._states.keys()
+
+    def values(self):
+        return self._states.values()
+
+    def items(self):
+        return self._states.items()
+
+    # ---------- 注册与移除 ----------
+    def register(self, tab_id, state):
+        """注册标签页状态，state['splitter'] 为标签页的页面控件"""
+        self._states[tab_id] = state
+        self.map_widget(tab_id, state['splitter'])
+        if state.get('editor') is not None:
+            self.map_widget(tab_id, state['editor'])
+        self._invalidate_index()
+        self.tab_registered.emit(tab_id)
+
+    def map_widget(self, tab_id, widget):
+        """将控件映射到标签页（如重建后的编辑器）"""
+        self._widget_to_id[widget] = tab_id
+
+    def unmap_widget(self, widget):
+        """移除控件映射"""
+        self._widget_to_id.pop(widget, None)
+
+    def unregister(self, tab_id):
+        """注销标签页：停止其定时器并移除所有映射，返回状态字典"""
+        state = self._states.pop(tab_id, None)
+        self.clear_timers(tab_id)
+        if state is not None:
+            stale = [w for w, tid in self._widget_to_id.items() if tid == tab_id]
+            for widget in stale:
+                del self._widget_to_id[widget]
+            self._invalidate_index()
+            self.tab_unregistered.emit(tab_id)
+        return state
+
+    def remove_tab(self, tab_id):
+        """从 QTabWidget 中移除标签页并释放其控件"""
+        if tab_id not in self._states:
+            return
+        page = self._states[tab_id]['splitter']
+        index = self.index_of(tab_id)
+        self.unregister(tab_id)
+        if self._tab_widget is not None and index >= 0:
+            self._tab_widget.removeTab(index)
+        # removeTab 不会删除页面控件，这里主动释放（编辑器、预览、查找面板随之释放）
+        page.deleteLater()
+
+    # ---------- 查找 ----------
+    def id_for_widget(self, widget):
+        """根据控件获取 tab_id"""
+        if widget is None:
+            return None
+        return self._widget_to_id.get(widget)
+
+    def id_at(self, index):
+        """根据标签索引获取 tab_id"""
+        if self._tab_widget is None or index < 0:
+            return None
+        return self.id_for_widget(self._tab_widget.widget(index))
+
+    def current_id(self):
+        """获取当前标签页的 tab_id"""
+        if self._tab_widget is None:
+            return None
+        return self.id_for_widget(self._tab_widget.currentWidget())
+
+    def index_of(self, tab_id):
+        """获取 tab_id 对应的标签索引，不存在时返回 -1"""
+        if tab_id not in self._states or self._tab_widget is None:
+            return -1
+        if self._index_cache is None:
+            self._index_cache = {}
+            for index in range(self._tab_widget.count()):
+                tid = self._widget_to_id.get(self._tab_widget.widget(index))
+                if tid is not None:
+                    self._index_cache[tid] = index
+        return self._index_cache.get(tab_id, -1)
+
+    # ---------- 每个标签页的定时器 ----------
+    def set_timer(self, tab_id, name, timer):
+        """登记标签页定时器（同名定时器会先被停止并释放）"""
+        timers = self._timers.setdefault(tab_id, {})
+        old = timers.get(name)
+        if old is not None and old is not timer:
+            try:
+                old.stop()
+                old.deleteLater()
+            except RuntimeError:
+                pass
+        timers[name] = timer
+
+    def timer(self, tab_id, name):
+        """获取标签页定时器"""
+        return self._timers.get(tab_id, {}).get(name)
+
+    def clear_timers(self, tab_id):
+        """停止并释放标签页的所有定时器（标签页休眠时调用）"""
+        for timer in self._timers.pop(tab_id, {}).values():
+            try:
+                timer.stop()
+                timer.deleteLater()
+            except RuntimeError:
+                pass
+
+
 class MarkdownEditor(QMainWindow):
     """Markdo 主窗口"""
 
-    def __init__(self):
+    def __init__(self, fade_in=True, previews=True):
+        """
+        Args:
+            fade_in: 是否播放窗口淡入动画（通过文件关联打开文件时跳过，尽快显示内容）
+            previews: 是否创建预览（基准测试只测量编辑器时关闭，不导入 QtWebEngine）
+        """
         super().__init__()
-        self.tabs = {}  # 存储所有标签页
+        self.tabs = TabRegistry(self)  # 标签页注册表（tab_id -> 标签页状态）
+        
+        # 启动流程：先显示可输入的编辑器，首次绘制后再创建预览（导入 QtWebEngine / markdown）
+        self._previews_enabled = False
+        self._previews_allowed = previews
+        self._warmup_task = None  # 预热任务（完成前保持引用）
+        self._spare_page = None  # 已预热的隐藏预览页，创建下一个预览时直接使用（启动时由第一个预览使用）
+        self._startup_pending = True
+        self._first_paint_time = None
+        self._first_keystroke_pending = True
+        self.time_to_first_keystroke = None  # 从进程启动到首次按键输入的耗时（ms）
         self.current_tab_id = 0
         self.markdown_toolbar_widget = None  # 左侧Markdown工具栏
         self._updating_preview = False  # 预览更新标志，避免在更新期间进行滚动同步
@@ -4295,8 +6705,13 @@ class MarkdownEditor(QMainWindow):
         self._last_sync_time = 0  # 最后一次同步的时间戳，用于快速滚动时的优化
         
         # 工作线程引用（用于清理）
-        self._file_worker_thread = None
         self._markdown_render_thread = None
+        self._queued_render_tab_id = None  # 渲染进行中又有新内容时，记录待渲染的标签页
+        self._render_cache_pending = {}  # {tab_id: (内容, 正文)} 最近一次渲染、尚未写入磁盘缓存的结果
+        self._render_timed_out = False  # 当前渲染是否已被看门狗判定超时
+        self._render_watchdog = QTimer(self)
+        self._render_watchdog.setSingleShot(True)
+        self._render_watchdog.timeout.connect(self._on_render_timeout)
             
         # 添加动画支持（使用缓存）
         self.window_opacity_animation = AnimationCache.get_animation(
@@ -4394,6 +6809,38 @@ class MarkdownEditor(QMainWindow):
         self.toolbar_hotkey = self.settings.value("toolbar/hotkey", DEFAULT_TOOLBAR_HOTKEY, type=str)
         self.editor_font_size = self.settings.value("editor/font_size", DEFAULT_EDITOR_FONT_SIZE, type=int)
         self.sync_scroll_enabled = self.settings.value("sync_scroll", True, type=bool)
+        self.stats_exclude_markup = self.settings.value("stats/exclude_markup", False, type=bool)
+        self.hibernate_after_minutes = self.settings.value("performance/hibernate_after_minutes", DEFAULT_HIBERNATE_AFTER_MINUTES, type=int)
+        self.hibernate_budget_mb = self.settings.value("performance/hibernate_budget_mb", DEFAULT_HIBERNATE_BUDGET_MB, type=int)
+        self._last_active_tab_id = None  # 上一个激活的标签页，用于记录不活跃时间
+        
+        # 帧调度器：编辑引起的非紧急工作（增量发布、字数统计显示）每帧合并运行一次
+        self.frame_scheduler = FrameScheduler(self)
+        
+        # 编辑日志：记录未保存的修改，异常退出后可恢复
+        self.journal = EditJournal(join(dirname(self.settings.fileName()), JOURNAL_DIR_NAME), self)
+        
+        # 文件 I/O 服务：并发读取多个文件，结果按完成顺序创建标签页
+        self.file_io = FileIOService(self)
+        self.file_io.file_opened.connect(self._on_file_read)
+        self.file_io.large_file_opened.connect(self._on_large_file_opened)
+        self.file_io.open_failed.connect(self._on_open_failed)
+        self.file_io.progress_changed.connect(self._on_open_progress)
+        self._open_failures = []  # 当前批次中打开失败的文件 (路径, 错误信息)
+        
+        # 外部文件修改监视：干净的标签页按差异原地更新，有未保存修改的标签页提示冲突
+        self.render_cache = RenderCache(join(dirname(self.settings.fileName()), RENDER_CACHE_DIR_NAME))
+        self.file_watcher = FileChangeWatcher(self)
+        self.file_watcher.files_changed.connect(self.on_external_changes)
+        self.tabs.tab_registered.connect(lambda tab_id: self.update_watched_paths())
+        self.tabs.tab_unregistered.connect(lambda tab_id: self.update_watched_paths())
+        self._external_conflicts = []  # 等待用户决定的冲突 (tab_id, 新内容, 新哈希)
+        
+        # 创建标签页休眠检查定时器
+        self.hibernation_timer = QTimer(self)
+        self.hibernation_timer.timeout.connect(self.check_tab_hibernation)
+        if self.hibernate_after_minutes or self.hibernate_budget_mb:
+            self.hibernation_timer.start(HIBERNATE_CHECK_INTERVAL)
             
         # 创建主题切换定时器
         self.theme_check_timer = QTimer(self)
@@ -4408,7 +6855,8 @@ class MarkdownEditor(QMainWindow):
         self.setAttribute(Qt.WidgetAttribute.WA_StyledBackground, True)
             
         # 设置窗口初始透明度为0，准备淡入动画
-        self.setWindowOpacity(0.0)
+        if fade_in:
+            self.setWindowOpacity(0.0)
         
         # 在创建UI之前先应用基础主题样式表，确保组件创建时使用正确的主题
         base_stylesheet = Theme.get_app_stylesheet(self.current_theme)
@@ -4469,9 +6917,13 @@ class MarkdownEditor(QMainWindow):
         if self.settings.value("show_welcome", True, type=bool):
             # 延迟显示，确保窗口完全加载后再显示对话框
             QTimer.singleShot(500, self.show_welcome)
+        
+        # 上次异常退出时提示恢复未保存的修改
+        QTimer.singleShot(0, self.offer_journal_recovery)
             
         # 执行淡入动画
-        QTimer.singleShot(50, self._start_window_fade_in)
+        if fade_in:
+            QTimer.singleShot(50, self._start_window_fade_in)
     
     def init_ui(self):
         """初始化UI"""
@@ -4505,6 +6957,7 @@ class MarkdownEditor(QMainWindow):
         self.tab_widget.setTabsClosable(True)
         self.tab_widget.setMovable(True)
         self.tab_widget.tabCloseRequested.connect(self.close_tab)
+        self.tabs.attach(self.tab_widget)
         
         # 连接标签页切换信号，更新字数统计
         self.tab_widget.currentChanged.connect(self.on_tab_changed)
@@ -4543,6 +6996,34 @@ class MarkdownEditor(QMainWindow):
         self.word_count_label.setStyleSheet(f"color: {self.text_secondary_color}; font-size: 12px; background-color: transparent;")
         self.status_bar.addWidget(self.word_count_label)
         
+        # 创建休眠统计标签（有休眠的标签页时显示）
+        self.hibernation_label = QLabel()
+        self.hibernation_label.setStyleSheet(f"color: {self.text_secondary_color}; font-size: 12px; background-color: transparent;")
+        self.hibernation_label.hide()
+        self.status_bar.addPermanentWidget(self.hibernation_label)
+        
+        # 创建文件打开进度条（批量打开文件时显示）
+        self.io_progress_bar = QProgressBar()
+        self.io_progress_bar.setFixedWidth(180)
+        self.io_progress_bar.setFixedHeight(14)
+        self.io_progress_bar.setTextVisible(True)
+        self.io_progress_bar.setStyleSheet(self._io_progress_bar_style())
+        self.io_progress_bar.hide()
+        self.status_bar.addPermanentWidget(self.io_progress_bar)
+        
+        # 创建大文件加载进度条（当前标签页正在渐进加载时显示）
+        self.load_progress_bar = QProgressBar()
+        self.load_progress_bar.setFixedWidth(180)
+        self.load_progress_bar.setFixedHeight(14)
+        self.load_progress_bar.setRange(0, 100)
+        self.load_progress_bar.setFormat("正在加载 %p%")
+        self.load_progress_bar.setStyleSheet(self._io_progress_bar_style())
+        self.load_progress_bar.hide()
+        self.status_bar.addPermanentWidget(self.load_progress_bar)
+        
+        # 接受拖放文件到窗口打开
+        self.setAcceptDrops(True)
+        
         self.show_status_message_temporarily("就绪", 2000)
 
         # 创建切换按钮（初始隐藏，只在窗口宽度小于900时显示）
@@ -4556,8 +7037,9 @@ class MarkdownEditor(QMainWindow):
         # 设置按钮样式
         self.update_toggle_button_style()
         
-        # 创建第一个标签页
-        self.create_new_tab()
+        # 恢复上次会话的标签页，没有可恢复的文件时创建空白标签页
+        if not self.restore_session():
+            self.create_new_tab()
         
         # 确保编辑器字体大小正确设置（延迟执行，确保在主题应用后也能正确设置）
         QTimer.singleShot(100, lambda: self._ensure_editor_font_sizes())
@@ -4793,6 +7275,11 @@ class MarkdownEditor(QMainWindow):
         # 更新状态栏字数统计标签主题
         if hasattr(self, 'word_count_label'):
             self.word_count_label.setStyleSheet(f"color: {self.text_secondary_color}; font-size: 12px; background-color: transparent;")
+        if hasattr(self, 'hibernation_label'):
+            self.hibernation_label.setStyleSheet(f"color: {self.text_secondary_color}; font-size: 12px; background-color: transparent;")
+        if hasattr(self, 'io_progress_bar'):
+            self.io_progress_bar.setStyleSheet(self._io_progress_bar_style())
+            self.load_progress_bar.setStyleSheet(self._io_progress_bar_style())
         
         # 更新切换按钮样式
         if hasattr(self, 'toggle_button'):
@@ -4804,10 +7291,10 @@ class MarkdownEditor(QMainWindow):
         
         # 更新所有标签页的查找面板主题和预览窗口边框
         for tab_id, tab_info in self.tabs.items():
-            if 'find_panel' in tab_info:
+            if tab_info.get('find_panel') is not None:
                 tab_info['find_panel'].update_theme()
             # 更新预览窗口边框样式（移除边框以避免多余线条）
-            if 'preview' in tab_info:
+            if tab_info.get('preview') is not None:
                 tab_info['preview'].setStyleSheet("")
             # 更新主分割器样式，在预览窗和查找面板之间显示灰色分界线
             if 'splitter' in tab_info:
@@ -4820,17 +7307,22 @@ class MarkdownEditor(QMainWindow):
                         background-color: {self.accent_color};
                     }}
                 """)
+            # 更新休眠占位控件的颜色
+            if tab_info.get('placeholder') is not None:
+                tab_info['placeholder'].setStyleSheet(f"color: {self.text_secondary_color}; background-color: {self.bg_color};")
             # 更新编辑器字体大小（确保与设置一致）
             if 'editor' in tab_info:
                 editor = tab_info['editor']
+                if editor is not None and hasattr(editor, 'highlighter'):
+                    editor.highlighter.set_dark_theme(self.is_dark_theme)
                 if editor and hasattr(self, 'editor_font_size'):
                     editor_font = QFont("Consolas", self.editor_font_size)
                     editor.setFont(editor_font)
                     editor.document().setDefaultFont(editor_font)
         
-        # 更新所有标签页的预览窗口内容，以应用新的主题颜色
+        # 更新所有标签页的预览窗口内容，以应用新的主题颜色（休眠的标签页在恢复时重新渲染）
         for tab_id, tab_info in self.tabs.items():
-            if 'preview' in tab_info:
+            if tab_info.get('preview') is not None:
                 self.update_preview(tab_id)
     
     def _ensure_all_buttons_styled(self):
@@ -5362,6 +7854,11 @@ class MarkdownEditor(QMainWindow):
         # ===== 调试快捷键 =====
         # 注意：F1 已在菜单栏中注册，此处不再重复注册
         
+        # Ctrl+Shift+F12 - 显示/隐藏输入延迟浮层
+        latency_overlay_shortcut = QShortcut(QKeySequence("Ctrl+Shift+F12"), self)
+        latency_overlay_shortcut.setContext(shortcut_context)
+        latency_overlay_shortcut.activated.connect(self.toggle_latency_overlay)
+        
         # 存储所有快捷键以便管理
         self.shortcuts = {
             'redo_alt': redo_alt_shortcut,
@@ -5377,6 +7874,7 @@ class MarkdownEditor(QMainWindow):
             'ordered_list': ordered_list_shortcut,
             'time': time_shortcut,
             'hr': hr_shortcut,
+            'latency_overlay': latency_overlay_shortcut,
         }
         
         # 设置快捷键自动重复为False，避免长按时的重复触发
@@ -5451,6 +7949,11 @@ class MarkdownEditor(QMainWindow):
         save_as_action.triggered.connect(self.save_file_as)
         file_menu.addAction(save_as_action)
         
+        save_all_action = QAction("全部保存", self)
+        save_all_action.setShortcut("Ctrl+Alt+S")
+        save_all_action.triggered.connect(self.save_all)
+        file_menu.addAction(save_all_action)
+        
         file_menu.addSeparator()
         
         settings_action = QAction("设置", self)
@@ -6184,9 +8687,55 @@ class MarkdownEditor(QMainWindow):
         tab_id = self.current_tab_id
         self.current_tab_id += 1
         
-        # 创建主分割器（左右布局：编辑器+预览 | 查找面板）
+        main_splitter = self._create_main_splitter()
+        
+        # 创建编辑器、预览和查找面板
+        widgets = self._build_tab_widgets(tab_id, main_splitter, content)
+        
+        # 添加标签页
+        tab_name = f"新建 {tab_id + 1}" if not file_path else Path(file_path).name
+        index = self.tab_widget.addTab(main_splitter, tab_name)
+        
+        # 存储标签页信息
+        tab_info = {
+            'file_path': file_path,
+            'splitter': main_splitter,
+            'saved_hash': content_hash(content),  # 已保存内容的哈希，用于检测是否有未保存的修改
+            'hibernated': False,  # 是否处于休眠状态
+            'last_active': monotonic(),  # 最后一次处于激活状态的时间
+        }
+        tab_info.update(widgets)
+        self.tabs.register(tab_id, tab_info)
+        self.journal.attach(tab_id, widgets['editor'].document(), file_path, tab_name, tab_info['saved_hash'])
+        self.tab_widget.setCurrentIndex(index)
+        
+        # 初始渲染
+        self.update_preview(tab_id)
+        
+        # 设置滚动同步
+        self.setup_scroll_sync(tab_id)
+        
+        return tab_id
+    
+    def _create_main_splitter(self):
+        """创建标签页的主分割器（左右布局：编辑器+预览 | 查找面板）"""
         main_splitter = QSplitter(Qt.Orientation.Horizontal)
         
+        # 设置主分割器样式，在预览窗和查找面板之间显示灰色分界线
+        main_splitter.setObjectName("mainSplitter")
+        main_splitter.setStyleSheet(f"""
+            QSplitter#mainSplitter::handle {{
+                background-color: {self.border_color};
+                width: 2px;
+            }}
+            QSplitter#mainSplitter::handle:hover {{
+                background-color: {self.accent_color};
+            }}
+        """)
+        return main_splitter
+    
+    def _build_tab_widgets(self, tab_id, main_splitter, content):
+        """创建标签页的编辑器、预览和查找面板并放入主分割器（新建或从休眠恢复时调用）"""
         # 创建内容分割器（编辑器 | 预览）
         content_splitter = QSplitter(Qt.Orientation.Horizontal)
         
@@ -6199,37 +8748,38 @@ class MarkdownEditor(QMainWindow):
         # 设置编辑器最小宽度，限制分隔器移动范围
         editor.setMinimumWidth(300)
         
-        # 应用语法高亮（保存引用以防止被垃圾回收）
-        editor.highlighter = MarkdownHighlighter(editor.document())
+        # 应用语法高亮（保存引用以防止被垃圾回收），不可见部分按时间分片高亮
+        editor.highlighter = MarkdownHighlighter(editor)
+        editor.highlighter.set_dark_theme(self.is_dark_theme)
         
         editor.setText(content)
-        editor.textChanged.connect(lambda: self.on_text_changed(tab_id))
+        # 以此时的内容为已保存状态，撤销回到这里时 isModified() 自动恢复为 False
+        editor.document().setModified(False)
+        # 文档修改统一经过增量总线发布（每个事件循环轮次合并为一个增量）
+        editor.delta_bus = DocumentDeltaBus(editor.document(), editor, self.frame_scheduler)
+        editor.statistics = DocumentStatistics(editor.delta_bus, self.stats_exclude_markup)  # 先于字数显示更新
+        editor.delta_bus.delta_ready.connect(lambda delta: self.on_text_changed(tab_id))
+        editor.selectionChanged.connect(self._on_editor_selection_changed)
         editor.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         editor.customContextMenuRequested.connect(lambda pos: self.show_context_menu(tab_id, pos))
         # 编辑器焦点事件
         editor.installEventFilter(self)
-        
-        # 中间：预览
-        preview = QWebEngineView()
-        # 设置预览窗最小宽度，限制分隔器移动范围
-        preview.setMinimumWidth(300)
-        # 启用JavaScript和远程内容加载
-        settings = preview.settings()
-        settings.setAttribute(QWebEngineSettings.WebAttribute.JavascriptEnabled, True)
-        settings.setAttribute(QWebEngineSettings.WebAttribute.LocalContentCanAccessRemoteUrls, True)
-        settings.setAttribute(QWebEngineSettings.WebAttribute.AllowRunningInsecureContent, True)
-        settings.setAttribute(QWebEngineSettings.WebAttribute.LocalContentCanAccessFileUrls, True)
-        # 启用硬件加速
-        settings.setAttribute(QWebEngineSettings.WebAttribute.Accelerated2dCanvasEnabled, True)
-        settings.setAttribute(QWebEngineSettings.WebAttribute.WebGLEnabled, True)
-        # QWebEngineView 默认使用硬件加速（如果系统支持），通过上面的设置已启用
-        # 非实时区域优化：预览窗口不需要实时更新，减少渲染开销
-        # 注意：QWebEngineView 没有直接的 layer.live 属性，但可以通过其他方式优化
-        preview.setHtml(self.get_initial_html(), QUrl("https://cdnjs.cloudflare.com/"))
+        # 拖放到编辑器的文件交给文件 I/O 服务打开
+        editor.files_dropped.connect(self.open_files)
+        editor.keypress_painted.connect(lambda latency: self._schedule_latency_overlay_update())
+        
+        # 中间：预览（启动阶段先放占位控件，首次绘制完成后再创建）
+        if self._previews_enabled:
+            preview = self._create_preview()
+            preview_slot = preview
+        else:
+            preview = None
+            preview_slot = QWidget()
+            preview_slot.setMinimumWidth(300)
         
         # 添加到内容分割器
         content_splitter.addWidget(editor)
-        content_splitter.addWidget(preview)
+        content_splitter.addWidget(preview_slot)
         content_splitter.setSizes([600, 600])  # 默认各占一半
         # 移除内容分割器的边框
         content_splitter.setStyleSheet("QSplitter { border: none; }")
@@ -6245,56 +8795,520 @@ class MarkdownEditor(QMainWindow):
         main_splitter.addWidget(find_panel)
         main_splitter.setSizes([1200, 0])  # 默认查找面板宽度为0（隐藏）
         
-        # 设置主分割器样式，在预览窗和查找面板之间显示灰色分界线
-        main_splitter.setObjectName("mainSplitter")
-        main_splitter.setStyleSheet(f"""
-            QSplitter#mainSplitter::handle {{
-                background-color: {self.border_color};
-                width: 2px;
-            }}
-            QSplitter#mainSplitter::handle:hover {{
-                background-color: {self.accent_color};
-            }}
-        """)
+        # 文档修改后更新字数统计（多个增量在同一帧内只刷新一次状态栏）
+        editor.delta_bus.delta_ready.connect(
+            lambda delta: self.frame_scheduler.schedule('word_count', self.update_word_count_display))
         
-        # 添加标签页
-        tab_name = f"新建 {tab_id + 1}" if not file_path else Path(file_path).name
-        index = self.tab_widget.addTab(main_splitter, tab_name)
-        self.tab_widget.setCurrentIndex(index)
-        
-        # 存储标签页信息
-        self.tabs[tab_id] = {
+        return {
             'editor': editor,
             'preview': preview,
-            'file_path': file_path,
-            'splitter': main_splitter,
             'content_splitter': content_splitter,
             'find_panel': find_panel,
-            'saved_content': content  # 保存当前内容，用于检测是否有未保存的修改
         }
+    
+    def _create_preview(self):
+        """创建预览控件（QWebEngineView）"""
+        load_webengine()
+        preview = QWebEngineView()
+        if self._spare_page is not None:
+            # 使用预热好的页面（渲染进程已启动，MathJax 已加载）
+            self._spare_page.setParent(preview)
+            preview.setPage(self._spare_page)
+            self._spare_page = None
+        # 预览不处理拖放（否则会导航到被拖入的文件），交给主窗口打开
+        preview.setAcceptDrops(False)
+        # 设置预览窗最小宽度，限制分隔器移动范围
+        preview.setMinimumWidth(300)
+        # 启用JavaScript和远程内容加载
+        settings = preview.settings()
+        settings.setAttribute(QWebEngineSettings.WebAttribute.JavascriptEnabled, True)
+        settings.setAttribute(QWebEngineSettings.WebAttribute.LocalContentCanAccessRemoteUrls, True)
+        settings.setAttribute(QWebEngineSettings.WebAttribute.AllowRunningInsecureContent, True)
+        settings.setAttribute(QWebEngineSettings.WebAttribute.LocalContentCanAccessFileUrls, True)
+        # 启用硬件加速
+        settings.setAttribute(QWebEngineSettings.WebAttribute.Accelerated2dCanvasEnabled, True)
+        settings.setAttribute(QWebEngineSettings.WebAttribute.WebGLEnabled, True)
+        # QWebEngineView 默认使用硬件加速（如果系统支持），通过上面的设置已启用
+        # 非实时区域优化：预览窗口不需要实时更新，减少渲染开销
+        # 注意：QWebEngineView 没有直接的 layer.live 属性，但可以通过其他方式优化
+        preview.setHtml(self.get_initial_html(), QUrl("https://cdnjs.cloudflare.com/"))
+        return preview
+    
+    # ==================== 启动流程 ====================
+    
+    def paintEvent(self, event):
+        """首次绘制完成后再执行延迟的启动步骤"""
+        super().paintEvent(event)
+        if self._startup_pending:
+            self._startup_pending = False
+            self._first_paint_time = monotonic()
+            QTimer.singleShot(0, self.finish_startup)
+    
+    def finish_startup(self):
+        """首次绘制后开始预热，预热页面创建后再为已有标签页创建预览（第一个预览直接使用预热页面）"""
+        if not self._previews_allowed:
+            return
+        self.start_warmup()
+    
+    def start_warmup(self):
+        """后台渲染示例文档（导入 markdown 扩展并解析常用词法分析器），
+        完成后在隐藏页面中加载渲染结果，启动 Chromium 渲染进程并加载 MathJax"""
+        if self._warmup_task is not None:
+            return
+        self._warmup_started = monotonic()
+        self._warmup_task = WarmupTask(self.markdown_to_html_body)
+        self._warmup_task.setAutoDelete(False)
+        self._warmup_task.signals.finished.connect(self._on_warmup_rendered)
+        QThreadPool.globalInstance().start(self._warmup_task)
+    
+    def _on_warmup_rendered(self, html_body):
+        """示例文档渲染完成：在隐藏页面中加载，预热 WebEngine 和 MathJax"""
+        try:
+            load_webengine()
+            page = QWebEnginePage(self)
+            page.loadFinished.connect(self._on_warmup_finished)
+            page.setHtml(self.wrap_html_with_style(html_body), QUrl("https://cdnjs.cloudflare.com/"))
+            self._spare_page = page
+        except Exception as e:
+            log_exception(type(e), e, e.__traceback__, "预热预览页面")
+        # 为启动阶段创建的标签页补建预览并渲染（markdown 已在预热中导入）
+        try:
+            self.enable_previews()
+            self.update_layout_for_width()
+        except Exception as e:
+            log_exception(type(e), e, e.__traceback__, "创建预览")
+    
+    def _on_warmup_finished(self, ok):
+        """预热页面加载完成"""
+        try:
+            self.sender().loadFinished.disconnect(self._on_warmup_finished)
+        except (TypeError, RuntimeError, AttributeError):
+            pass
+        if logger:
+            logger.info(f"预热完成，耗时 {(monotonic() - self._warmup_started) * 1000:.0f} ms")
+    
+    def enable_previews(self):
+        """为启动阶段创建的标签页补建预览控件"""
+        if self._previews_enabled:
+            return
+        self._previews_enabled = True
+        for tab_id, tab_info in list(self.tabs.items()):
+            if tab_info.get('hibernated') or tab_info.get('editor') is None or tab_info.get('preview') is not None:
+                continue
+            content_splitter = tab_info['content_splitter']
+            sizes = content_splitter.sizes()
+            placeholder = content_splitter.widget(1)
+            preview = self._create_preview()
+            content_splitter.replaceWidget(1, preview)
+            content_splitter.setSizes(sizes)
+            placeholder.deleteLater()
+            tab_info['preview'] = preview
+            if tab_info.get('large_loader') is None:
+                self.update_preview(tab_id)
+            self.setup_scroll_sync(tab_id)
+    
+    def _record_first_keystroke(self):
+        """统计并报告从进程启动到首次按键输入的耗时"""
+        self._first_keystroke_pending = False
+        elapsed_ms = (monotonic() - PROCESS_START_TIME) * 1000
+        paint_ms = ((self._first_paint_time or monotonic()) - PROCESS_START_TIME) * 1000
+        self.time_to_first_keystroke = elapsed_ms
+        message = f"首次绘制 {paint_ms:.0f} ms，首次输入 {elapsed_ms:.0f} ms"
+        if logger:
+            logger.info(f"启动耗时：{message}")
+        self.show_status_message_temporarily(f"⏱️ {message}", 3000)
+    
+    def _live_tab(self, tab_id):
+        """获取未休眠标签页的信息，标签页不存在或已休眠时返回 None"""
+        tab_info = self.tabs.get(tab_id)
+        if tab_info is None or tab_info.get('hibernated'):
+            return None
+        return tab_info
+    
+    # ==================== 标签页休眠 ====================
+    
+    def _estimate_tab_memory(self, tab_info):
+        """估算标签页在未休眠时占用的内存（字节）"""
+        editor = tab_info.get('editor')
+        if editor is None:
+            return 0
+        chars = editor.document().characterCount()
+        html_len = len(tab_info.get('rendered_html') or '')
+        # QTextDocument 以 UTF-16 存储文本，另加布局与格式开销和逐行字数统计
+        return (chars * 2 * HIBERNATE_LAYOUT_FACTOR + html_len * 2 + HIBERNATE_PREVIEW_ESTIMATE
+                + editor.statistics.nbytes)
+    
+    def check_tab_hibernation(self):
+        """检查不活跃或超出内存预算的标签页并将其休眠"""
+        if not self.hibernate_after_minutes and not self.hibernate_budget_mb:
+            return
+        current_id = self.get_current_tab_id()
+        now = monotonic()
+        candidates = []  # (最后激活时间, tab_id)
+        live_memory = 0
+        for tab_id, tab_info in self.tabs.items():
+            if tab_info.get('hibernated'):
+                continue
+            live_memory += self._estimate_tab_memory(tab_info)
+            # 当前标签页、有未保存修改和正在渐进加载的标签页不休眠（休眠会丢失撤销历史）
+            if tab_id == current_id or self.has_unsaved_changes(tab_id) or tab_info.get('large_loader') is not None:
+                continue
+            candidates.append((tab_info.get('last_active', now), tab_id))
+        
+        candidates.sort()
+        budget = self.hibernate_budget_mb * 1024 * 1024
+        for last_active, tab_id in candidates:
+            idle_too_long = self.hibernate_after_minutes and now - last_active >= self.hibernate_after_minutes * 60
+            over_budget = budget and live_memory > budget
+            if not (idle_too_long or over_budget):
+                continue
+            live_memory -= self._estimate_tab_memory(self.tabs[tab_id])
+            self.hibernate_tab(tab_id)
+    
+    def hibernate_tab(self, tab_id):
+        """休眠标签页：释放编辑器和预览，只保留压缩的文本快照、光标/滚动位置和渲染缓存"""
+        tab_info = self._live_tab(tab_id)
+        if tab_info is None or tab_id == self.get_current_tab_id():
+            return False
         
-        # 连接编辑器内容改变信号，更新字数统计
-        editor.textChanged.connect(lambda: self.update_word_count_display())
+        editor = tab_info['editor']
+        text = editor.toPlainText()
+        self.store_render_cache(tab_id, text)
+        cursor = editor.textCursor()
+        estimated = self._estimate_tab_memory(tab_info)
+        snapshot = zlib.compress(text.encode('utf-8'))
+        
+        tab_info['snapshot'] = snapshot
+        tab_info['cursor_position'] = cursor.position()
+        tab_info['cursor_anchor'] = cursor.anchor()
+        tab_info['scroll_value'] = editor.verticalScrollBar().value()
+        tab_info['hibernation_saved'] = max(0, estimated - len(snapshot))
+        # 休眠的标签页一定没有未保存修改，saved_hash 保持不变，恢复后快照内容即为已保存状态
+        
+        # 停止该标签页的定时器（滚动检查等）和编辑日志，释放控件
+        self.tabs.clear_timers(tab_id)
+        self.journal.detach(tab_id)
+        self.tabs.unmap_widget(editor)
+        for key in ('content_splitter', 'find_panel'):
+            widget = tab_info.get(key)
+            if widget is not None:
+                widget.hide()
+                widget.setParent(None)
+                widget.deleteLater()
+        for key in ('editor', 'preview', 'content_splitter', 'find_panel'):
+            tab_info[key] = None
+        tab_info.pop('displayed_html', None)
+        
+        # 放置轻量占位控件
+        self._add_tab_placeholder(tab_info, "💤 此标签页已休眠，切换到此处时自动恢复")
+        tab_info['hibernated'] = True
+        
+        self.update_hibernation_status()
+        return True
+    
+    def _add_tab_placeholder(self, tab_info, text):
+        """在标签页中放置轻量占位控件（休眠或尚未加载时代替编辑器和预览）"""
+        placeholder = QLabel(text)
+        placeholder.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        placeholder.setStyleSheet(f"color: {self.text_secondary_color}; background-color: {self.bg_color};")
+        tab_info['splitter'].addWidget(placeholder)
+        tab_info['placeholder'] = placeholder
+    
+    def rehydrate_tab(self, tab_id):
+        """从休眠中恢复标签页（切换到该标签页时透明调用）
+        
+        有压缩快照时直接从快照恢复；会话恢复的占位标签页没有快照，从磁盘异步读取文件。
+        """
+        tab_info = self.tabs.get(tab_id)
+        if tab_info is None or not tab_info.get('hibernated'):
+            return
         
-        # 初始渲染
-        self.update_preview(tab_id)
+        if 'snapshot' in tab_info:
+            text = zlib.decompress(tab_info.pop('snapshot')).decode('utf-8')
+            self._materialize_tab(tab_id, text)
+        else:
+            self._load_lazy_tab(tab_id)
+    
+    def _materialize_tab(self, tab_id, text):
+        """用给定文本重建标签页的编辑器和预览，并恢复光标和滚动位置"""
+        tab_info = self.tabs[tab_id]
+        placeholder = tab_info.pop('placeholder', None)
+        if placeholder is not None:
+            placeholder.setParent(None)
+            placeholder.deleteLater()
+        
+        main_splitter = tab_info['splitter']
+        widgets = self._build_tab_widgets(tab_id, main_splitter, text)
+        tab_info.update(widgets)
+        if tab_info.get('saved_hash') is None:
+            tab_info['saved_hash'] = content_hash(text)  # 会话恢复的标签页首次从文件加载
+        tab_info['hibernated'] = False
+        tab_info.pop('hibernation_saved', None)
+        self.tabs.map_widget(tab_id, widgets['editor'])
+        self.journal.attach(tab_id, widgets['editor'].document(), tab_info['file_path'],
+                            self.tab_widget.tabText(self.tabs.index_of(tab_id)), tab_info['saved_hash'])
+        
+        # 恢复光标和滚动位置
+        editor = widgets['editor']
+        cursor = editor.textCursor()
+        cursor.setPosition(min(tab_info.pop('cursor_anchor', 0), len(text)))
+        cursor.setPosition(min(tab_info.pop('cursor_position', 0), len(text)), QTextCursor.MoveMode.KeepAnchor)
+        editor.setTextCursor(cursor)
+        self._restore_editor_scroll(editor, tab_info.pop('scroll_value', 0))
         
-        # 设置滚动同步
+        # 优先显示缓存的渲染结果（主题未变化时），否则重新渲染
+        cached_html = tab_info.get('rendered_html')
+        if cached_html and tab_info.get('rendered_theme') == self.current_theme_name:
+            self._on_html_ready(cached_html, tab_id)
+        else:
+            self.update_preview(tab_id)
         self.setup_scroll_sync(tab_id)
         
+        self.update_hibernation_status()
+    
+    def _restore_editor_scroll(self, editor, value, retries=SCROLL_RESTORE_RETRIES):
+        """恢复编辑器滚动位置；文档布局尚未完成（滚动范围不足）时稍后重试"""
+        if not value:
+            return
+        def apply():
+            try:
+                scrollbar = editor.verticalScrollBar()
+            except RuntimeError:
+                return  # 编辑器已被删除
+            if scrollbar.maximum() < value and retries > 0:
+                self._restore_editor_scroll(editor, value, retries - 1)
+                return
+            scrollbar.setValue(value)
+        QTimer.singleShot(0 if retries == SCROLL_RESTORE_RETRIES else SCROLL_RESTORE_INTERVAL, apply)
+    
+    def _load_lazy_tab(self, tab_id):
+        """在工作线程中读取占位标签页的文件，读取完成后再创建编辑器和预览"""
+        tab_info = self.tabs[tab_id]
+        if tab_info.get('loading'):
+            return  # 已在加载中
+        placeholder = tab_info.get('placeholder')
+        if placeholder is not None:
+            placeholder.setText("⏳ 正在加载...")
+        
+        if is_large_file(tab_info['file_path']):
+            # 大文件：先创建空编辑器，再渐进加载，加载完成后恢复光标和滚动位置
+            cursor_position = tab_info.pop('cursor_position', 0)
+            scroll_value = tab_info.pop('scroll_value', 0)
+            tab_info.pop('cursor_anchor', None)
+            self._materialize_tab(tab_id, "")
+            self.start_large_file_load(tab_id, tab_info['file_path'], cursor_position, scroll_value)
+            return
+        
+        tab_info['loading'] = True
+        self.file_io.read(
+            tab_info['file_path'],
+            lambda path, content: self._on_lazy_tab_read(tab_id, content),
+            lambda path, error_msg: self._on_lazy_tab_error(tab_id, error_msg),
+        )
+    
+    def _on_lazy_tab_read(self, tab_id, content):
+        """占位标签页的文件读取完成回调"""
+        tab_info = self.tabs.get(tab_id)
+        if tab_info is None or not tab_info.get('hibernated'):
+            return  # 标签页已在加载期间关闭
+        tab_info.pop('loading', None)
+        self._materialize_tab(tab_id, content)
+        if tab_id == self.get_current_tab_id():
+            self.update_word_count_display()
+            self.update_layout_for_width()
+            tab_info['editor'].setFocus()
+    
+    def _on_lazy_tab_error(self, tab_id, error_msg):
+        """占位标签页的文件读取失败回调（文件已被删除或无法访问）"""
+        tab_info = self.tabs.get(tab_id)
+        if tab_info is None:
+            return
+        tab_info.pop('loading', None)
+        placeholder = tab_info.get('placeholder')
+        if placeholder is not None:
+            placeholder.setText(f"⚠️ 无法打开文件: {tab_info['file_path']}\n{error_msg}")
+    
+    # ==================== 会话恢复 ====================
+    
+    def offer_journal_recovery(self):
+        """上次异常退出后，提示从编辑日志恢复未保存的修改"""
+        try:
+            entries = self.journal.find_recoverable()
+        except Exception as e:
+            log_exception(type(e), e, e.__traceback__, "查找可恢复的编辑日志")
+            return
+        if not entries:
+            return
+        
+        names = '\n'.join(
+            f"  • {header.get('name') or (Path(header['path']).name if header.get('path') else '未命名')}"
+            for _, header, _ in entries
+        )
+        reply = QMessageBox.question(
+            self,
+            "恢复未保存的修改",
+            f"Markdo 上次没有正常退出，以下 {len(entries)} 个文档有未保存的修改：\n\n{names}\n\n是否恢复？",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+            QMessageBox.StandardButton.Yes
+        )
+        if reply == QMessageBox.StandardButton.Yes:
+            for _, header, text in entries:
+                tab_id = self.create_new_tab(text, header.get('path'))
+                # 恢复的内容尚未保存到文件
+                self.tabs[tab_id]['saved_hash'] = None
+                self.tabs[tab_id]['editor'].document().setModified(True)
+                self.journal.start(tab_id)
+            self.show_status_message_temporarily(f"已恢复 {len(entries)} 个文档", 3000)
+        self.journal.discard_recoverable(entries)
+    
+    def save_session(self):
+        """记录当前打开的文件、光标/滚动位置和激活的标签页，供下次启动时恢复"""
+        try:
+            if not self.settings.value("session/restore", True, type=bool):
+                self.settings.remove("session/tabs")
+                return
+            
+            current_id = self.get_current_tab_id()
+            entries = []
+            active = 0
+            for index in range(self.tab_widget.count()):
+                tab_id = self.tabs.id_at(index)
+                tab_info = self.tabs.get(tab_id)
+                if tab_info is None or not tab_info.get('file_path'):
+                    continue  # 未保存过的新建标签页没有可恢复的文件
+                if tab_id == current_id:
+                    active = len(entries)
+                editor = tab_info.get('editor')
+                if editor is not None:
+                    cursor = editor.textCursor()
+                    position, anchor = cursor.position(), cursor.anchor()
+                    scroll = editor.verticalScrollBar().value()
+                else:
+                    # 休眠或尚未加载的标签页使用记录下来的位置
+                    position = tab_info.get('cursor_position', 0)
+                    anchor = tab_info.get('cursor_anchor', position)
+                    scroll = tab_info.get('scroll_value', 0)
+                entries.append({
+                    'path': tab_info['file_path'],
+                    'cursor': position,
+                    'anchor': anchor,
+                    'scroll': scroll,
+                })
+            
+            self.settings.setValue("session/tabs", json.dumps(entries, ensure_ascii=False))
+            self.settings.setValue("session/active", active)
+        except Exception as e:
+            log_exception(type(e), e, e.__traceback__, "保存会话")
+    
+    def restore_session(self):
+        """恢复上次会话打开的文件
+        
+        所有标签页先以轻量占位形式创建，只有激活的标签页立即读取文件，
+        其余标签页在首次切换到时才加载，启动耗时与标签页数量基本无关。
+        
+        Returns:
+            bool: 是否恢复了至少一个标签页
+        """
+        try:
+            if not self.settings.value("session/restore", True, type=bool):
+                return False
+            entries = json.loads(self.settings.value("session/tabs", "[]", type=str) or "[]")
+            active = self.settings.value("session/active", 0, type=int)
+        except Exception as e:
+            log_exception(type(e), e, e.__traceback__, "读取会话")
+            return False
+        
+        restored = []
+        for entry in entries:
+            file_path = entry.get('path')
+            if not file_path or not exists(file_path):
+                continue
+            restored.append(self.create_placeholder_tab(
+                file_path,
+                cursor_position=entry.get('cursor', 0),
+                cursor_anchor=entry.get('anchor', entry.get('cursor', 0)),
+                scroll_value=entry.get('scroll', 0),
+            ))
+        if not restored:
+            return False
+        
+        # 切换到上次激活的标签页并加载（索引未变化时不会触发 currentChanged，需手动加载）
+        tab_id = restored[min(max(active, 0), len(restored) - 1)]
+        self.tab_widget.setCurrentIndex(self.tabs.index_of(tab_id))
+        self._last_active_tab_id = tab_id
+        self.rehydrate_tab(tab_id)
+        return True
+    
+    def create_placeholder_tab(self, file_path, cursor_position=0, cursor_anchor=0, scroll_value=0):
+        """创建尚未加载的占位标签页，切换到该标签页时才从磁盘读取文件"""
+        tab_id = self.current_tab_id
+        self.current_tab_id += 1
+        
+        main_splitter = self._create_main_splitter()
+        self.tab_widget.addTab(main_splitter, Path(file_path).name)
+        
+        # 与休眠标签页相同的状态：没有编辑器和预览，只是没有快照，恢复时改为读取文件
+        tab_info = {
+            'file_path': file_path,
+            'splitter': main_splitter,
+            'saved_hash': None,  # 首次加载时根据文件内容计算
+            'hibernated': True,
+            'last_active': monotonic(),
+            'cursor_position': cursor_position,
+            'cursor_anchor': cursor_anchor,
+            'scroll_value': scroll_value,
+            'editor': None,
+            'preview': None,
+            'content_splitter': None,
+            'find_panel': None,
+        }
+        self._add_tab_placeholder(tab_info, "📄 切换到此标签页时加载")
+        self.tabs.register(tab_id, tab_info)
         return tab_id
     
+    def update_hibernation_status(self):
+        """在状态栏显示休眠节省的内存"""
+        if not hasattr(self, 'hibernation_label'):
+            return
+        saved = 0
+        count = 0
+        for tab_info in self.tabs.values():
+            if 'snapshot' in tab_info:
+                saved += tab_info.get('hibernation_saved', 0)
+                count += 1
+        if count:
+            self.hibernation_label.setText(f"💤 休眠 {count} 个标签页，约节省 {saved / (1024 * 1024):.1f} MB")
+            self.hibernation_label.show()
+        else:
+            self.hibernation_label.hide()
+    
+    def update_hibernation_settings(self, after_minutes, budget_mb):
+        """更新标签页休眠设置"""
+        self.hibernate_after_minutes = after_minutes
+        self.hibernate_budget_mb = budget_mb
+        if after_minutes or budget_mb:
+            self.hibernation_timer.start(HIBERNATE_CHECK_INTERVAL)
+        else:
+            self.hibernation_timer.stop()
+    
     def get_current_tab_id(self):
         """获取当前标签页ID"""
-        current_index = self.tab_widget.currentIndex()
-        for tab_id, info in self.tabs.items():
-            if self.tab_widget.indexOf(info['splitter']) == current_index:
-                return tab_id
-        return None
+        return self.tabs.current_id()
     
     def on_tab_changed(self):
         """标签页切换时更新字数统计和布局 - 添加淡入动画"""
         tab_id = self.get_current_tab_id()
+        
+        # 记录上一个标签页的最后激活时间，用于休眠判断
+        previous = self.tabs.get(self._last_active_tab_id)
+        if previous is not None:
+            previous['last_active'] = monotonic()
+        self._last_active_tab_id = tab_id
+        
+        # 切换到休眠的标签页时透明恢复
+        if tab_id is not None and tab_id in self.tabs and self.tabs[tab_id].get('hibernated'):
+            self.rehydrate_tab(tab_id)
+        
         if tab_id is not None and tab_id in self.tabs:
             # 为新切换到的标签页添加淡入动画
             splitter = self.tabs[tab_id]['splitter']
@@ -6316,6 +9330,8 @@ class MarkdownEditor(QMainWindow):
             splitter._fade_animation.start()
         
         self.update_word_count_display()
+        self.update_load_progress_display()
+        self._schedule_latency_overlay_update()
         # 更新布局以适应窗口宽度
         self.update_layout_for_width()
     
@@ -6333,24 +9349,24 @@ class MarkdownEditor(QMainWindow):
         self._pending_tab_id = tab_id
         self._update_timer.start(PREVIEW_UPDATE_DELAY)  # 防抖延迟，减少渲染频率
     
-    def _safe_stop_thread(self, thread_ref_name):
-        """安全地停止并清理线程（避免访问已删除的对象）"""
+    def _release_thread(self, thread_ref_name, wait_ms=0):
+        """释放已结束的工作线程引用（避免访问已删除的对象）
+        
+        不会强行终止线程：终止持有解释器锁的线程会使程序卡死。仍在运行的线程最多等待 wait_ms，
+        超时后保留引用（销毁运行中的 QThread 会使程序崩溃），进程退出时随之结束。
+        """
         thread = getattr(self, thread_ref_name, None)
         if thread is None:
             return
         
         try:
-            # 检查对象是否仍然有效
-            if hasattr(thread, 'isRunning'):
-                if thread.isRunning():
-                    thread.terminate()
-                    thread.wait(1000)  # 等待最多1秒
-        except (RuntimeError, AttributeError):
-            # 对象已被删除或属性不存在，忽略错误
-            pass
-        finally:
-            # 重置引用，允许垃圾回收
-            setattr(self, thread_ref_name, None)
+            if thread.isRunning() and not thread.wait(wait_ms):
+                logger.warning(f"工作线程 {thread_ref_name} 在 {wait_ms}ms 内未结束，不再等待")
+                return
+        except RuntimeError:
+            pass  # 对象已被删除（finished 时 deleteLater），说明线程已经结束
+        # 重置引用，允许垃圾回收
+        setattr(self, thread_ref_name, None)
     
     def _do_update_preview(self):
         """实际执行预览更新"""
@@ -6360,8 +9376,8 @@ class MarkdownEditor(QMainWindow):
     
     def setup_scroll_sync(self, tab_id):
         """设置编辑器和预览窗的滚动同步"""
-        if tab_id not in self.tabs:
-            return
+        if self._live_tab(tab_id) is None or self.tabs[tab_id]['preview'] is None:
+            return  # 预览尚未创建时，在 enable_previews() 中设置
         
         editor = self.tabs[tab_id]['editor']
         preview = self.tabs[tab_id]['preview']
@@ -6377,7 +9393,7 @@ class MarkdownEditor(QMainWindow):
     
     def add_scroll_listener_to_preview(self, tab_id):
         """为预览窗添加滚动监听器"""
-        if tab_id not in self.tabs:
+        if self._live_tab(tab_id) is None:
             return
         
         preview = self.tabs[tab_id]['preview']
@@ -6396,20 +9412,15 @@ class MarkdownEditor(QMainWindow):
         
         # 设置一个定时器来定期检查预览窗的滚动位置
         # 创建一个定时器用于检查滚动位置（避免使用控制台消息）
-        if not hasattr(self, '_scroll_check_timers'):
-            self._scroll_check_timers = {}
-        
-        if tab_id in self._scroll_check_timers:
-            self._scroll_check_timers[tab_id].stop()
-        
+        # 定时器登记在标签页注册表中，关闭标签页时自动停止并释放
         timer = QTimer(self)
         timer.timeout.connect(lambda: self.check_preview_scroll(tab_id))
         timer.start(16)  # 每16ms检查一次（约60fps），提高快速滚动时的响应性
-        self._scroll_check_timers[tab_id] = timer
+        self.tabs.set_timer(tab_id, 'scroll_check', timer)
     
     def check_preview_scroll(self, tab_id):
         """定期检查预览窗滚动位置并同步到编辑器"""
-        if tab_id not in self.tabs:
+        if self._live_tab(tab_id) is None:
             return
         
         # 检查同步滚动是否启用
@@ -6461,7 +9472,7 @@ class MarkdownEditor(QMainWindow):
     
     def _process_preview_scroll_info(self, tab_id, scroll_info_json):
         """处理预览窗滚动信息并同步到编辑器"""
-        if not scroll_info_json or tab_id not in self.tabs:
+        if not scroll_info_json or self._live_tab(tab_id) is None:
             return
         
         try:
@@ -6478,7 +9489,7 @@ class MarkdownEditor(QMainWindow):
     
     def sync_preview_scroll(self, tab_id, editor_scroll_value):
         """同步预览窗的滚动位置"""
-        if tab_id not in self.tabs:
+        if self._live_tab(tab_id) is None:
             return
         
         # 检查同步滚动是否启用
@@ -6540,7 +9551,7 @@ class MarkdownEditor(QMainWindow):
     
     def _apply_preview_scroll(self, tab_id, preview_info_json, editor_scroll_value, editor_max_scroll, is_at_top, is_at_bottom):
         """应用预览窗滚动位置"""
-        if tab_id not in self.tabs:
+        if self._live_tab(tab_id) is None:
             self._syncing_scroll = False
             return
         
@@ -6592,7 +9603,7 @@ class MarkdownEditor(QMainWindow):
     
     def sync_editor_scroll(self, tab_id, preview_scroll_data):
         """同步编辑器的滚动位置"""
-        if tab_id not in self.tabs:
+        if self._live_tab(tab_id) is None:
             return
         
         # 检查同步滚动是否启用
@@ -6675,39 +9686,131 @@ class MarkdownEditor(QMainWindow):
     
     def update_preview(self, tab_id):
         """更新预览（使用工作线程，避免阻塞GUI）"""
-        if tab_id not in self.tabs:
+        if self._live_tab(tab_id) is None or self.tabs[tab_id]['preview'] is None:
+            return  # 预览尚未创建时，在 enable_previews() 中渲染
+        
+        # 直接更新时取消同一标签页尚未触发的防抖更新
+        if getattr(self, '_pending_tab_id', None) == tab_id:
+            self._update_timer.stop()
+        
+        # 上一次渲染尚未完成时不强行终止（终止持有解释器锁的线程会使程序卡死），
+        # 等它完成后再渲染最新内容；已超时的渲染期间直接用纯文本显示最新内容
+        if self._render_in_progress():
+            self._queued_render_tab_id = tab_id
+            if self._render_timed_out:
+                self._show_plain_preview(tab_id, self.tabs[tab_id]['editor'].toPlainText())
             return
         
-        # 设置更新标志，避免在内容更新期间进行滚动同步
-        self._updating_preview = True
-        
         editor = self.tabs[tab_id]['editor']
         preview = self.tabs[tab_id]['preview']
         content = editor.toPlainText()
         
-        # 清理之前的渲染线程（安全检查，避免访问已删除的对象）
-        self._safe_stop_thread('_markdown_render_thread')
+        # 上次渲染超时的文档，内容没有明显变化时仍会超时，继续显示纯文本而不反复渲染
+        slow_chars = self.tabs[tab_id].get('slow_render_chars')
+        if slow_chars is not None and abs(len(content) - slow_chars) <= slow_chars * RENDER_RETRY_CHANGE_RATIO:
+            self._show_plain_preview(tab_id, content)
+            return
+        
+        # 设置更新标志，避免在内容更新期间进行滚动同步
+        self._updating_preview = True
+        
+        # 释放已结束的渲染线程（安全检查，避免访问已删除的对象）
+        self._release_thread('_markdown_render_thread')
+        
+        # 首次渲染（打开文件）时先显示磁盘缓存中的结果，后台渲染完成后再校验更新；未命中时写入缓存
+        write_cache = False
+        if 'rendered_html' not in self.tabs[tab_id] and len(content) >= RENDER_CACHE_MIN_CHARS:
+            cached_body = self.render_cache.get(RenderCache.key(content))
+            if cached_body is not None:
+                self._on_html_ready(self.wrap_html_with_style(cached_body), tab_id)
+            write_cache = cached_body is None
         
         # 创建工作线程进行Markdown渲染
-        # markdown_to_html方法已经包含了完整的转换流程（包括wrap_html_with_style）
+        # _render_preview_html 包含完整的转换流程（包括wrap_html_with_style）
         # 注意：该方法会访问self的主题属性，但这些属性是只读的，线程安全
         self._markdown_render_thread = MarkdownRenderThread(
             content, 
             tab_id,
-            lambda c: self.markdown_to_html(c)  # markdown转换函数（包含完整流程）
+            lambda c: self._render_preview_html(c, tab_id, write_cache)  # markdown转换函数（包含完整流程）
         )
         self._markdown_render_thread.html_ready.connect(self._on_html_ready)
         self._markdown_render_thread.error_occurred.connect(self._on_render_error)
         self._markdown_render_thread.finished.connect(self._markdown_render_thread.deleteLater)
+        self._markdown_render_thread.finished.connect(self._on_render_finished)
         self._markdown_render_thread.start()
+        
+        # 渲染看门狗：病态输入可能让 Markdown 解析耗时很久，超时后先显示纯文本
+        self._render_timed_out = False
+        self._render_watchdog_job = (tab_id, content)
+        self._render_watchdog.start(RENDER_WATCHDOG_MS)
+    
+    def _render_in_progress(self):
+        """预览渲染线程是否仍在运行"""
+        try:
+            return self._markdown_render_thread is not None and self._markdown_render_thread.isRunning()
+        except RuntimeError:
+            return False  # 线程对象已被删除，说明渲染已经结束
+    
+    def _on_render_finished(self):
+        """渲染线程结束：渲染期间有新内容时继续渲染最新内容（超时的文档由 update_preview 决定是否重试）"""
+        self._render_watchdog.stop()
+        if not self._render_timed_out:
+            finished_tab_id = self._render_watchdog_job[0]
+            if finished_tab_id in self.tabs:
+                self.tabs[finished_tab_id].pop('slow_render_chars', None)
+        tab_id, self._queued_render_tab_id = self._queued_render_tab_id, None
+        if tab_id is not None:
+            self.update_preview(tab_id)
+    
+    def _on_render_timeout(self):
+        """渲染超过 RENDER_WATCHDOG_MS 仍未完成：先显示纯文本预览，渲染完成后由 _on_html_ready 替换"""
+        if not self._render_in_progress():
+            return
+        self._render_timed_out = True
+        tab_id, content = self._render_watchdog_job
+        logger.warning(f"预览渲染超过 {RENDER_WATCHDOG_MS}ms，暂时显示纯文本（{len(content)} 字符）")
+        if tab_id in self.tabs:
+            self.tabs[tab_id]['slow_render_chars'] = len(content)
+        self._show_plain_preview(tab_id, content)
+    
+    def _show_plain_preview(self, tab_id, content):
+        """用纯文本预览代替尚未完成的渲染结果"""
+        if self._live_tab(tab_id) is None or self.tabs[tab_id]['preview'] is None:
+            return
+        self._on_html_ready(self.wrap_html_with_style(self.plain_text_html_body(content)), tab_id)
+        # 纯文本不是渲染结果，不用于休眠恢复
+        self.tabs[tab_id].pop('rendered_html', None)
+    
+    @staticmethod
+    def plain_text_html_body(content):
+        """渲染超时时使用的预览正文：转义后的原文"""
+        import html
+        return (
+            '<p><em>文档渲染耗时过长，暂时显示纯文本，渲染完成后自动更新。</em></p>'
+            f'<pre style="white-space: pre-wrap; word-break: break-all;">{html.escape(content)}</pre>'
+        )
     
     def _on_html_ready(self, html, tab_id):
         """Markdown渲染完成回调"""
         if tab_id not in self.tabs:
             return
         
+        # 缓存最近一次渲染结果，供标签页休眠后恢复时直接显示
+        self.tabs[tab_id]['rendered_html'] = html
+        self.tabs[tab_id]['rendered_theme'] = self.current_theme_name
+        if self.tabs[tab_id].get('hibernated') or self.tabs[tab_id]['preview'] is None:
+            return
+        
+        if html == self.tabs[tab_id].get('displayed_html'):
+            # 预览已经是该结果（如缓存命中后的后台校验），避免重新加载页面
+            self._updating_preview = False
+            return
+        self.tabs[tab_id]['displayed_html'] = html
+        
         preview = self.tabs[tab_id]['preview']
+        started = monotonic()
         preview.setHtml(html, QUrl("https://cdnjs.cloudflare.com/"))
+        GuiActivityLog.record("预览加载", started)
         
         # 预览更新后，设置滚动同步（如果尚未设置）
         # 在预览加载完成后会自动设置滚动监听器
@@ -6739,7 +9842,46 @@ class MarkdownEditor(QMainWindow):
         """将Markdown转换为HTML"""
         if not content.strip():
             return self.get_initial_html()
+        return self.wrap_html_with_style(self.markdown_to_html_body(content))
+    
+    def _render_preview_html(self, content, tab_id, write_cache):
+        """在渲染线程中将Markdown转换为HTML
+        
+        Args:
+            write_cache: 是否立即把正文写入磁盘渲染缓存（打开文件后的首次渲染）；
+                否则只记录最近一次的正文，在保存、休眠或关闭标签页时由 store_render_cache 写入
+        """
+        if not content.strip():
+            return self.get_initial_html()
+        
+        html_body = self.markdown_to_html_body(content)
+        if len(content) >= RENDER_CACHE_MIN_CHARS:
+            if write_cache:
+                self.render_cache.put(RenderCache.key(content), html_body)
+            else:
+                self._render_cache_pending[tab_id] = (content, html_body)
+        return self.wrap_html_with_style(html_body)
+    
+    def store_render_cache(self, tab_id, content=None):
+        """把标签页最近一次渲染的正文写入磁盘渲染缓存（保存、休眠或关闭标签页时调用）
         
+        Args:
+            content: 需要缓存的文档内容（默认为编辑器当前内容）；最近一次渲染的不是该内容时不写入
+        """
+        pending = self._render_cache_pending.pop(tab_id, None)
+        if pending is None:
+            return
+        rendered_content, html_body = pending
+        if content is None:
+            tab_info = self._live_tab(tab_id)
+            if tab_info is None:
+                return
+            content = tab_info['editor'].toPlainText()
+        if content == rendered_content:
+            self.render_cache.put(RenderCache.key(content), html_body)
+    
+    def markdown_to_html_body(self, content):
+        """将Markdown转换为HTML正文（不含样式）"""
         try:
             # 保护数学公式，避免Markdown解析器干扰
             math_placeholders = []
@@ -6759,11 +9901,13 @@ class MarkdownEditor(QMainWindow):
             # 注意：必须在 Markdown 解析之前保护，避免被误解析
             content = sub(r'\$\$[\s\S]*?\$\$', protect_math, content)
             # 保护 \(...\) 格式 (先处理，避免被 $...$ 匹配干扰)
-            content = sub(r'\\\([^\)]*?\\\)', protect_math, content)
+            # 公式内容不跨越下一个 \(，大量未闭合的 \( 时匹配仍是线性的
+            content = sub(r'\\\((?:(?!\\\()[^\)])*?\\\)', protect_math, content)
             # 保护行内公式 $...$ (不跨行，至少有一个非空字符)
             content = sub(r'\$(?!\$)([^\$\n]+?)\$(?!\$)', protect_math, content)
             
-            # 使用pymdown扩展
+            # 使用pymdown扩展（markdown 及 Pygments 在首次渲染时才导入，不影响启动速度）
+            from markdown import markdown
             html_body = markdown(content, extensions=[
                 'extra',
                 'codehilite',
@@ -6839,18 +9983,18 @@ class MarkdownEditor(QMainWindow):
                     return '\n'.join(result_parts)
                 return match.group(0)
             
-            # 处理段落中的公式块
-            html_body = sub(r'<p>((?:[^<]|<(?!\/p>))*?)</p>', fix_math_block_in_paragraph, html_body)
+            # 处理段落中的公式块（段落内容不跨越下一个 <p> 或 </p>，大量未闭合的 <p> 时匹配仍是线性的）
+            html_body = sub(r'<p>((?:[^<]|<(?!/?p>))*)</p>', fix_math_block_in_paragraph, html_body)
             
             # 清理多余的空白行（保留最多两个连续换行）
             html_body = sub(r'\n{3,}', '\n\n', html_body)
             
-            return self.wrap_html_with_style(html_body)
+            return html_body
         except Exception as e:
             # Markdown解析出错时返回纯文本
             import traceback
             traceback.print_exc()
-            return self.wrap_html_with_style(f"<pre>{content}</pre>")
+            return f"<pre>{content}</pre>"
     
     def wrap_html_with_style(self, html_body):
         """为HTML添加完整样式"""
@@ -7093,7 +10237,7 @@ window.lastScrollTop = window.pageYOffset || document.documentElement.scrollTop
     def insert_markdown(self, text):
         """插入Markdown文本"""
         tab_id = self.get_current_tab_id()
-        if tab_id is not None:
+        if self._live_tab(tab_id) is not None:
             editor = self.tabs[tab_id]['editor']
             cursor = editor.textCursor()
             cursor.insertText(text)
@@ -7102,7 +10246,7 @@ window.lastScrollTop = window.pageYOffset || document.documentElement.scrollTop
     def insert_markdown_wrapper(self, prefix, suffix):
         """插入包装类Markdown"""
         tab_id = self.get_current_tab_id()
-        if tab_id is not None:
+        if self._live_tab(tab_id) is not None:
             editor = self.tabs[tab_id]['editor']
             cursor = editor.textCursor()
             if cursor.hasSelection():
@@ -7117,33 +10261,206 @@ window.lastScrollTop = window.pageYOffset || document.documentElement.scrollTop
             editor.setFocus()
     
     def open_file(self):
-        """打开文件（使用工作线程，避免阻塞GUI）"""
-        file_path, _ = QFileDialog.getOpenFileName(
+        """打开文件（支持多选，由文件 I/O 服务并发读取，避免阻塞GUI）"""
+        file_paths, _ = QFileDialog.getOpenFileNames(
             self,
             "打开Markdown文件",
             "",
             "Markdown文件 (*.md *.markdown);;所有文件 (*.*)"
         )
+        self.open_files(file_paths)
+    
+    def open_files(self, file_paths):
+        """并发打开多个文件（文件对话框、拖放和命令行共用的入口）
         
-        if file_path:
-            # 显示加载状态
-            self.show_status_message_temporarily("正在打开文件...", 1000)
-            
-            # 清理之前的线程（安全检查，避免访问已删除的对象）
-            self._safe_stop_thread('_file_worker_thread')
-            
-            # 创建工作线程读取文件
-            self._file_worker_thread = FileWorkerThread('read', file_path)
-            self._file_worker_thread.file_read.connect(self._on_file_read)
-            self._file_worker_thread.error_occurred.connect(self._on_file_error)
-            self._file_worker_thread.finished.connect(self._file_worker_thread.deleteLater)
-            self._file_worker_thread.start()
+        已经打开的文件不会重复创建标签页，而是切换过去并与磁盘内容同步。
+        """
+        new_paths = []
+        open_tabs = []
+        for file_path in file_paths or []:
+            tab_id = self.find_tab_by_path(file_path)
+            if tab_id is None:
+                new_paths.append(file_path)
+            else:
+                open_tabs.append(tab_id)
+        if open_tabs:
+            self.tab_widget.setCurrentIndex(self.tabs.index_of(open_tabs[-1]))
+            self.on_external_changes([self.tabs[tab_id]['file_path'] for tab_id in open_tabs])
+        if not new_paths:
+            return
+        self.show_status_message_temporarily("正在打开文件...", 1000)
+        self.file_io.open_files(new_paths)
+    
+    def receive_files(self, file_paths):
+        """打开其他实例转交的文件，并把窗口切换到前台"""
+        if self.isMinimized():
+            self.showNormal()
+        self.raise_()
+        self.activateWindow()
+        self.open_files([path for path in file_paths if exists(path)])
+    
+    def find_tab_by_path(self, file_path):
+        """查找已打开指定文件的标签页，没有时返回 None"""
+        target = normalize_path(file_path)
+        for tab_id, tab_info in self.tabs.items():
+            if tab_info.get('file_path') and normalize_path(tab_info['file_path']) == target:
+                return tab_id
+        return None
     
     def _on_file_read(self, file_path, content):
-        """文件读取完成回调"""
+        """文件读取完成回调（按完成顺序依次创建标签页）"""
+        tab_id = self.find_tab_by_path(file_path)
+        if tab_id is not None:
+            # 读取期间同一文件已在其他标签页打开
+            self.tab_widget.setCurrentIndex(self.tabs.index_of(tab_id))
+            return
         self.create_new_tab(content, file_path)
         self.show_status_message_temporarily(f"已打开: {file_path}", 3000)
     
+    def _on_large_file_opened(self, file_path):
+        """大文件：先创建空标签页，再渐进加载内容"""
+        if self.find_tab_by_path(file_path) is not None:
+            self.tab_widget.setCurrentIndex(self.tabs.index_of(self.find_tab_by_path(file_path)))
+            return
+        tab_id = self.create_new_tab("", file_path)
+        self.start_large_file_load(tab_id, file_path)
+    
+    def start_large_file_load(self, tab_id, file_path, cursor_position=0, scroll_value=0):
+        """在标签页中渐进加载大文件
+        
+        加载期间编辑器只读、关闭撤销记录并暂停增量总线（避免每批内容都触发字数统计和预览更新），
+        加载完成后恢复编辑，所有追加的内容作为一个增量发布。
+        """
+        tab_info = self.tabs[tab_id]
+        editor = tab_info['editor']
+        self.journal.detach(tab_id)  # 加载过程中追加的内容不是编辑，完成后重新开始记录
+        editor.setReadOnly(True)
+        editor.document().setUndoRedoEnabled(False)
+        editor.blockSignals(True)
+        editor.delta_bus.blockSignals(True)
+        
+        loader = LargeFileLoader(file_path, editor.document(), self)
+        loader.progress_changed.connect(lambda loaded, total: self._on_large_file_progress(tab_id, loaded, total))
+        loader.finished.connect(lambda: self._on_large_file_loaded(tab_id, cursor_position, scroll_value))
+        loader.error_occurred.connect(lambda error_msg: self._on_large_file_error(tab_id, file_path, error_msg))
+        tab_info['large_loader'] = loader
+        self.tabs.set_timer(tab_id, 'large_file_load', loader)
+        loader.start()
+    
+    def _on_large_file_progress(self, tab_id, loaded, total):
+        """更新大文件加载进度（标签名和状态栏进度条）"""
+        tab_info = self._live_tab(tab_id)
+        if tab_info is None:
+            return
+        percent = loaded * 100 // total if total else 100
+        tab_info['load_percent'] = percent
+        index = self.tabs.index_of(tab_id)
+        if index >= 0 and percent < 100:
+            self.tab_widget.setTabText(index, f"{Path(tab_info['file_path']).name} ({percent}%)")
+        self.update_load_progress_display()
+    
+    def _on_large_file_loaded(self, tab_id, cursor_position, scroll_value):
+        """大文件加载完成：恢复编辑、记录保存状态并刷新预览和统计"""
+        tab_info = self._live_tab(tab_id)
+        if tab_info is None:
+            return
+        loader = tab_info.pop('large_loader')
+        tab_info.pop('load_percent', None)
+        editor = tab_info['editor']
+        editor.blockSignals(False)
+        editor.delta_bus.blockSignals(False)
+        editor.document().setUndoRedoEnabled(True)
+        editor.setReadOnly(False)
+        editor.document().setModified(False)
+        tab_info['saved_hash'] = loader.content_hash()
+        self.journal.attach(tab_id, editor.document(), tab_info['file_path'], Path(tab_info['file_path']).name,
+                            tab_info['saved_hash'])
+        
+        if cursor_position:
+            cursor = editor.textCursor()
+            cursor.setPosition(min(cursor_position, editor.document().characterCount() - 1))
+            editor.setTextCursor(cursor)
+        self._restore_editor_scroll(editor, scroll_value)
+        
+        index = self.tabs.index_of(tab_id)
+        if index >= 0:
+            self.tab_widget.setTabText(index, Path(tab_info['file_path']).name)
+        editor.delta_bus.flush()  # 字数统计等订阅者随之更新
+        self.update_preview(tab_id)
+        self.update_load_progress_display()
+        self.show_status_message_temporarily(f"已打开: {tab_info['file_path']}", 3000)
+    
+    def _on_large_file_error(self, tab_id, file_path, error_msg):
+        """大文件加载失败：关闭不完整的标签页并提示"""
+        index = self.tabs.index_of(tab_id)
+        if index >= 0:
+            self.close_tab(index)
+        self.update_load_progress_display()
+        self._on_file_error(f"无法打开 {Path(file_path).name}: {error_msg}")
+    
+    def update_load_progress_display(self):
+        """当前标签页正在渐进加载时在状态栏显示进度"""
+        if not hasattr(self, 'load_progress_bar'):
+            return
+        tab_info = self._live_tab(self.get_current_tab_id())
+        if tab_info is None or tab_info.get('large_loader') is None:
+            self.load_progress_bar.hide()
+            return
+        self.load_progress_bar.setValue(tab_info.get('load_percent', 0))
+        self.load_progress_bar.show()
+    
+    def _on_open_failed(self, file_path, error_msg):
+        """批量打开中的文件读取失败，批次结束后统一提示"""
+        self._open_failures.append((file_path, error_msg))
+    
+    def _on_open_progress(self, done, total):
+        """更新文件打开进度条，批次结束后提示失败的文件"""
+        if done < total and total > 1:
+            self.io_progress_bar.setFormat(f"正在打开 {done}/{total}")
+            self.io_progress_bar.setRange(0, total)
+            self.io_progress_bar.setValue(done)
+            self.io_progress_bar.show()
+            return
+        if done < total:
+            return
+        self.io_progress_bar.hide()
+        if self._open_failures:
+            failures = '\n'.join(f"  • {Path(path).name}: {error_msg}" for path, error_msg in self._open_failures)
+            self._open_failures = []
+            self._on_file_error(f"以下文件无法打开：\n{failures}")
+    
+    def _io_progress_bar_style(self):
+        """文件打开进度条样式"""
+        return f"""
+            QProgressBar {{
+                background-color: {self.bg_secondary_color};
+                color: {self.text_secondary_color};
+                border: 1px solid {self.border_color};
+                border-radius: 0;
+                font-size: 11px;
+                text-align: center;
+            }}
+            QProgressBar::chunk {{
+                background-color: {self.accent_color};
+            }}
+        """
+    
+    def dragEnterEvent(self, event):
+        """拖入本地文件时接受拖放"""
+        if local_file_paths(event.mimeData()):
+            event.acceptProposedAction()
+        else:
+            super().dragEnterEvent(event)
+    
+    def dropEvent(self, event):
+        """拖放本地文件到窗口时打开"""
+        paths = local_file_paths(event.mimeData())
+        if paths:
+            event.acceptProposedAction()
+            self.open_files(paths)
+        else:
+            super().dropEvent(event)
+    
     def _on_file_error(self, error_msg):
         """文件操作错误回调"""
         QMessageBox.critical(self, "错误", f"文件操作失败: {error_msg}")
@@ -7151,59 +10468,273 @@ window.lastScrollTop = window.pageYOffset || document.documentElement.scrollTop
     def save_file(self):
         """保存文件（使用工作线程，避免阻塞GUI）"""
         tab_id = self.get_current_tab_id()
-        if tab_id is None:
+        if self._live_tab(tab_id) is None:
+            return
+        if self.tabs[tab_id].get('large_loader') is not None:
+            self.show_status_message_temporarily("文件仍在加载中，请在加载完成后保存", 2000)
+            return
+        
+        jobs = self._resolve_save_jobs([tab_id])
+        if jobs:
+            self.write_tabs(jobs)
+    
+    def save_all(self):
+        """全部保存：并发写入所有有未保存修改的标签页"""
+        dirty_tabs = [tab_id for tab_id in self.tabs.keys() if self.has_unsaved_changes(tab_id)]
+        if not dirty_tabs:
+            self.show_status_message_temporarily("没有需要保存的修改", 2000)
             return
+        jobs = self._resolve_save_jobs(dirty_tabs)
+        if jobs:
+            self.write_tabs(jobs)
+    
+    def _resolve_save_jobs(self, tab_ids):
+        """确定每个标签页的保存路径（新建标签页弹出保存对话框）
         
-        file_path = self.tabs[tab_id].get('file_path')
+        Returns:
+            list: [(tab_id, file_path)]，用户取消任一保存对话框时返回 None
+        """
+        jobs = []
+        for tab_id in tab_ids:
+            tab_info = self._live_tab(tab_id)
+            if tab_info is None or tab_info.get('large_loader') is not None:
+                continue
+            file_path = tab_info.get('file_path')
+            if not file_path:
+                self.tab_widget.setCurrentIndex(self.tabs.index_of(tab_id))
+                file_path, _ = QFileDialog.getSaveFileName(
+                    self,
+                    "保存Markdown文件",
+                    "",
+                    "Markdown文件 (*.md);;所有文件 (*.*)"
+                )
+                if not file_path:
+                    return None
+            jobs.append((tab_id, file_path))
+        return jobs
+    
+    def write_tabs(self, jobs, on_finished=None):
+        """通过文件 I/O 服务并发、原子地写入多个标签页
+        
+        每个文件写入成功后立即标记对应标签页为已保存；全部完成后统一报告结果。
         
-        if not file_path:
-            file_path, _ = QFileDialog.getSaveFileName(
-                self,
-                "保存Markdown文件",
-                "",
-                "Markdown文件 (*.md);;所有文件 (*.*)"
+        Args:
+            jobs: [(tab_id, file_path)]
+            on_finished: 全部写入结束后的回调 (success)，success 表示所有文件都已写入
+        """
+        if not jobs:
+            if on_finished is not None:
+                on_finished(True)
+            return
+        batch = {'pending': len(jobs), 'written': 0, 'skipped': 0, 'failures': [], 'on_finished': on_finished}
+        self.show_status_message_temporarily("正在保存文件...", 1000)
+        for tab_id, file_path in jobs:
+            document = self.tabs[tab_id]['editor'].document()
+            content = document.toPlainText()
+            revision = document.revision()
+            self.file_io.write(
+                file_path, content,
+                lambda path, skipped, tab_id=tab_id, content=content, revision=revision:
+                    self._on_file_written(batch, tab_id, path, content, revision, skipped),
+                lambda path, error_msg: self._on_file_write_failed(batch, path, error_msg),
             )
+    
+    def _on_file_written(self, batch, tab_id, file_path, content, revision, skipped):
+        """单个文件写入完成回调"""
+        batch['skipped' if skipped else 'written'] += 1
+        batch['last_path'] = file_path
+        if tab_id in self.tabs:  # 标签页可能已在保存期间关闭
+            self.mark_tab_saved(tab_id, file_path, content, revision)
+            # 更新标签名
+            index = self.tabs.index_of(tab_id)
+            self.tab_widget.setTabText(index, Path(file_path).name)
+        self._finish_write_batch(batch)
+    
+    def _on_file_write_failed(self, batch, file_path, error_msg):
+        """单个文件写入失败回调"""
+        batch['failures'].append((file_path, error_msg))
+        self._finish_write_batch(batch)
+    
+    def _finish_write_batch(self, batch):
+        """批次中的所有写入都结束后报告结果"""
+        batch['pending'] -= 1
+        if batch['pending'] > 0:
+            return
+        failures = batch['failures']
+        if failures:
+            details = '\n'.join(f"  • {Path(path).name}: {error_msg}" for path, error_msg in failures)
+            self._on_file_error(f"以下文件保存失败：\n{details}")
+        elif batch['written'] + batch['skipped'] == 1:
+            self.show_status_message_temporarily(f"已保存: {batch['last_path']}", 3000)
+        else:
+            message = f"已保存 {batch['written']} 个文件"
+            if batch['skipped']:
+                message += f"（{batch['skipped']} 个文件内容未变化，已跳过）"
+            self.show_status_message_temporarily(message, 3000)
+        if batch['on_finished'] is not None:
+            batch['on_finished'](not failures)
+    
+    def mark_tab_saved(self, tab_id, file_path, content, revision):
+        """记录标签页已保存：更新路径和内容哈希，删除编辑日志
         
-        if file_path:
-            content = self.tabs[tab_id]['editor'].toPlainText()
-            
-            # 显示保存状态
-            self.show_status_message_temporarily("正在保存文件...", 1000)
-            
-            # 清理之前的线程（安全检查，避免访问已删除的对象）
-            self._safe_stop_thread('_file_worker_thread')
-            
-            # 创建工作线程写入文件
-            self._file_worker_thread = FileWorkerThread('write', file_path, content)
-            self._file_worker_thread.file_written.connect(lambda path: self._on_file_written(path, tab_id, content))
-            self._file_worker_thread.error_occurred.connect(self._on_file_error)
-            self._file_worker_thread.finished.connect(self._file_worker_thread.deleteLater)
-            self._file_worker_thread.start()
+        Args:
+            content: 写入文件的内容
+            revision: 取出 content 时文档的修订号；保存期间又有编辑时文档仍保持已修改状态
+        """
+        tab_info = self.tabs[tab_id]
+        tab_info['file_path'] = file_path
+        tab_info['saved_hash'] = content_hash(content)
+        self.store_render_cache(tab_id, content)
+        tab_info.pop('dirty_check', None)
+        editor = tab_info.get('editor')
+        unchanged = editor is not None and editor.document().revision() == revision
+        if unchanged:
+            editor.document().setModified(False)
+        
+        # 已保存的内容无需恢复，删除编辑日志；文档与文件相同时之后的修改以该文件为基准
+        self.journal.mark_clean(tab_id, file_path, Path(file_path).name,
+                                tab_info['saved_hash'] if unchanged else None)
+        self.update_watched_paths()
+    
+    # ==================== 外部文件修改 ====================
+    
+    def update_watched_paths(self):
+        """监视所有已打开标签页的文件"""
+        self.file_watcher.set_paths(tab_info.get('file_path') for tab_info in self.tabs.values())
+    
+    def on_external_changes(self, paths):
+        """处理一批外部修改的文件"""
+        changed = {normalize_path(path) for path in paths}
+        for tab_id, tab_info in list(self.tabs.items()):
+            file_path = tab_info.get('file_path')
+            if not file_path or normalize_path(file_path) not in changed:
+                continue
+            if tab_info.get('large_loader') is not None or tab_info.get('loading'):
+                continue  # 正在加载，加载结果即为最新内容
+            if tab_info.get('hibernated'):
+                if 'snapshot' in tab_info:
+                    # 休眠快照已过期，改为切换到该标签页时重新读取文件
+                    del tab_info['snapshot']
+                    for key in ('rendered_html', 'rendered_theme', 'saved_hash', 'hibernation_saved'):
+                        tab_info.pop(key, None)
+                    tab_info['placeholder'].setText("📄 文件已在外部修改，切换到此标签页时重新加载")
+                    self.update_hibernation_status()
+                continue
+            self._check_external_change(tab_id, file_path)
+    
+    def _check_external_change(self, tab_id, file_path):
+        """在工作线程中读取文件并与已保存内容比较"""
+        task = FileCheckTask(file_path, self.tabs[tab_id].get('saved_hash'))
+        self.file_io.submit(
+            task, task.signals.file_checked,
+            lambda path, content, new_hash: self._on_external_checked(tab_id, content, new_hash),
+            lambda path, error_msg: self.show_status_message_temporarily(f"⚠️ 文件已在外部删除或无法读取: {Path(path).name}", 5000),
+        )
+    
+    def _on_external_checked(self, tab_id, content, new_hash):
+        """外部修改检查完成：干净的标签页直接更新，有未保存修改时提示冲突"""
+        tab_info = self._live_tab(tab_id)
+        if tab_info is None or content is None:
+            return
+        if self.has_unsaved_changes(tab_id):
+            if not self._external_conflicts:
+                QTimer.singleShot(0, self._resolve_external_conflicts)  # 同一批次的冲突合并为一次提示
+            self._external_conflicts.append((tab_id, content, new_hash))
+        else:
+            self.reload_tab_from_disk(tab_id, content)
+    
+    def _resolve_external_conflicts(self):
+        """询问用户是否用磁盘上的新版本覆盖有未保存修改的标签页"""
+        conflicts = [c for c in self._external_conflicts if self._live_tab(c[0]) is not None]
+        self._external_conflicts = []
+        if not conflicts:
+            return
+        names = '\n'.join(f"  • {Path(self.tabs[tab_id]['file_path']).name}" for tab_id, _, _ in conflicts)
+        reply = QMessageBox.question(
+            self,
+            "文件已在外部修改",
+            f"以下文件已在外部修改，但在 Markdo 中也有未保存的修改：\n\n{names}\n\n"
+            f"是否重新加载磁盘上的版本？（重新加载后可以通过撤销找回你的修改）",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+            QMessageBox.StandardButton.No
+        )
+        if reply == QMessageBox.StandardButton.Yes:
+            for tab_id, content, _ in conflicts:
+                self.reload_tab_from_disk(tab_id, content)
+    
+    def reload_tab_from_disk(self, tab_id, content):
+        """用磁盘上的新内容更新标签页：在工作线程中计算行差异，只替换变化的部分"""
+        document = self.tabs[tab_id]['editor'].document()
+        revision = document.revision()
+        task = LineDiffTask(self.tabs[tab_id]['file_path'], document.toPlainText(), content)
+        self.file_io.submit(
+            task, task.signals.diff_ready,
+            lambda path, opcodes: self._apply_external_diff(tab_id, content, revision, opcodes),
+        )
     
-    def _on_file_written(self, file_path, tab_id, content):
-        """文件写入完成回调"""
-        self.tabs[tab_id]['file_path'] = file_path
-        # 更新保存的内容，标记为已保存
-        self.tabs[tab_id]['saved_content'] = content
+    def _apply_external_diff(self, tab_id, content, revision, opcodes):
+        """在一个编辑块中应用行差异（可整体撤销），保留光标、滚动位置和未变化文本块的高亮状态"""
+        tab_info = self._live_tab(tab_id)
+        if tab_info is None:
+            return
+        document = tab_info['editor'].document()
+        if document.revision() != revision:
+            # 计算差异期间又有编辑，重新检查
+            self._check_external_change(tab_id, tab_info['file_path'])
+            return
         
-        # 更新标签名
-        index = self.tab_widget.indexOf(self.tabs[tab_id]['splitter'])
-        self.tab_widget.setTabText(index, Path(file_path).name)
+        new_lines = content.split('\n')
+        block_count = document.blockCount()
+        cursor = QTextCursor(document)
+        cursor.beginEditBlock()
+        # 从后往前应用，前面的行号不受影响
+        for tag, i1, i2, j1, j2 in reversed(opcodes):
+            replacement = '\n'.join(new_lines[j1:j2])
+            if i1 < i2 and j1 < j2:
+                # 替换第 i1..i2-1 行
+                cursor.setPosition(document.findBlockByNumber(i1).position())
+                last = document.findBlockByNumber(i2 - 1)
+                cursor.setPosition(last.position() + last.length() - 1, QTextCursor.MoveMode.KeepAnchor)
+                cursor.insertText(replacement)
+            elif i1 == i2:
+                # 在第 i1 行前插入
+                if i1 < block_count:
+                    cursor.setPosition(document.findBlockByNumber(i1).position())
+                    cursor.insertText(replacement + '\n')
+                else:
+                    cursor.movePosition(QTextCursor.MoveOperation.End)
+                    cursor.insertText('\n' + replacement)
+            else:
+                # 删除第 i1..i2-1 行（连同换行符）
+                if i2 < block_count:
+                    cursor.setPosition(document.findBlockByNumber(i1).position())
+                    cursor.setPosition(document.findBlockByNumber(i2).position(), QTextCursor.MoveMode.KeepAnchor)
+                elif i1 > 0:
+                    previous = document.findBlockByNumber(i1 - 1)
+                    cursor.setPosition(previous.position() + previous.length() - 1)
+                    cursor.movePosition(QTextCursor.MoveOperation.End, QTextCursor.MoveMode.KeepAnchor)
+                else:
+                    cursor.select(QTextCursor.SelectionType.Document)
+                cursor.removeSelectedText()
+        if document.toPlainText() != content:
+            # 文本中有 QTextDocument 会转换的字符时退回整体替换（仍在同一编辑块中，可撤销）
+            cursor.select(QTextCursor.SelectionType.Document)
+            cursor.insertText(content)
+        cursor.endEditBlock()
         
-        self.show_status_message_temporarily(f"已保存: {file_path}", 3000)
+        self.mark_tab_saved(tab_id, tab_info['file_path'], content, document.revision())
+        self.show_status_message_temporarily(f"已重新加载外部修改: {Path(tab_info['file_path']).name}", 3000)
     
     def close_tab(self, index):
         """关闭标签页"""
         # 找到对应的tab_id
-        tab_id_to_remove = None
-        for tab_id, info in self.tabs.items():
-            if self.tab_widget.indexOf(info['splitter']) == index:
-                tab_id_to_remove = tab_id
-                break
+        tab_id_to_remove = self.tabs.id_at(index)
         
         if tab_id_to_remove is not None:
-            self.tab_widget.removeTab(index)
-            del self.tabs[tab_id_to_remove]
+            self.store_render_cache(tab_id_to_remove)
+            self.journal.detach(tab_id_to_remove)
+            # 注册表负责移除标签页、停止其定时器并释放控件
+            self.tabs.remove_tab(tab_id_to_remove)
         
         # 如果没有标签页了，创建一个新的
         if self.tab_widget.count() == 0:
@@ -7212,40 +10743,106 @@ window.lastScrollTop = window.pageYOffset || document.documentElement.scrollTop
     def undo(self):
         """撤销"""
         tab_id = self.get_current_tab_id()
-        if tab_id is not None:
+        if self._live_tab(tab_id) is not None:
             self.tabs[tab_id]['editor'].undo()
     
     def redo(self):
         """重做"""
         tab_id = self.get_current_tab_id()
-        if tab_id is not None:
+        if self._live_tab(tab_id) is not None:
             self.tabs[tab_id]['editor'].redo()
     
     def get_current_editor(self):
         """获取当前编辑器"""
         tab_id = self.get_current_tab_id()
-        if tab_id is not None:
+        if self._live_tab(tab_id) is not None:
             return self.tabs[tab_id]['editor']
         return None
     
-    def get_word_count(self):
-        """获取当前编辑器的字数统计"""
+    def get_word_count(self, selection_only=False):
+        """获取当前编辑器的字数统计
+        
+        Args:
+            selection_only: 为 True 且有选中内容时只统计选中部分
+        
+        Returns:
+            (字数, 行数, 字符数)
+        """
         editor = self.get_current_editor()
-        if editor:
-            content = editor.toPlainText()
-            # 计算字数：包括中英文字符、数字等
-            word_count = len(content)
-            # 计算行数
-            line_count = content.count('\n') + 1 if content else 0
-            # 计算字符数（不包括换行符）
-            char_count = len(content.replace('\n', ''))
-            return word_count, line_count, char_count
-        return 0, 0, 0
+        if editor is None:
+            return 0, 0, 0
+        cursor = editor.textCursor()
+        if selection_only and cursor.hasSelection():
+            text = cursor.selectedText().replace('\u2029', '\n')
+            word_count, char_count = DocumentStatistics.count(text, self.stats_exclude_markup)
+            return word_count, text.count('\n') + 1, char_count
+        statistics = editor.statistics
+        return statistics.words, statistics.lines, statistics.chars
     
     def update_word_count_display(self):
-        """更新字数统计显示"""
-        word_count, line_count, char_count = self.get_word_count()
-        self.word_count_label.setText(f"字数: {word_count} | 行数: {line_count} | 字符: {char_count}")
+        """更新字数统计显示（有选中内容时显示选中部分的统计）"""
+        editor = self.get_current_editor()
+        selected = editor is not None and editor.textCursor().hasSelection()
+        word_count, line_count, char_count = self.get_word_count(selection_only=selected)
+        prefix = "选中 " if selected else ""
+        self.word_count_label.setText(f"{prefix}字数: {word_count} | 行数: {line_count} | 字符: {char_count}")
+    
+    def toggle_latency_overlay(self):
+        """显示/隐藏输入延迟浮层（当前标签页按文档规模的按键到绘制延迟分位数）"""
+        if getattr(self, 'latency_overlay', None) is None:
+            self.latency_overlay = QLabel(self)
+            self.latency_overlay.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents)
+            self.latency_overlay.setStyleSheet(
+                "background-color: rgba(0, 0, 0, 170); color: #e0e0e0; padding: 6px 10px; "
+                "border-radius: 4px; font-family: Consolas; font-size: 11px;")
+            self.latency_overlay.hide()
+        if self.latency_overlay.isVisible():
+            self.latency_overlay.hide()
+            return
+        self.latency_overlay.show()
+        self.update_latency_overlay()
+    
+    def _schedule_latency_overlay_update(self):
+        if getattr(self, 'latency_overlay', None) is not None and self.latency_overlay.isVisible():
+            self.frame_scheduler.schedule('latency_overlay', self.update_latency_overlay)
+    
+    def update_latency_overlay(self):
+        """刷新输入延迟浮层的内容和位置（显示在当前编辑器右上角）"""
+        overlay = getattr(self, 'latency_overlay', None)
+        if overlay is None or not overlay.isVisible():
+            return
+        editor = self.get_current_editor()
+        lines = ["按键到绘制延迟（ms）"]
+        summary = editor.latency_stats.summary() if editor is not None else {}
+        for label, values in summary.items():
+            lines.append(f"{label}: p50 {values['p50']:.1f}  p95 {values['p95']:.1f}  "
+                         f"p99 {values['p99']:.1f}  max {values['max']:.1f}  n={values['count']}")
+        if not summary:
+            lines.append("暂无样本")
+        overlay.setText("\n".join(lines))
+        overlay.adjustSize()
+        if editor is not None:
+            top_right = editor.mapTo(self, editor.rect().topRight())
+            overlay.move(top_right.x() - overlay.width() - 24, top_right.y() + 8)
+        overlay.raise_()
+    
+    def _on_editor_selection_changed(self):
+        """选区变化后延迟更新统计，拖动选择时只统计最终的选区"""
+        if not hasattr(self, '_selection_stats_timer'):
+            self._selection_stats_timer = QTimer(self)
+            self._selection_stats_timer.setSingleShot(True)
+            self._selection_stats_timer.timeout.connect(
+                lambda: self.frame_scheduler.schedule('word_count', self.update_word_count_display))
+        self._selection_stats_timer.start(STATS_SELECTION_DELAY)
+    
+    def update_statistics_settings(self, exclude_markup):
+        """更新字数统计是否计入 Markdown 标记"""
+        self.stats_exclude_markup = exclude_markup
+        for tab_id in self.tabs:
+            tab_info = self._live_tab(tab_id)
+            if tab_info is not None:
+                tab_info['editor'].statistics.set_exclude_markup(exclude_markup)
+        self.update_word_count_display()
     
     def show_status_message(self, message, timeout=0):
         """显示状态栏消息，临时隐藏字数统计"""
@@ -7498,7 +11095,7 @@ window.lastScrollTop = window.pageYOffset || document.documentElement.scrollTop
     def clear_current_tab(self):
         """清空当前标签页"""
         tab_id = self.get_current_tab_id()
-        if tab_id is None:
+        if self._live_tab(tab_id) is None:
             return
         
         reply = QMessageBox.question(
@@ -7515,7 +11112,7 @@ window.lastScrollTop = window.pageYOffset || document.documentElement.scrollTop
     def copy_all_content(self):
         """复制当前编辑器的全部内容到剪贴板"""
         tab_id = self.get_current_tab_id()
-        if tab_id is None:
+        if self._live_tab(tab_id) is None:
             return
         
         content = self.tabs[tab_id]['editor'].toPlainText()
@@ -7534,7 +11131,7 @@ window.lastScrollTop = window.pageYOffset || document.documentElement.scrollTop
     def show_find_dialog(self):
         """显示/隐藏查找面板"""
         tab_id = self.get_current_tab_id()
-        if tab_id is None or tab_id not in self.tabs:
+        if self._live_tab(tab_id) is None:
             return
         
         find_panel = self.tabs[tab_id]['find_panel']
@@ -7751,6 +11348,7 @@ window.lastScrollTop = window.pageYOffset || document.documentElement.scrollTop
 
 帮助:
   F1 - 显示此帮助
+  Ctrl+Shift+F12 - 显示/隐藏输入延迟浮层
 """
         
         # 创建帮助对话框
@@ -7828,7 +11426,10 @@ window.lastScrollTop = window.pageYOffset || document.documentElement.scrollTop
     def save_file_as(self):
         """另存为文件"""
         tab_id = self.get_current_tab_id()
-        if tab_id is None:
+        if self._live_tab(tab_id) is None:
+            return
+        if self.tabs[tab_id].get('large_loader') is not None:
+            self.show_status_message_temporarily("文件仍在加载中，请在加载完成后保存", 2000)
             return
         
         # 获取当前文件路径作为默认路径
@@ -7849,52 +11450,43 @@ window.lastScrollTop = window.pageYOffset || document.documentElement.scrollTop
         )
         
         if file_path:
-            # 保存文件
-            content = self.tabs[tab_id]['editor'].toPlainText()
-            try:
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(content)
-                
-                # 更新标签页的文件路径
-                self.tabs[tab_id]['file_path'] = file_path
-                # 更新保存的内容，标记为已保存
-                self.tabs[tab_id]['saved_content'] = content
-                
-                # 更新标签页标题
-                file_name = file_path.split('/')[-1] if '/' in file_path else file_path.split('\\\\')[-1]
-                tab_index = self.tab_widget.indexOf(self.tabs[tab_id]['splitter'])
-                self.tab_widget.setTabText(tab_index, file_name)
-                
-                # 更新状态栏
-                self.show_status_message_temporarily(f"✅ 文件已另存为: {file_path}", 3000)
-                
-                # 更新窗口标题
-                self.update_window_title()
-                
-            except Exception as e:
-                QMessageBox.critical(self, "保存失败", f"无法保存文件:\n{str(e)}")
+            # 保存文件（标签页路径和标题在写入完成后更新）
+            def on_finished(success):
+                if success:
+                    self.show_status_message_temporarily(f"✅ 文件已另存为: {file_path}", 3000)
+                    self.update_window_title()
+            self.write_tabs([(tab_id, file_path)], on_finished)
     
     def has_unsaved_changes(self, tab_id):
-        """检查指定标签页是否有未保存的修改"""
-        if tab_id not in self.tabs:
+        """检查指定标签页是否有未保存的修改
+        
+        先看 QTextDocument 的修改标志（撤销回已保存状态时自动清除），未修改时无需读取文本；
+        已修改时再比较内容哈希（如删除后又输入相同内容），结果按文档修订号缓存。
+        """
+        tab_info = self._live_tab(tab_id)
+        # 休眠的标签页一定没有未保存的修改，正在渐进加载的标签页内容尚不完整
+        if tab_info is None or tab_info.get('large_loader') is not None:
             return False
         
-        current_content = self.tabs[tab_id]['editor'].toPlainText()
-        saved_content = self.tabs[tab_id].get('saved_content', '')
+        document = tab_info['editor'].document()
+        if not document.isModified():
+            return False
         
-        # 如果当前内容与保存的内容不同，说明有未保存的修改
-        return current_content != saved_content
+        revision = document.revision()
+        cached = tab_info.get('dirty_check')
+        if cached is not None and cached[0] == revision:
+            return cached[1]
+        content = document.toPlainText()
+        if not tab_info.get('file_path') and not content.strip():
+            dirty = False  # 只有空白内容的新建标签页不需要保存
+        else:
+            dirty = content_hash(content) != tab_info.get('saved_hash')
+        tab_info['dirty_check'] = (revision, dirty)
+        return dirty
     
     def has_any_unsaved_changes(self):
         """检查是否有任何标签页存在未保存的修改"""
-        for tab_id in self.tabs.keys():
-            current_content = self.tabs[tab_id]['editor'].toPlainText()
-            saved_content = self.tabs[tab_id].get('saved_content', '')
-            
-            # 如果文档有内容且与保存的内容不同，说明有未保存的修改
-            if current_content.strip() and current_content != saved_content:
-                return True
-        return False
+        return any(self.has_unsaved_changes(tab_id) for tab_id in self.tabs.keys())
     
     def closeEvent(self, event):
         """窗口关闭事件 - 检查未保存的修改"""
@@ -7902,9 +11494,7 @@ window.lastScrollTop = window.pageYOffset || document.documentElement.scrollTop
             # 查找有未保存修改的标签页
             unsaved_tabs = []
             for tab_id, tab_info in self.tabs.items():
-                current_content = tab_info['editor'].toPlainText()
-                saved_content = tab_info.get('saved_content', '')
-                if current_content.strip() and current_content != saved_content:
+                if self.has_unsaved_changes(tab_id):
                     file_path = tab_info.get('file_path')
                     tab_name = Path(file_path).name if file_path else f"新建 {tab_id + 1}"
                     unsaved_tabs.append((tab_id, tab_name))
@@ -7986,22 +11576,14 @@ window.lastScrollTop = window.pageYOffset || document.documentElement.scrollTop
                 reply = save_dialog.exec()
                 
                 if reply == 1:  # 保存
-                    # 保存所有未保存的标签页
-                    for tab_id, tab_name in unsaved_tabs:
-                        self.tab_widget.setCurrentIndex(
-                            self.tab_widget.indexOf(self.tabs[tab_id]['splitter'])
-                        )
-                        self.save_file()
-                    
-                    # 再次检查是否还有未保存的修改
-                    # 如果用户取消了某个保存对话框，仍然会有未保存的修改
-                    if self.has_any_unsaved_changes():
-                        # 还有未保存的修改，取消关闭
-                        event.ignore()
+                    # 并发保存所有未保存的标签页；用户取消某个保存对话框时取消关闭
+                    event.ignore()
+                    jobs = self._resolve_save_jobs([tab_id for tab_id, _ in unsaved_tabs])
+                    if jobs is None:
                         return
-                    else:
-                        # 所有修改都已保存，允许关闭
-                        event.accept()
+                    # 所有文件都写入成功后再关闭窗口；有失败时保持打开
+                    self.write_tabs(jobs, lambda success: success and self.close())
+                    return
                 elif reply == 2:  # 不保存
                     # 放弃修改，直接退出
                     event.accept()
@@ -8010,6 +11592,14 @@ window.lastScrollTop = window.pageYOffset || document.documentElement.scrollTop
                     event.ignore()
                     return
         
+        # 记录打开的文件，供下次启动时恢复
+        self.save_session()
+        for tab_id in list(self.tabs):
+            self.store_render_cache(tab_id)
+        
+        # 正常退出，删除编辑日志
+        self.journal.shutdown()
+        
         # 清理所有动画工作线程
         self._cleanup_all_animation_workers()
         
@@ -8017,9 +11607,10 @@ window.lastScrollTop = window.pageYOffset || document.documentElement.scrollTop
     
     def _cleanup_all_animation_workers(self):
         """清理所有动画工作线程"""
-        # 清理其他工作线程
-        self._safe_stop_thread('_file_worker_thread')
-        self._safe_stop_thread('_markdown_render_thread')
+        # 等待进行中的预览渲染结束（不强行终止）
+        self._release_thread('_markdown_render_thread', RENDER_SHUTDOWN_WAIT_MS)
+        # 等待进行中的文件写入完成（原子写入，不会留下半个文件）
+        self.file_io.wait_for_done(5000)
     
     def open_settings(self):
         """打开设置窗口"""
@@ -8150,6 +11741,7 @@ window.lastScrollTop = window.pageYOffset || document.documentElement.scrollTop
             ("Ctrl+O", "打开文件"),
             ("Ctrl+S", "保存文件"),
             ("Ctrl+Shift+S", "另存为"),
+            ("Ctrl+Alt+S", "全部保存"),
         ]
         content_layout.addWidget(create_shortcut_group("文件操作", file_shortcuts))
         
@@ -9027,12 +12619,12 @@ def _eventFilter(self, obj, event):
     """事件过滤器 - 处理编辑器焦点事件"""
     from PyQt6.QtCore import QEvent
     
-    # 检查是否是编辑器
-    is_editor = False
-    for tab_info in self.tabs.values():
-        if obj == tab_info['editor']:
-            is_editor = True
-            break
+    # 检查是否是编辑器（通过注册表 O(1) 查找）
+    is_editor = self.tabs.id_for_widget(obj) is not None
+    
+    # 统计启动后首次按键输入的耗时
+    if is_editor and self._first_keystroke_pending and event.type() == QEvent.Type.KeyPress:
+        self._record_first_keystroke()
     
     # 现在不自动显示悬浮工具栏，只处理其他事件
     return super(MarkdownEditor, self).eventFilter(obj, event)
@@ -9145,7 +12737,7 @@ def _update_sync_scroll_setting(self, enabled):
     if not enabled:
         if hasattr(self, 'tabs'):
             for tab_id, tab_data in self.tabs.items():
-                if 'editor' in tab_data:
+                if tab_data.get('editor') is not None:
                     editor = tab_data['editor']
                     scroll_bar = editor.verticalScrollBar()
                     if scroll_bar:
@@ -9159,7 +12751,774 @@ def _update_sync_scroll_setting(self, enabled):
 MarkdownEditor.update_sync_scroll_setting = _update_sync_scroll_setting
 
 
+# ==================== 只读查看模式 ====================
+
+class MarkdownViewer(QMainWindow):
+    """只读查看窗口（--view）- 只包含预渲染的预览和“编辑”按钮，点击编辑后原地切换为完整编辑器"""
+    
+    def __init__(self, file_path, single_instance=False):
+        super().__init__()
+        self.file_path = file_path
+        self.single_instance = single_instance  # 切换为编辑器时是否先转交给已运行的实例、之后是否接收转交的文件
+        self.editor_window = None
+        self.settings = QSettings(QSettings.Format.IniFormat, QSettings.Scope.UserScope, "Markdo", "Settings")
+        
+        self.current_theme = Theme.get_theme(self._initial_theme_name())
+        self.current_theme_name = self.current_theme.get('name')
+        self._update_theme_colors()
+        self.is_dark_theme = self.current_theme.get('is_dark', False)
+        
+        self.setWindowTitle(f"{Path(file_path).name} - Markdo")
+        app_icon = get_app_icon()
+        if not app_icon.isNull():
+            self.setWindowIcon(app_icon)
+        self.resize(DEFAULT_WINDOW_WIDTH, DEFAULT_WINDOW_HEIGHT)
+        self.setStyleSheet(Theme.get_app_stylesheet(self.current_theme))
+        
+        central_widget = QWidget()
+        layout = QVBoxLayout(central_widget)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(0)
+        
+        top_bar = QHBoxLayout()
+        top_bar.setContentsMargins(12, 6, 12, 6)
+        name_label = QLabel(Path(file_path).name)
+        name_label.setToolTip(file_path)
+        edit_btn = QPushButton("✏️ 编辑")
+        edit_btn.setToolTip("切换到完整编辑器 (Ctrl+E)")
+        edit_btn.clicked.connect(self.upgrade_to_editor)
+        top_bar.addWidget(name_label)
+        top_bar.addStretch()
+        top_bar.addWidget(edit_btn)
+        layout.addLayout(top_bar)
+        
+        load_webengine()
+        self.preview = QWebEngineView()
+        self.preview.setAcceptDrops(False)
+        layout.addWidget(self.preview)
+        self.setCentralWidget(central_widget)
+        
+        edit_shortcut = QShortcut(QKeySequence("Ctrl+E"), self)
+        edit_shortcut.activated.connect(self.upgrade_to_editor)
+        
+        self.preview.setHtml(self.render_file(), QUrl("https://cdnjs.cloudflare.com/"))
+    
+    def _initial_theme_name(self):
+        """按主题模式确定主题（跟随时间时按当前时间段选择）"""
+        dark_theme_name = self.settings.value("theme/dark", "dark", type=str)
+        light_theme_name = self.settings.value("theme/light", "morandi_pink", type=str)
+        theme_mode = self.settings.value("theme/mode", "auto", type=str)
+        if theme_mode == "light":
+            return light_theme_name
+        if theme_mode == "dark":
+            return dark_theme_name
+        try:
+            current_time = datetime.now().time()
+            night_start_t = datetime.strptime(self.settings.value("theme/night_start", DEFAULT_NIGHT_START, type=str), "%H:%M").time()
+            night_end_t = datetime.strptime(self.settings.value("theme/night_end", DEFAULT_NIGHT_END, type=str), "%H:%M").time()
+        except ValueError:
+            return dark_theme_name
+        if night_start_t > night_end_t:
+            is_night_time = current_time >= night_start_t or current_time < night_end_t
+        elif night_start_t < night_end_t:
+            is_night_time = night_start_t <= current_time < night_end_t
+        else:
+            is_night_time = True
+        return dark_theme_name if is_night_time else light_theme_name
+    
+    def render_file(self):
+        """读取并渲染文件（优先使用磁盘渲染缓存）"""
+        try:
+            with open(self.file_path, 'r', encoding='utf-8') as f:
+                content = f.read()
+        except Exception as e:
+            log_exception(type(e), e, e.__traceback__, "只读查看模式读取文件")
+            return self.wrap_html_with_style(f"<p>无法读取文件: {Path(self.file_path).name}</p><pre>{e}</pre>")
+        if not content.strip():
+            return self.get_initial_html()
+        
+        render_cache = RenderCache(join(dirname(self.settings.fileName()), RENDER_CACHE_DIR_NAME))
+        use_cache = len(content) >= RENDER_CACHE_MIN_CHARS
+        html_body = render_cache.get(RenderCache.key(content)) if use_cache else None
+        if html_body is None:
+            html_body = self.markdown_to_html_body(content)
+            if use_cache:
+                render_cache.put(RenderCache.key(content), html_body)
+        return self.wrap_html_with_style(html_body)
+    
+    def upgrade_to_editor(self):
+        """切换为完整编辑器：在相同位置打开编辑器窗口并载入当前文件
+        
+        已有编辑器实例在运行时把文件转交给它，作为其中的标签页打开，并关闭查看窗口。
+        """
+        if self.editor_window is not None:
+            return
+        if self.single_instance and forward_to_running_instance([self.file_path]):
+            self.close()
+            return
+        self.editor_window = MarkdownEditor(fade_in=False)
+        self.editor_window.setGeometry(self.geometry())
+        self.editor_window.show()
+        self.editor_window.open_files([self.file_path])
+        if self.single_instance:
+            start_instance_server(self.editor_window)
+        # 隐藏而不销毁查看窗口，由它保持编辑器窗口的引用
+        self.hide()
+
+
+# 查看窗口复用主窗口的主题颜色与 HTML 生成逻辑
+MarkdownViewer._update_theme_colors = MarkdownEditor._update_theme_colors
+MarkdownViewer.markdown_to_html_body = MarkdownEditor.markdown_to_html_body
+MarkdownViewer.wrap_html_with_style = MarkdownEditor.wrap_html_with_style
+MarkdownViewer.get_initial_html = MarkdownEditor.get_initial_html
+
+
+# ==================== 单实例 ====================
+
+def single_instance_server_name():
+    """单实例本地服务名（按用户区分，避免多用户系统上互相转交文件）"""
+    user_key = hashlib.blake2b(os.path.expanduser('~').encode('utf-8'), digest_size=6).hexdigest()
+    return f"Markdo-{user_key}"
+
+
+def forward_to_running_instance(file_paths):
+    """把文件路径转交给已运行的实例（在创建 QApplication 之前调用，使用阻塞式 I/O）
+    
+    Returns:
+        bool: 已运行的实例确认接收时返回 True；没有运行中的实例或该实例无响应时返回 False
+    """
+    socket = QLocalSocket()
+    socket.connectToServer(single_instance_server_name())
+    if not socket.waitForConnected(SINGLE_INSTANCE_CONNECT_TIMEOUT):
+        return False
+    message = json.dumps({'paths': [abspath(path) for path in file_paths]}) + '\n'
+    socket.write(message.encode('utf-8'))
+    socket.waitForBytesWritten(SINGLE_INSTANCE_CONNECT_TIMEOUT)
+    # 等待确认：主实例的事件循环卡住时收不到确认，由本进程自己打开文件
+    acknowledged = False
+    if socket.waitForReadyRead(SINGLE_INSTANCE_ACK_TIMEOUT):
+        acknowledged = bytes(socket.readAll()).strip() == b'ok'
+    socket.abort()
+    return acknowledged
+
+
+class SingleInstanceServer(QObject):
+    """单实例服务 - 接收后续启动的实例转交的文件路径"""
+    files_received = pyqtSignal(list)  # 文件路径列表（为空时只需激活窗口）
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._server = QLocalServer(self)
+        self._server.newConnection.connect(self._on_new_connection)
+        self._buffers = {}  # 连接 -> 已接收的数据
+    
+    def listen(self):
+        """开始监听
+        
+        Returns:
+            bool: 是否成功成为主实例（服务名被无响应的实例占用时返回 False）
+        """
+        name = single_instance_server_name()
+        if self._server.listen(name):
+            return True
+        probe = QLocalSocket()
+        probe.connectToServer(name)
+        if probe.waitForConnected(SINGLE_INSTANCE_CONNECT_TIMEOUT):
+            probe.abort()
+            return False
+        # 上次异常退出残留的套接字文件
+        QLocalServer.removeServer(name)
+        return self._server.listen(name)
+    
+    def _on_new_connection(self):
+        while self._server.hasPendingConnections():
+            socket = self._server.nextPendingConnection()
+            self._buffers[socket] = b''
+            socket.readyRead.connect(lambda s=socket: self._on_ready_read(s))
+            socket.disconnected.connect(lambda s=socket: self._on_disconnected(s))
+    
+    def _on_ready_read(self, socket):
+        self._buffers[socket] += bytes(socket.readAll())
+        if b'\n' not in self._buffers[socket]:
+            return
+        line = self._buffers[socket].split(b'\n', 1)[0]
+        try:
+            paths = json.loads(line.decode('utf-8')).get('paths', [])
+        except (ValueError, AttributeError) as e:
+            log_exception(type(e), e, e.__traceback__, "解析转交的文件路径")
+            socket.abort()
+            return
+        socket.write(b'ok\n')
+        socket.flush()
+        self.files_received.emit([path for path in paths if isinstance(path, str)])
+    
+    def _on_disconnected(self, socket):
+        self._buffers.pop(socket, None)
+        socket.deleteLater()
+
+
+def start_instance_server(window):
+    """让主窗口成为主实例，接收后续启动转交的文件"""
+    instance_server = SingleInstanceServer(window)
+    instance_server.files_received.connect(window.receive_files)
+    if not instance_server.listen() and logger:
+        logger.warning("已有 Markdo 实例无响应，本实例独立运行")
+
+
+# ==================== 基准测试 ====================
+
+def _summarize_runs(runs):
+    """汇总多次运行的各项耗时（最小值 / 中位数 / 最大值）"""
+    summary = {}
+    for key in runs[0] if runs else []:
+        values = sorted(run[key] for run in runs if isinstance(run.get(key), (int, float)))
+        if values:
+            summary[key] = {
+                'min': round(values[0], 2),
+                'median': round(statistics.median(values), 2),
+                'max': round(values[-1], 2),
+            }
+    return summary
+
+
+def _run_startup_child(sample_path, config_dir):
+    """在新进程中运行一次启动基准测试，返回各阶段耗时"""
+    import subprocess
+    env = dict(os.environ, QT_QPA_PLATFORM='offscreen')
+    env[BENCHMARK_SPAWN_ENV] = repr(monotonic())
+    result = subprocess.run(
+        [executable, abspath(__file__), '--benchmark-child', 'startup', sample_path, config_dir],
+        env=env, capture_output=True, text=True, timeout=BENCHMARK_TIMEOUT / 1000 * 2
+    )
+    for line in reversed(result.stdout.splitlines()):
+        if line.startswith('{'):
+            return json.loads(line)
+    raise RuntimeError(f"启动基准测试子进程失败（退出码 {result.returncode}）：{result.stderr[-2000:]}")
+
+
+def benchmark_startup(options):
+    """启动基准测试：冷启动（全新配置目录）和热启动（复用配置目录与渲染缓存）各运行多次"""
+    import tempfile
+    work_dir = tempfile.mkdtemp(prefix='markdo-benchmark-')
+    sample_path = join(work_dir, 'sample.md')
+    with open(sample_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(WARMUP_SAMPLE.replace('# Markdo', f'# Section {i}') for i in range(50)))
+    
+    cold_runs = [_run_startup_child(sample_path, tempfile.mkdtemp(dir=work_dir)) for _ in range(options.runs)]
+    warm_dir = tempfile.mkdtemp(dir=work_dir)
+    _run_startup_child(sample_path, warm_dir)  # 预热一次，填充渲染缓存等
+    warm_runs = [_run_startup_child(sample_path, warm_dir) for _ in range(options.runs)]
+    shutil.rmtree(work_dir, ignore_errors=True)
+    return {
+        'cold': {'runs': cold_runs, 'summary': _summarize_runs(cold_runs)},
+        'warm': {'runs': warm_runs, 'summary': _summarize_runs(warm_runs)},
+    }
+
+
+def benchmark_startup_child(sample_path, config_dir):
+    """启动基准测试子进程：按实际启动流程创建窗口并打开示例文件，记录各阶段耗时（ms）
+    
+    interpreter / import / qapplication / window 为各阶段自身耗时，
+    first_* 为从模块开始加载算起的时间点。
+    """
+    entered = monotonic()
+    timings = {'import_ms': (entered - PROCESS_START_TIME) * 1000}
+    spawn_time = os.environ.get(BENCHMARK_SPAWN_ENV)
+    if spawn_time:
+        timings['interpreter_ms'] = (PROCESS_START_TIME - float(spawn_time)) * 1000
+    
+    QSettings.setPath(QSettings.Format.IniFormat, QSettings.Scope.UserScope, config_dir)
+    settings = QSettings(QSettings.Format.IniFormat, QSettings.Scope.UserScope, "Markdo", "Settings")
+    settings.setValue("show_welcome", False)
+    settings.setValue("session/restore", False)
+    settings.sync()
+    
+    QApplication.setAttribute(Qt.ApplicationAttribute.AA_ShareOpenGLContexts, True)
+    started = monotonic()
+    app = QApplication(argv)
+    timings['qapplication_ms'] = (monotonic() - started) * 1000
+    
+    started = monotonic()
+    window = MarkdownEditor(fade_in=False)
+    timings['window_ms'] = (monotonic() - started) * 1000
+    window.show()
+    window.open_files([sample_path])
+    
+    def since_start():
+        return (monotonic() - PROCESS_START_TIME) * 1000
+    
+    def on_load_finished(ok):
+        tab_info = window.tabs.get(tab_id)
+        if ok and tab_info is not None and tab_info.get('displayed_html') is not None:
+            timings['first_preview_ms'] = since_start()
+            app.quit()
+    
+    tab_id = None
+    def poll():
+        nonlocal tab_id
+        if window._first_paint_time is not None and 'first_paint_ms' not in timings:
+            timings['first_paint_ms'] = (window._first_paint_time - PROCESS_START_TIME) * 1000
+        if tab_id is None:
+            tab_id = window.find_tab_by_path(sample_path)
+            if tab_id is not None:
+                timings['first_tab_ready_ms'] = since_start()
+        if tab_id is not None and window.tabs[tab_id].get('preview') is not None:
+            window.tabs[tab_id]['preview'].loadFinished.connect(on_load_finished)
+            poll_timer.stop()
+    
+    poll_timer = QTimer()
+    poll_timer.timeout.connect(poll)
+    poll_timer.start(1)
+    QTimer.singleShot(BENCHMARK_TIMEOUT, app.quit)
+    app.exec()
+    
+    print(json.dumps({key: round(value, 2) for key, value in timings.items()}))
+    return 0
+
+
+def generate_benchmark_document(line_count=BENCHMARK_DOCUMENT_LINES):
+    """生成用于基准测试的合成 Markdown 文档（标题、段落、列表、引用、表格、代码块、公式等循环出现）"""
+    sections = [
+        "## Section {i}",
+        "",
+        "Paragraph {i} with **bold**, *italic*, `code`, ~~strike~~, ==mark== and a [link](https://example.com/{i}).",
+        "Inline math $a_{i} + b^2$ and a footnote[^{i}] in a longer line of plain text that needs scanning.",
+        "",
+        "- list item {i} with ***bold italic***",
+        "1. ordered item {i}",
+        "> quote {i} with `inline code`",
+        "",
+        "| col {i} | value |",
+        "|---|---|",
+        "| **cell** | $x$ |",
+        "",
+        "```python",
+        "def func_{i}(x):",
+        "    return x * 2  # comment **not bold**",
+        "```",
+        "",
+        "$$",
+        "\\sum_{{k=0}}^{{{i}}} k^2",
+        "$$",
+        "",
+        "---",
+        "",
+    ]
+    lines = []
+    i = 0
+    while len(lines) < line_count:
+        lines.extend(line.format(i=i) for line in sections)
+        i += 1
+    return '\n'.join(lines[:line_count])
+
+
+def _ensure_benchmark_app():
+    """进程内基准测试使用的 QApplication（无界面平台）"""
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    return QApplication.instance() or QApplication(argv[:1])
+
+
+def benchmark_highlight(options):
+    """语法高亮基准测试：对合成文档整体重新高亮，比较逐条规则匹配（旧实现）与单次扫描的每块耗时"""
+    app = _ensure_benchmark_app()
+    
+    class LegacyMarkdownHighlighter(MarkdownHighlighter):
+        """旧实现：对每个文本块依次运行约 24 条正则，后匹配的规则覆盖先前的格式"""
+        
+        def __init__(self, parent=None):
+            super().__init__(parent)
+            f = self.formats
+            self.highlighting_rules = [
+                (compile(r'^#{1,6}\s.*'), f['header']), (compile(r'\*\*.+?\*\*'), f['bold']),
+                (compile(r'\*.+?\*'), f['italic']), (compile(r'`.+?`'), f['code']),
+                (compile(r'^```.*'), f['codeblock']), (compile(r'\[.+?\]\(.+?\)'), f['link']),
+                (compile(r'^\s*[-*+]\s'), f['list']), (compile(r'^\s*\d+\.\s'), f['list']),
+                (compile(r'^>+.*'), f['quote']), (compile(r'~~.+?~~'), f['strikethrough']),
+                (compile(r'==.+?=='), f['highlight']), (compile(r'^[-*]{3,}$'), f['hr']),
+                (compile(r'\$[^$]+\$'), f['math']), (compile(r'\\\([^)]+\\\)'), f['math']),
+                (compile(r'^\$\$'), f['mathblock']), (compile(r'\[\^\w+\]'), f['footnote']),
+                (compile(r'^\[TOC\]$', IGNORECASE), f['toc']), (compile(r'\^[^^]+\^'), f['superscript']),
+                (compile(r'~[^~]+~'), f['subscript']), (compile(r'^\|.*\|$'), f['table']),
+                (compile(r'^\|[-:| ]+\|$'), f['table']), (compile(r'\*\*\*.+?\*\*\*'), f['bolditalic']),
+            ]
+        
+        def tokenize_block(self, text, state, block=None):
+            spans = []
+            for pattern, fmt in self.highlighting_rules:
+                try:
+                    for match in pattern.finditer(text):
+                        spans.append((match.start(), match.end() - match.start(), fmt))
+                except Exception:
+                    pass
+            return self.STATE_NORMAL, spans
+    
+    document_text = generate_benchmark_document()
+    result = {'lines': BENCHMARK_DOCUMENT_LINES}
+    for label, highlighter_class in (('before', LegacyMarkdownHighlighter), ('after', MarkdownHighlighter)):
+        document = QTextDocument()
+        document.setPlainText(document_text)
+        highlighter = highlighter_class(document)
+        app.processEvents()
+        runs = []
+        for _ in range(options.runs):
+            started = monotonic()
+            highlighter.rehighlight()
+            runs.append((monotonic() - started) * 1000)
+        block_count = document.blockCount()
+        result[label] = {
+            'rehighlight_ms': _summarize_runs([{'ms': value} for value in runs])['ms'],
+            'per_block_us': round(statistics.median(runs) * 1000 / block_count, 2),
+        }
+        highlighter.setDocument(None)
+    result['speedup'] = round(result['before']['rehighlight_ms']['median'] / max(result['after']['rehighlight_ms']['median'], 1e-6), 2)
+    return result
+
+
+def generate_guardrail_corpus(fuzz_cases, seed=GUARDRAIL_FUZZ_SEED):
+    """生成病态输入：重复的未闭合标记组成的超长行，以及由 Markdown 元字符随机组成的行
+    
+    Returns:
+        list: [(名称, 文本), ...]
+    """
+    import random
+    size = GUARDRAIL_LINE_CHARS
+    corpus = [
+        ('asterisks', '*' * size),
+        ('underscores', '_' * size),
+        ('brackets', '[' * size),
+        ('link_openers', '[a](' * (size // 4)),
+        ('image_openers', '![a](' * (size // 5)),
+        ('backticks', '`' * size),
+        ('math_openers', '\\(' * (size // 2)),
+        ('dollars', '$' * size),
+        ('tildes', '~' * size),
+        ('carets', '^' * size),
+        ('equals', '=' * size),
+        ('angle_brackets', '<' * size),
+        ('paragraph_tags', '<p>' * (size // 3)),
+        ('table_row', '|' + 'a|' * (size // 2)),
+        ('brackets_at_cap', '[' * HIGHLIGHT_MAX_LINE_LENGTH),
+        ('math_openers_at_cap', '\\(' * (HIGHLIGHT_MAX_LINE_LENGTH // 2)),
+    ]
+    rng = random.Random(seed)
+    alphabet = '*_[]()`$~=^\\|#>-!< a'
+    for i in range(fuzz_cases):
+        length = rng.choice((HIGHLIGHT_MAX_LINE_LENGTH, size))
+        corpus.append((f'fuzz_{i}', ''.join(rng.choice(alphabet) for _ in range(length))))
+    return corpus
+
+
+def _run_render_child(text_path):
+    """在新进程中渲染一次病态输入，返回渲染耗时及是否触发看门狗"""
+    import subprocess
+    env = dict(os.environ, QT_QPA_PLATFORM='offscreen')
+    result = subprocess.run(
+        [executable, abspath(__file__), '--benchmark-child', 'render', text_path],
+        env=env, capture_output=True, text=True, timeout=BENCHMARK_TIMEOUT / 1000
+    )
+    for line in reversed(result.stdout.splitlines()):
+        if line.startswith('{'):
+            return json.loads(line)
+    raise RuntimeError(f"渲染基准测试子进程失败（退出码 {result.returncode}）：{result.stderr[-2000:]}")
+
+
+def benchmark_render_child(text_path):
+    """渲染基准测试子进程：与预览一样在工作线程中渲染，超过 RENDER_WATCHDOG_MS 视为回退到纯文本
+    
+    解析卡住的线程无法中止，输出结果后直接结束进程。
+    """
+    with open(text_path, encoding='utf-8') as f:
+        text = f.read()
+    worker = threading.Thread(target=MarkdownEditor.markdown_to_html_body, args=(None, text), daemon=True)
+    started = monotonic()
+    worker.start()
+    worker.join(RENDER_WATCHDOG_MS / 1000)
+    fell_back = worker.is_alive()
+    print(json.dumps({
+        'render_ms': None if fell_back else round((monotonic() - started) * 1000, 2),
+        'render_fallback': fell_back,
+    }), flush=True)
+    os._exit(0)
+
+
+def benchmark_guardrails(options):
+    """病态输入基准测试：超长行和随机元字符行的语法高亮必须在 GUARDRAIL_HIGHLIGHT_BUDGET_MS 内完成，
+    渲染必须在 RENDER_WATCHDOG_MS 内完成，只有 GUARDRAIL_ACCEPTED_FALLBACKS 中的样本允许由看门狗
+    回退到纯文本（--runs 为随机样本数）"""
+    import tempfile
+    _ensure_benchmark_app()
+    document = QTextDocument()
+    highlighter = MarkdownHighlighter(document)
+    work_dir = tempfile.mkdtemp(prefix='markdo-guardrails-')
+    text_path = join(work_dir, 'case.md')
+    cases = []
+    for name, text in generate_guardrail_corpus(options.runs):
+        started = monotonic()
+        highlighter.tokenize_block(text, MarkdownHighlighter.STATE_NORMAL)
+        highlight_ms = (monotonic() - started) * 1000
+        with open(text_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        case = {'name': name, 'chars': len(text), 'highlight_ms': round(highlight_ms, 2)}
+        case.update(_run_render_child(text_path))
+        case['accepted_fallback'] = case['render_fallback'] and name in GUARDRAIL_ACCEPTED_FALLBACKS
+        case['passed'] = (highlight_ms <= GUARDRAIL_HIGHLIGHT_BUDGET_MS
+                          and (not case['render_fallback'] or case['accepted_fallback']))
+        cases.append(case)
+    shutil.rmtree(work_dir, ignore_errors=True)
+    return {
+        'highlight_budget_ms': GUARDRAIL_HIGHLIGHT_BUDGET_MS,
+        'render_watchdog_ms': RENDER_WATCHDOG_MS,
+        'cases': cases,
+        'render_fallbacks': sum(case['render_fallback'] for case in cases),
+        'accepted_fallbacks': sorted(GUARDRAIL_ACCEPTED_FALLBACKS),
+        'passed': all(case['passed'] for case in cases),
+    }
+
+
+def _latency_summary(values):
+    """耗时样本的最小值 / 中位数 / p95 / 最大值（ms）"""
+    values = sorted(values)
+    if not values:
+        return None
+    return {
+        'min': round(values[0], 2),
+        'median': round(statistics.median(values), 2),
+        'p95': round(values[min(len(values) - 1, int(0.95 * len(values)))], 2),
+        'max': round(values[-1], 2),
+    }
+
+
+def _pump_events(app, duration_ms, loop_times=None):
+    """处理事件 duration_ms，记录每次事件循环处理的耗时"""
+    deadline = monotonic() + duration_ms / 1000
+    while True:
+        started = monotonic()
+        app.processEvents()
+        if loop_times is not None:
+            loop_times.append((monotonic() - started) * 1000)
+        if monotonic() >= deadline:
+            return
+        sleep(0.001)
+
+
+def _replay_keys(app, editor, keys):
+    """按 TYPING_KEY_INTERVAL_MS 的间隔回放按键（字符或 (键, 修饰键)），返回每键耗时、事件循环耗时和按键到绘制延迟
+    
+    按键分发（QTest.keyClick 同步处理按键）同样阻塞事件循环，计入 max_loop_ms 和卡顿次数；
+    按键到绘制延迟按文档规模分组报告（粘贴等操作可能使文档跨越分组）。
+    """
+    from PyQt6.QtTest import QTest
+    editor.latency_stats = InputLatencyStats()
+    key_times = []
+    loop_times = []
+    for key in keys:
+        started = monotonic()
+        if isinstance(key, tuple):
+            QTest.keyClick(editor, key[0], key[1])
+        else:
+            QTest.keyClick(editor, key)
+        key_ms = (monotonic() - started) * 1000
+        key_times.append(key_ms)
+        loop_times.append(key_ms)
+        _pump_events(app, TYPING_KEY_INTERVAL_MS, loop_times)
+    _pump_events(app, PREVIEW_UPDATE_DELAY * 2, loop_times)  # 包括防抖后的预览更新等延后的工作
+    stalls = [value for value in loop_times if value >= TYPING_STALL_MS]
+    return {
+        'keys': len(keys),
+        'key_ms': _latency_summary(key_times),
+        'max_loop_ms': round(max(loop_times), 2),
+        'stalls': len(stalls),
+        'paint_latency_ms': editor.latency_stats.summary(),
+    }
+
+
+def _move_cursor_to_line(editor, prefix):
+    """把光标移到文档中部第一个以 prefix 开头的行的行尾"""
+    document = editor.document()
+    block = document.findBlockByNumber(document.blockCount() // 2)
+    while block.isValid() and not block.text().startswith(prefix):
+        block = block.next()
+    cursor = QTextCursor(block)
+    cursor.movePosition(QTextCursor.MoveOperation.EndOfBlock)
+    editor.setTextCursor(cursor)
+    editor.ensureCursorVisible()
+
+
+def benchmark_typing(options):
+    """打字基准测试：在 1k / 10k / 100k 行的合成文档中用 QTest 回放按键（无界面平台），
+    分别测量普通输入、列表接续（回车）、Tab 补全和大段粘贴的每键处理耗时、事件循环卡顿和按键到绘制延迟；
+    打开文档后的后台高亮分片必须在 HIGHLIGHT_SLICE_MS（加 TYPING_SLICE_SLACK_MS 余量）内完成，
+    超时的分片比例不能超过 TYPING_SLICE_OUTLIER_RATIO（至少允许一个，系统调度造成的偶发超时）
+    （--runs 控制每个场景的重复次数，--previews 同时创建预览，需要 QtWebEngine）"""
+    import tempfile
+    config_dir = tempfile.mkdtemp(prefix='markdo-typing-')
+    QSettings.setPath(QSettings.Format.IniFormat, QSettings.Scope.UserScope, config_dir)
+    settings = QSettings(QSettings.Format.IniFormat, QSettings.Scope.UserScope, "Markdo", "Settings")
+    settings.setValue("show_welcome", False)
+    settings.setValue("session/restore", False)
+    settings.sync()
+    if options.previews:
+        QApplication.setAttribute(Qt.ApplicationAttribute.AA_ShareOpenGLContexts, True)
+    app = _ensure_benchmark_app()
+    window = MarkdownEditor(fade_in=False, previews=options.previews)
+    window.resize(1200, 800)
+    window.show()
+    _pump_events(app, 200)
+    
+    Ctrl, NoModifier = Qt.KeyboardModifier.ControlModifier, Qt.KeyboardModifier.NoModifier
+    typed = list("The quick brown fox jumps over the lazy dog. ")
+    scenarios = (
+        ('typing', "Paragraph", typed * max(1, options.runs // 2)),
+        ('list_continuation', "- list item", [(Qt.Key.Key_Return, NoModifier), *"next"] * options.runs * 4),
+        ('tab_completion', "Paragraph", ['*', (Qt.Key.Key_Tab, NoModifier), *"em", (Qt.Key.Key_End, NoModifier)] * options.runs * 4),
+        ('paste', "Paragraph", [(Qt.Key.Key_V, Ctrl)] * options.runs),
+    )
+    QApplication.clipboard().setText(generate_benchmark_document(2000))
+    
+    result = {'key_interval_ms': TYPING_KEY_INTERVAL_MS, 'stall_ms': TYPING_STALL_MS, 'highlight_slice_budget_ms': HIGHLIGHT_SLICE_MS,
+              'previews': options.previews, 'sizes': {}}
+    for line_count in TYPING_BENCHMARK_SIZES:
+        started = monotonic()
+        tab_id = window.create_new_tab(generate_benchmark_document(line_count))
+        editor = window.tabs[tab_id]['editor']
+        editor.setFocus()
+        open_ms = (monotonic() - started) * 1000
+        # 等待后台分片高亮完成（记录每个分片的耗时），只测量输入本身
+        deadline = monotonic() + TYPING_SETTLE_TIMEOUT / 1000
+        slices = []
+        while editor.highlighter.is_highlight_pending() and monotonic() < deadline:
+            turn_started = monotonic()
+            app.processEvents()
+            slices.extend(ms for name, ms in GuiActivityLog.between(turn_started, monotonic()) if name == "分片高亮")
+            sleep(0.001)
+        size_result = {
+            'open_ms': round(open_ms, 2),
+            'settle_ms': round((monotonic() - started) * 1000 - open_ms, 2),
+            'highlight_slice_ms': _latency_summary(slices),
+            'slices_over_budget': sum(ms > HIGHLIGHT_SLICE_MS + TYPING_SLICE_SLACK_MS for ms in slices),
+            'slices_over_budget_allowed': max(1, int(len(slices) * TYPING_SLICE_OUTLIER_RATIO)),
+        }
+        for name, line_prefix, keys in scenarios:
+            _move_cursor_to_line(editor, line_prefix)
+            _pump_events(app, 100)
+            size_result[name] = _replay_keys(app, editor, keys)
+        result['sizes'][f'{line_count}_lines'] = size_result
+        window.close_tab(window.tabs.index_of(tab_id))
+        _pump_events(app, 100)
+    
+    window.journal.shutdown()
+    window.hide()
+    shutil.rmtree(config_dir, ignore_errors=True)
+    result['passed'] = all(size['slices_over_budget'] <= size['slices_over_budget_allowed']
+                           for size in result['sizes'].values())
+    return result
+
+
+def benchmark_statistics(options):
+    """字数统计基准测试：对初始文档做随机编辑，每次编辑后随增量更新的字数和字符数
+    （计入与不计入标记两种模式）都必须与 count(toPlainText()) 整篇统计的结果相同，
+    同时比较增量更新与整篇统计的耗时（样本数为 --runs × STATISTICS_FUZZ_SEEDS_PER_RUN）"""
+    import random
+    app = _ensure_benchmark_app()
+    alphabet = ['|', '-', ':', ' ', '\t', '\n', '#', '>', '*', '`', '~', '=', '[', ']', '(', ')', '.', '1', 'a', 'b', '中']
+    seeds = options.runs * STATISTICS_FUZZ_SEEDS_PER_RUN
+    mismatches = []
+    delta_times = []
+    recount_times = []
+    for seed in range(STATISTICS_FUZZ_SEED, STATISTICS_FUZZ_SEED + seeds):
+        rng = random.Random(seed)
+        document = QTextDocument()
+        document.documentLayout()  # 没有布局的文档不发出 contentsChange
+        document.setPlainText(STATISTICS_FUZZ_DOCUMENT)
+        bus = DocumentDeltaBus(document)
+        stats_by_mode = {mode: DocumentStatistics(bus, mode) for mode in (False, True)}
+        for edit in range(STATISTICS_FUZZ_EDITS):
+            cursor = QTextCursor(document)
+            cursor.setPosition(rng.randrange(document.characterCount()))
+            if rng.random() < 0.3:
+                end = min(cursor.position() + rng.randint(1, 5), document.characterCount() - 1)
+                cursor.setPosition(end, QTextCursor.MoveMode.KeepAnchor)
+                cursor.removeSelectedText()
+            else:
+                cursor.insertText(''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 3))))
+            started = monotonic()
+            bus.flush()
+            delta_times.append((monotonic() - started) * 1000)
+            text = document.toPlainText()
+            for mode, stats in stats_by_mode.items():
+                started = monotonic()
+                expected = DocumentStatistics.count(text, mode)
+                recount_times.append((monotonic() - started) * 1000)
+                if (stats.words, stats.chars) != expected and len(mismatches) < 10:
+                    mismatches.append({'seed': seed, 'edit': edit, 'exclude_markup': mode,
+                                       'delta': [stats.words, stats.chars], 'recount': list(expected)})
+        bus.deleteLater()
+        app.processEvents()
+    return {
+        'seeds': seeds,
+        'edits_per_seed': STATISTICS_FUZZ_EDITS,
+        'delta_ms': _latency_summary(delta_times),
+        'recount_ms': _latency_summary(recount_times),
+        'mismatches': mismatches,
+        'passed': not mismatches,
+    }
+
+
+BENCHMARKS = {
+    'startup': benchmark_startup,
+    'highlight': benchmark_highlight,
+    'guardrails': benchmark_guardrails,
+    'typing': benchmark_typing,
+    'statistics': benchmark_statistics,
+}
+
+
+def run_benchmark(args):
+    """运行基准测试（--benchmark <名称> [--runs N] [--output 文件]），结果以 JSON 输出
+    
+    Returns:
+        int: 进程退出码
+    """
+    import argparse
+    import platform
+    from PyQt6.QtCore import QT_VERSION_STR, PYQT_VERSION_STR
+    parser = argparse.ArgumentParser(prog='markdo --benchmark')
+    parser.add_argument('name', choices=sorted(BENCHMARKS))
+    parser.add_argument('--runs', type=int, default=BENCHMARK_DEFAULT_RUNS)
+    parser.add_argument('--output', help="同时把结果写入该文件")
+    parser.add_argument('--previews', action='store_true', help="打字基准测试同时创建预览（需要 QtWebEngine）")
+    options = parser.parse_args(args)
+    
+    result = {
+        'benchmark': options.name,
+        'runs': options.runs,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'qt': QT_VERSION_STR,
+        'pyqt': PYQT_VERSION_STR,
+        'platform': platform.platform(),
+    }
+    result.update(BENCHMARKS[options.name](options))
+    output = json.dumps(result, ensure_ascii=False, indent=2)
+    print(output)
+    if options.output:
+        with open(options.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    return 0 if result.get('passed', True) else 1
+
+
 def main():
+    # 基准测试模式（不进入单实例流程）
+    if '--benchmark-child' in argv:
+        child_args = argv[argv.index('--benchmark-child') + 1:]
+        if child_args[:1] == ['startup']:
+            exit(benchmark_startup_child(*child_args[1:3]))
+        if child_args[:1] == ['render']:
+            exit(benchmark_render_child(child_args[1]))
+        exit(2)
+    if '--benchmark' in argv:
+        exit(run_benchmark(argv[argv.index('--benchmark') + 1:]))
+    
     # 启用OpenGL硬件加速，提升渲染和动画性能
     # 设置 OpenGL 表面格式，启用硬件加速
     format = QSurfaceFormat()
@@ -9174,6 +13533,16 @@ def main():
     QApplication.setAttribute(Qt.ApplicationAttribute.AA_UseDesktopOpenGL, True)
     QApplication.setAttribute(Qt.ApplicationAttribute.AA_ShareOpenGLContexts, True)
     
+    # 检查命令行参数，打开所有存在的.md或.markdown文件（由文件 I/O 服务在后台并发读取）
+    file_paths = [path for path in argv[1:] if exists(path) and path.lower().endswith(MARKDOWN_FILE_EXTENSIONS)]
+    
+    # 单实例：已有实例在运行时把文件交给它打开，本进程直接退出（--new-instance 强制启动新实例）。
+    # 只读查看模式不转交，总是由本进程打开查看窗口，点击“编辑”时再转交
+    single_instance = '--new-instance' not in argv
+    view_mode = '--view' in argv and bool(file_paths)
+    if single_instance and not view_mode and forward_to_running_instance(file_paths):
+        exit(0)
+    
     app = QApplication(argv)
     
     # 初始化动画帧率设置，匹配显示器刷新率
@@ -9193,23 +13562,20 @@ def main():
         app.setWindowIcon(app_icon)
     
     try:
-        window = MarkdownEditor()
+        if view_mode:
+            # 只读查看模式：只显示预览，点击“编辑”后才创建完整编辑器
+            window = MarkdownViewer(file_paths[0], single_instance)
+            window.show()
+            exit(app.exec())
+        
+        # 通过文件关联打开时跳过淡入动画，尽快显示文件内容
+        window = MarkdownEditor(fade_in=not file_paths)
         window.show()
+        window.open_files(file_paths)
         
-        # 检查命令行参数，如果有文件路径则打开该文件
-        if len(argv) > 1:
-            file_path = argv[1]
-            # 检查文件是否存在且是.md或.markdown文件
-            if exists(file_path) and file_path.lower().endswith(('.md', '.markdown')):
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                    window.create_new_tab(content, file_path)
-                except Exception as e:
-                    # 记录错误但不阻止程序启动
-                    import traceback
-                    print(f"Warning: 无法打开文件: {file_path}, 错误: {str(e)}")
-                    traceback.print_exc()
+        # 成为主实例，接收后续启动转交的文件
+        if single_instance:
+            start_instance_server(window)
         
         exit(app.exec())
     except Exception as e: